@@ -0,0 +1,58 @@
+"""
+Benchmark ranking N queries one at a time (N unary GetRecommendations) against a single
+`rank_many` call (BatchGetRecommendations), which groups queries by city and scores each
+group with one sparse matrix-matrix multiply.
+
+Run from the backend directory:
+    python -m benchmarks.bench_batch_rank --rows 200000 --queries 100 1000 10000
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from benchmarks.bench_startup import WORDS, make_catalog
+from services.recommendation.catalog import BusinessCatalog
+from services.recommendation.city_index import CityIndex
+from services.recommendation.model import ModelHandle, ModelSnapshot
+from services.recommendation.recommendation_service import RecommendationService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--cities', type=int, default=20)
+    parser.add_argument('--queries', type=int, nargs='+', default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    data = make_catalog(args.rows, rng)
+    cities = [f"City {i}" for i in range(args.cities)]
+    data['city'] = rng.choice(cities, args.rows)
+    vectorizer = TfidfVectorizer(stop_words='english').fit(data['category_features'])
+    snapshot = ModelSnapshot(BusinessCatalog.from_dataframe(data), vectorizer, CityIndex.from_dataframe(data, vectorizer))
+    service = RecommendationService(None, None, ModelHandle(snapshot))
+    del data
+
+    print(f"rows={args.rows} cities={args.cities}")
+    print(f"{'queries':>8} {'unary (s)':>10} {'batch (s)':>10} {'speedup':>9}")
+    for count in args.queries:
+        queries = [
+            (list(rng.choice(WORDS, rng.integers(1, 4), replace=False)), rng.choice(cities).lower())
+            for _ in range(count)
+        ]
+        start = time.perf_counter()
+        unary = [service.rank(categories, city, snapshot=snapshot) for categories, city in queries]
+        unary_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = service.rank_many(queries, snapshot=snapshot)
+        batch_s = time.perf_counter() - start
+
+        assert all(np.array_equal(a[0], b[0]) for a, b in zip(unary, batch))
+        print(f"{count:>8} {unary_s:>10.3f} {batch_s:>10.3f} {unary_s / batch_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Microbenchmark of the recommendation cache-hit path, before and after caching serialized
+RecommendationResponse bytes.
+
+before: the cache holds a JSON list; a hit runs json.loads, rebuilds each BusinessRecommendation
+        field by field and gRPC serializes the message again.
+after:  the cache holds the serialized response; a hit hands the bytes to gRPC untouched.
+
+The in-process paths used by UserService (cached recommendations -> JSON for the client) are
+measured as well. Redis round trips are excluded; only the CPU work per hit is timed.
+Run from the backend directory:
+    python -m benchmarks.bench_cache_hit
+"""
+import argparse
+import json
+import timeit
+
+from codegen import recommendation_service_pb2 as pb2
+from services.recommendation.recommendation_service import RECOMMENDATION_LIMIT, serialized_response
+from services.user.user_service import UserService
+
+
+def make_recommendations(count):
+    return [
+        {
+            "name": f"Business {i}", "category": "Coffee & Tea, Breakfast & Brunch, Bakeries",
+            "rating": 4.5, "review_count": 120 + i, "city": "Philadelphia",
+            "address": f"{i} Chestnut Street", "phone": "+12155550100", "price": "$$",
+            "image_url": f"https://images.example.com/{i}.jpg", "url": f"https://example.com/biz/{i}",
+        }
+        for i in range(count)
+    ]
+
+
+def response_from_json(cached):
+    # The pre-change cache-hit decoding
+    return pb2.RecommendationResponse(
+        recommendations=[
+            pb2.BusinessRecommendation(
+                name=rec["name"], category=rec["category"], rating=rec["rating"],
+                review_count=rec["review_count"], city=rec["city"], address=rec["address"],
+                phone=rec["phone"], price=rec["price"], image_url=rec["image_url"], url=rec["url"],
+            )
+            for rec in json.loads(cached)
+        ]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=RECOMMENDATION_LIMIT, help="Recommendations per response")
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    recommendations = make_recommendations(args.count)
+    cached_json = json.dumps(recommendations).encode("utf-8")
+    cached_bytes = response_from_json(cached_json).SerializeToString()
+
+    cases = [
+        ("GetRecommendations hit, before", lambda: response_from_json(cached_json).SerializeToString()),
+        ("GetRecommendations hit, after", lambda: serialized_response(cached_bytes)),
+        ("UserService JSON, before",
+         lambda: UserService.serialize_recommendations(response_from_json(cached_json))),
+        ("UserService JSON, after",
+         lambda: UserService.serialize_recommendations(pb2.RecommendationResponse.FromString(cached_bytes))),
+    ]
+    print(f"{args.count} recommendations per response; cached JSON {len(cached_json)} B, "
+          f"cached protobuf {len(cached_bytes)} B")
+    print(f"{'path':>32} {'us/hit':>9}")
+    for label, case in cases:
+        seconds = min(timeit.repeat(case, number=args.number, repeat=3)) / args.number
+        print(f"{label:>32} {seconds * 1e6:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Cache hit rate and key count with the legacy recommendation cache key versus the canonical one.
+
+Replays a Zipf-distributed stream of preference queries in which users spell the same
+query differently: categories in any order, with different case, stray whitespace and the
+occasional duplicate. Each request is a cache hit if its key has been seen before (an
+unbounded cache, no expiry), so the only difference between the runs is the key.
+
+before: recommendations:pb:{' '.join(categories).lower()}:{city.lower()}
+after:  recommendations:q:{hash of the trimmed, de-duplicated, sorted categories and city}
+
+Run from the backend directory:
+    python -m benchmarks.bench_cache_keys
+"""
+import argparse
+import random
+
+from benchmarks.bench_startup import WORDS
+from cache.keys import recommendation_key
+
+CITIES = ["Philadelphia", "Tampa", "Indianapolis", "Nashville", "Tucson", "New Orleans", "Reno", "Boise"]
+
+
+def legacy_key(categories, city):
+    return f"recommendations:pb:{' '.join(categories).lower()}:{city.lower()}"
+
+
+def make_queries(count, rng):
+    categories = [word.title() for word in WORDS]
+    return [(rng.sample(categories, rng.randint(1, 4)), rng.choice(CITIES)) for _ in range(count)]
+
+
+def respell(categories, city, rng):
+    """
+    One user's spelling of a query.
+    """
+    categories = list(categories)
+    rng.shuffle(categories)
+    if rng.random() < 0.1:
+        categories.append(rng.choice(categories))
+    categories = [
+        (category.lower() if rng.random() < 0.5 else category) + (" " if rng.random() < 0.1 else "")
+        for category in categories
+    ]
+    return categories, city if rng.random() < 0.7 else city.lower()
+
+
+def hit_rate(requests, key_function):
+    seen = set()
+    hits = 0
+    for categories, city in requests:
+        key = key_function(categories, city)
+        if key in seen:
+            hits += 1
+        else:
+            seen.add(key)
+    return hits / len(requests), len(seen)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=2000, help="Distinct queries")
+    parser.add_argument('--requests', type=int, default=100000)
+    parser.add_argument('--zipf', type=float, default=1.1, help="Zipf exponent of query popularity")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = make_queries(args.queries, rng)
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(len(queries))]
+    requests = [respell(*query, rng) for query in rng.choices(queries, weights=weights, k=args.requests)]
+
+    print(f"{args.requests} requests over {args.queries} queries (zipf {args.zipf})")
+    print(f"{'key':>10} {'hit rate':>9} {'keys':>7}")
+    for label, key_function in [("before", legacy_key), ("after", recommendation_key)]:
+        rate, keys = hit_rate(requests, key_function)
+        print(f"{label:>10} {rate:>9.1%} {keys:>7}")
+
+
+if __name__ == "__main__":
+    main()
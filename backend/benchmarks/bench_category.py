@@ -0,0 +1,120 @@
+"""
+p50/p99 latency of rating-ranked category search pages from the in-memory CategoryIndex,
+against the ILIKE baseline.
+
+Without a database the baseline is what `category ILIKE '%query%'` does without an index: a
+case-insensitive substring test of every business's category, here followed by the rating
+sort the ranked search needs. With --sql the statements also run against Postgres, using
+the DB_* variables: the previous unordered `ILIKE ... LIMIT 3` and the ranked keyset page.
+Apply db/migrations/002_category_trgm.sql to measure them with the trigram index.
+
+Run from the backend directory:
+    python -m benchmarks.bench_category --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import time
+from decimal import Decimal
+
+import numpy as np
+
+from benchmarks.bench_startup import WORDS, make_catalog
+from db.queries import STATEMENTS
+from services.business.category_index import CategoryIndex
+from services.business.pagination import FIRST_PAGE_KEY
+from services.recommendation.catalog import BusinessCatalog
+
+CATALOG_SIZES = [10_000, 100_000, 1_000_000]
+
+# business_by_category before ranked pages
+LEGACY_CATEGORY = "SELECT * FROM Business WHERE category ILIKE %s LIMIT 3"
+
+
+def make_queries(count, rng):
+    """
+    Whole categories, and prefixes of them as typed into a search box.
+    """
+    words = rng.choice(WORDS, count)
+    return [word if rng.random() < 0.7 else word[:rng.integers(3, len(word) + 1)] for word in words]
+
+
+def latency(fn, queries):
+    """
+    :return: (p50, p99) latency in milliseconds.
+    """
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        latencies.append(time.perf_counter() - start)
+    return tuple(np.percentile(latencies, [50, 99]) * 1000)
+
+
+def scan(categories, ratings, ids, query, limit):
+    query = query.lower()
+    matches = np.fromiter((query in category for category in categories), dtype=bool, count=len(categories))
+    rows = np.flatnonzero(matches)
+    order = np.lexsort((-ids[rows], -ratings[rows]))[:limit]
+    return rows[order]
+
+
+def print_row(size, label, latencies):
+    print(f"{size:>9} {label:>30} {latencies[0]:>9.3f} {latencies[1]:>9.3f}")
+
+
+def bench_sql(args, queries):
+    from db.db import Database
+
+    db = Database(
+        db_name=os.getenv('DB_NAME', 'postgres'), user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'rootpass123'), host=os.getenv('DB_HOST', 'localhost'),
+        port=int(os.getenv('DB_PORT', 5432)),
+    )
+    rating, business_id = FIRST_PAGE_KEY
+    try:
+        size = db.fetch_one("SELECT COUNT(*) AS count FROM Business")['count']
+        print_row(size, "ILIKE LIMIT 3 (unordered)", latency(
+            lambda query: db.fetch_all(LEGACY_CATEGORY, (f"%{query}%",)), queries))
+        print_row(size, f"ranked page of {args.limit}", latency(
+            lambda query: db.fetch_all(
+                STATEMENTS["business_by_category"], (f"%{query}%", Decimal(rating), business_id, args.limit + 1)
+            ), queries))
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=CATALOG_SIZES, help="Catalog sizes to index")
+    parser.add_argument('--queries', type=int, default=300, help="Queries timed per path")
+    parser.add_argument('--limit', type=int, default=10, help="Businesses per page")
+    parser.add_argument('--sql', action='store_true', help="Also time the statements against Postgres")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    queries = make_queries(args.queries, rng)
+    print(f"{'rows':>9} {'path':>30} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for size in args.sizes:
+        frame = make_catalog(size, rng)
+        frame['category'] = [', '.join(category.split()).title() for category in frame['category']]
+        catalog = BusinessCatalog.from_dataframe(frame)
+        categories = [category.lower() for category in frame['category']]
+        del frame
+
+        start = time.perf_counter()
+        index = CategoryIndex(catalog)
+        build = time.perf_counter() - start
+        ratings, ids = catalog.numeric['rating'], catalog.numeric['id']
+
+        print_row(size, "ILIKE-style scan + sort", latency(
+            lambda query: scan(categories, ratings, ids, query, args.limit), queries))
+        print_row(size, "CategoryIndex page", latency(
+            lambda query: index.search(query, limit=args.limit), queries))
+        print(f"{size:>9} {'index build (s)':>30} {build:>9.3f}")
+    if args.sql:
+        bench_sql(args, queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark building the sparse top-k NeighbourStore at 10k, 100k and 1M businesses: build time,
+peak traced memory during the blocked build, and resident size against a dense N x N matrix.
+
+The build is O(N^2) in similarity evaluations, so the 1M case takes a long time on one core;
+pass --sizes to run a subset. Run from the backend directory:
+    python -m benchmarks.bench_neighbours --sizes 10000 100000
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from services.recommendation.neighbours import DEFAULT_BLOCK_CELLS, NeighbourStore
+
+CATALOG_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def make_features(size, rng, vocabulary_size=2000, tokens_per_business=5):
+    vocabulary = np.array([f"term{i}" for i in range(vocabulary_size)])
+    documents = [' '.join(rng.choice(vocabulary, tokens_per_business)) for _ in range(size)]
+    return TfidfVectorizer().fit_transform(documents)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=CATALOG_SIZES, help="Catalog sizes to build")
+    parser.add_argument('--k', type=int, default=20, help="Neighbours kept per business")
+    parser.add_argument('--block-cells', type=int, default=DEFAULT_BLOCK_CELLS, help="Similarities per block")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'rows':>9} {'build (s)':>10} {'peak build (MB)':>16} {'store (MB)':>11} {'dense N^2 (MB)':>15}")
+    for size in args.sizes:
+        features = make_features(size, rng)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        store = NeighbourStore.build(features, args.k, block_cells=args.block_cells)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        dense_mb = size * size * 8 / 1e6
+        print(f"{size:>9} {elapsed:>10.2f} {peak / 1e6:>16.1f} {store.nbytes / 1e6:>11.1f} {dense_mb:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+p50/p99 latency of GetBusinessByProximity served from the in-memory ProximityIndex, against
+the per-row work the proximity query otherwise does.
+
+Each size builds a synthetic catalog with businesses clustered around city centres and
+calls the BusinessService handler directly, so the index timings include materializing the
+rows and building the response. Without a database, the comparison is a haversine scan and
+sort over every business, which is what Postgres evaluates without a spatial index (network
+and executor overhead come on top). With --sql the handler also runs against Postgres through
+the prepared business_by_proximity statement, using the DB_* variables. Apply
+db/migrations/001_spatial_index.sql first to measure the indexed plan.
+
+Run from the backend directory:
+    python -m benchmarks.bench_proximity --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from benchmarks.bench_spatial import brute_nearest, make_points, make_queries
+from benchmarks.bench_startup import make_catalog
+from codegen import business_service_pb2 as pb2
+from services.business.business_service import BusinessService
+from services.business.proximity_index import ProximityIndex
+from services.recommendation.catalog import BusinessCatalog
+
+CATALOG_SIZES = [10_000, 100_000, 1_000_000]
+
+
+class Context:
+    """
+    Minimal servicer context that records the status code.
+    """
+
+    def __init__(self):
+        self.code = None
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        pass
+
+
+def time_requests(service, requests):
+    """
+    :return: (p50, p99) latency in milliseconds.
+    """
+    latencies = []
+    for request in requests:
+        start = time.perf_counter()
+        service.GetBusinessByProximity(request, Context())
+        latencies.append(time.perf_counter() - start)
+    return tuple(np.percentile(latencies, [50, 99]) * 1000)
+
+
+def time_scan(latitudes, longitudes, requests):
+    latencies = []
+    for request in requests:
+        start = time.perf_counter()
+        brute_nearest(latitudes, longitudes, request.latitude, request.longitude, request.limit)
+        latencies.append(time.perf_counter() - start)
+    return tuple(np.percentile(latencies, [50, 99]) * 1000)
+
+
+def connect():
+    from db.db import Database
+    from db.queries import STATEMENTS
+
+    db = Database(
+        db_name=os.getenv('DB_NAME', 'postgres'), user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'rootpass123'), host=os.getenv('DB_HOST', 'localhost'),
+        port=int(os.getenv('DB_PORT', 5432)),
+    )
+    db.register_statements(STATEMENTS)
+    return db
+
+
+def print_row(size, label, latencies):
+    print(f"{size:>9} {label:>24} {latencies[0]:>9.3f} {latencies[1]:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=CATALOG_SIZES, help="Catalog sizes to index")
+    parser.add_argument('--requests', type=int, default=1000, help="Requests timed per path")
+    parser.add_argument('--limit', type=int, default=10, help="Businesses per request")
+    parser.add_argument('--sql', action='store_true', help="Also time the handler against Postgres")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    db = connect() if args.sql else None
+    print(f"{'rows':>9} {'path':>24} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    try:
+        for size in args.sizes:
+            frame = make_catalog(size, rng)
+            frame['latitude'], frame['longitude'] = make_points(size, rng)
+            catalog = BusinessCatalog.from_dataframe(frame)
+            del frame
+
+            start = time.perf_counter()
+            proximity_index = ProximityIndex(catalog)
+            build = time.perf_counter() - start
+            proximity_index.mark_synced()
+
+            latitudes, longitudes = catalog.numeric['latitude'], catalog.numeric['longitude']
+            queries = make_queries(latitudes, longitudes, args.requests, rng)
+            requests = [
+                pb2.BusinessByProximityRequest(latitude=latitude, longitude=longitude, limit=args.limit)
+                for latitude, longitude in zip(*queries)
+            ]
+
+            print_row(size, "ProximityIndex handler", time_requests(
+                BusinessService(db=None, kafka_producer=None, proximity_index=proximity_index), requests))
+            print_row(size, "haversine scan + sort", time_scan(latitudes, longitudes, requests))
+            print(f"{size:>9} {'index build (s)':>24} {build:>9.3f}")
+        if db is not None:
+            # Postgres holds its own catalog, so this row does not depend on --sizes
+            print_row(0, "Postgres handler", time_requests(BusinessService(db=db, kafka_producer=None), requests))
+    finally:
+        if db is not None:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark ranking throughput in-process (gRPC-style thread pool, bound by the GIL) against
+RankingWorkerPool with an increasing number of worker processes.
+
+A synthetic catalog is written as a memory-mapped artifact directory; every configuration
+ranks the same request stream from `--threads` caller threads.
+Run from the backend directory:
+    python -m benchmarks.bench_ranking_processes --rows 500000 --cities 10
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from benchmarks.bench_startup import WORDS, make_catalog
+from services.recommendation.artifacts import artifact_version, load_artifacts, save_artifacts
+from services.recommendation.catalog import BusinessCatalog
+from services.recommendation.city_index import CityIndex
+from services.recommendation.model import ModelHandle, ModelSnapshot
+from services.recommendation.recommendation_service import RecommendationService
+from services.recommendation.worker_pool import RankingWorkerPool
+
+
+def run(service, requests, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda request: service.rank(*request), requests))
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=300_000)
+    parser.add_argument('--cities', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=10, help="Caller threads (the gRPC pool size)")
+    parser.add_argument('--processes', type=int, nargs='+',
+                        default=sorted({1, 2, max(1, (os.cpu_count() or 1) // 2), os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    data = make_catalog(args.rows, rng)
+    cities = [f"City {i}" for i in range(args.cities)]
+    data['city'] = rng.choice(cities, args.rows)
+    vectorizer = TfidfVectorizer(stop_words='english').fit(data['category_features'])
+
+    with tempfile.TemporaryDirectory() as workdir:
+        artifacts_dir = os.path.join(workdir, "artifacts")
+        save_artifacts(artifacts_dir, BusinessCatalog.from_dataframe(data), vectorizer,
+                       CityIndex.from_dataframe(data, vectorizer))
+        del data
+        snapshot = ModelSnapshot(*load_artifacts(artifacts_dir), version=artifact_version(artifacts_dir))
+        model = ModelHandle(snapshot)
+
+        requests = [
+            (list(rng.choice(WORDS, rng.integers(1, 4))), rng.choice(cities).lower(), 10, snapshot)
+            for _ in range(args.requests)
+        ]
+        print(f"rows={args.rows} cities={args.cities} requests={args.requests} "
+              f"caller threads={args.threads} cores={os.cpu_count()}")
+        print(f"{'mode':>14} {'ranks/s':>10} {'speedup':>9}")
+
+        baseline_s, expected = run(RecommendationService(None, None, model), requests, args.threads)
+        print(f"{'in-process':>14} {args.requests / baseline_s:>10.0f} {1.0:>8.1f}x")
+
+        for processes in args.processes:
+            pool = RankingWorkerPool(artifacts_dir, processes=processes)
+            service = RecommendationService(None, None, model, ranker=pool)
+            run(service, requests[:processes * 4], args.threads)  # wait for workers to start and map artifacts
+            elapsed, results = run(service, requests, args.threads)
+            pool.shutdown()
+            assert all(np.array_equal(a[0], b[0]) for a, b in zip(expected, results) if a is not None)
+            label = f"{processes} process{'es' if processes > 1 else ''}"
+            print(f"{label:>14} {args.requests / elapsed:>10.0f} {baseline_s / elapsed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
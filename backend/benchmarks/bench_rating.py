@@ -0,0 +1,128 @@
+"""
+p50/p99 latency of GetBusinessByRating pages by depth, OFFSET against keyset pagination.
+
+Without a database both paths run over a model of the composite rating index: the (rating,
+id) keys in descending order. An OFFSET page walks the index from the start and discards
+the rows of every earlier page; a keyset page seeks to the previous page's key and reads
+only its own rows. With --sql the pages also run against Postgres, using the DB_* variables:
+the business_by_rating statement with OFFSET instead of a key, and as shipped. Apply
+db/migrations/004_rating_index.sql to measure them with the composite index.
+
+Run from the backend directory:
+    python -m benchmarks.bench_rating --size 1000000 --pages 1 10 100 1000 10000
+"""
+import argparse
+import bisect
+import itertools
+import os
+import time
+from decimal import Decimal
+
+import numpy as np
+
+from benchmarks.bench_startup import make_catalog
+from db.queries import STATEMENTS
+from services.business.pagination import FIRST_PAGE_KEY
+
+PAGES = [1, 10, 100, 1000, 10000]
+
+# business_by_rating paged by OFFSET rather than by the previous page's key
+OFFSET_RATING = """
+    SELECT *
+    FROM Business
+    WHERE COALESCE(rating, 0) >= %s
+    ORDER BY COALESCE(rating, 0) DESC, id DESC
+    LIMIT %s OFFSET %s
+"""
+
+
+def latency(fn, runs):
+    """
+    :return: (p50, p99) latency in milliseconds.
+    """
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return tuple(np.percentile(latencies, [50, 99]) * 1000)
+
+
+def offset_page(keys, min_rating, offset, limit):
+    rows = (key for key in keys if -key[0] >= min_rating)
+    return list(itertools.islice(rows, offset, offset + limit))
+
+
+def keyset_page(keys, min_rating, after, limit):
+    start = bisect.bisect_right(keys, (-after[0], -after[1]))
+    return list(itertools.takewhile(lambda key: -key[0] >= min_rating, keys[start:start + limit]))
+
+
+def print_row(page, label, latencies):
+    print(f"{page:>7} {label:>20} {latencies[0]:>9.3f} {latencies[1]:>9.3f}")
+
+
+def bench_sql(args):
+    from db.db import Database
+
+    db = Database(
+        db_name=os.getenv('DB_NAME', 'postgres'), user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'rootpass123'), host=os.getenv('DB_HOST', 'localhost'),
+        port=int(os.getenv('DB_PORT', 5432)),
+    )
+    min_rating = Decimal(f"{args.min_rating:.2f}")
+    try:
+        size = db.fetch_one("SELECT COUNT(*) AS count FROM Business")['count']
+        print(f"Postgres, {size} businesses")
+        for page in args.pages:
+            offset = (page - 1) * args.limit
+            # Key of the last business on the previous page, as a page token would carry it
+            previous = db.fetch_all(OFFSET_RATING, (min_rating, 1, offset - 1)) if offset else []
+            if offset and not previous:
+                break
+            rating, business_id = (previous[0]['rating'] or 0, previous[0]['id']) if previous else FIRST_PAGE_KEY
+            print_row(page, "OFFSET", latency(
+                lambda: db.fetch_all(OFFSET_RATING, (min_rating, args.limit, offset)), args.runs))
+            print_row(page, "keyset", latency(
+                lambda: db.fetch_all(STATEMENTS["business_by_rating"], (
+                    min_rating, Decimal(f"{rating:.2f}"), business_id, args.limit + 1
+                )), args.runs))
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=1_000_000, help="Catalog size")
+    parser.add_argument('--pages', type=int, nargs='+', default=PAGES, help="Page numbers to time")
+    parser.add_argument('--limit', type=int, default=10, help="Businesses per page")
+    parser.add_argument('--min-rating', type=float, default=3.0)
+    parser.add_argument('--runs', type=int, default=50, help="Requests timed per page and path")
+    parser.add_argument('--sql', action='store_true', help="Also time the statements against Postgres")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    frame = make_catalog(args.size, np.random.default_rng(args.seed))
+    # Index entries in ascending (-rating, -id) order, i.e. (rating, id) descending
+    keys = sorted(zip((-frame['rating'].fillna(0)).tolist(), (-frame['id']).tolist()))
+    del frame
+
+    print(f"{'page':>7} {'path':>20} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    print(f"Index model, {args.size} businesses")
+    for page in args.pages:
+        offset = (page - 1) * args.limit
+        previous = offset_page(keys, args.min_rating, offset - 1, 1) if offset else []
+        if offset and not previous:
+            break
+        after = (-previous[0][0], -previous[0][1]) if previous else FIRST_PAGE_KEY
+        assert keyset_page(keys, args.min_rating, after, args.limit) == offset_page(
+            keys, args.min_rating, offset, args.limit
+        )
+        print_row(page, "OFFSET", latency(lambda: offset_page(keys, args.min_rating, offset, args.limit), args.runs))
+        print_row(page, "keyset", latency(lambda: keyset_page(keys, args.min_rating, after, args.limit), args.runs))
+    if args.sql:
+        bench_sql(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Load-test the thread-pool server against the asyncio (grpc.aio) server.
+
+For each SERVER_MODE the benchmark starts `server.py` in a subprocess, waits for the health
+check to report SERVING, then drives it with N concurrent streams (one in-flight RPC each)
+for a fixed duration and reports throughput and latency percentiles. The server needs the
+same Redis/Postgres/Kafka environment as a normal run (see .env).
+
+Run from the backend directory:
+    python -m benchmarks.bench_server_modes
+    python -m benchmarks.bench_server_modes --rpc business --concurrency 100 1000
+    python -m benchmarks.bench_server_modes --target localhost:50051   # an already running server
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+
+import grpc
+import numpy as np
+from grpc_health.v1 import health_pb2, health_pb2_grpc
+
+from codegen import business_service_pb2, business_service_pb2_grpc
+from codegen import recommendation_service_pb2, recommendation_service_pb2_grpc
+
+SERVER_MODES = ["threads", "asyncio"]
+CONCURRENCY_LEVELS = [100, 1000]
+# HTTP/2 streams per client channel; more channels are opened for higher concurrency
+STREAMS_PER_CHANNEL = 100
+STARTUP_TIMEOUT_SECONDS = 180
+
+CITIES = ["philadelphia", "tampa", "indianapolis", "nashville", "tucson", "new orleans", "reno"]
+CATEGORIES = [
+    "pizza", "bars", "coffee", "sushi", "mexican", "burgers", "breakfast", "seafood",
+    "italian", "thai", "bakeries", "chinese", "nightlife", "sandwiches", "vegan",
+]
+
+
+def make_requests(rpc, distinct, max_business_id, rng):
+    """
+    Build the pool of requests the streams cycle through. `distinct` bounds the number of
+    different recommendation queries, and so the steady-state cache hit ratio.
+    """
+    if rpc == "recommendations":
+        return [
+            recommendation_service_pb2.RecommendationRequest(
+                category=list(rng.sample(CATEGORIES, rng.randint(1, 3))), city=rng.choice(CITIES)
+            )
+            for _ in range(distinct)
+        ]
+    return [business_service_pb2.BusinessRequest(id=rng.randint(1, max_business_id)) for _ in range(distinct)]
+
+
+def make_call(channel, rpc):
+    if rpc == "recommendations":
+        return recommendation_service_pb2_grpc.RecommendationServiceStub(channel).GetRecommendations
+    return business_service_pb2_grpc.BusinessServiceStub(channel).GetBusiness
+
+
+async def run_load(target, rpc, requests, concurrency, duration):
+    """
+    Drive `target` with `concurrency` streams for `duration` seconds.
+    :return: (completed RPCs, failed RPCs, latencies in seconds)
+    """
+    channels = [grpc.aio.insecure_channel(target) for _ in range(math.ceil(concurrency / STREAMS_PER_CHANNEL))]
+    calls = [make_call(channel, rpc) for channel in channels]
+    latencies = []
+    failures = 0
+    deadline = time.perf_counter() + duration
+
+    async def stream(worker):
+        nonlocal failures
+        call = calls[worker % len(calls)]
+        position = worker
+        while time.perf_counter() < deadline:
+            request = requests[position % len(requests)]
+            position += concurrency
+            start = time.perf_counter()
+            try:
+                await call(request, timeout=30)
+            except grpc.aio.AioRpcError as e:
+                # NOT_FOUND is a valid answer (unknown city / id), anything else is a failure
+                if e.code() != grpc.StatusCode.NOT_FOUND:
+                    failures += 1
+                    continue
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(stream(worker) for worker in range(concurrency)))
+    for channel in channels:
+        await channel.close()
+    return len(latencies), failures, np.array(latencies)
+
+
+async def warm_up(target, rpc, requests):
+    # Populate caches and prepare statements so every mode is measured in steady state
+    async with grpc.aio.insecure_channel(target) as channel:
+        call = make_call(channel, rpc)
+        for request in requests:
+            try:
+                await call(request, timeout=30)
+            except grpc.aio.AioRpcError:
+                pass
+
+
+def wait_until_serving(target, process):
+    deadline = time.time() + STARTUP_TIMEOUT_SECONDS
+    with grpc.insecure_channel(target) as channel:
+        stub = health_pb2_grpc.HealthStub(channel)
+        while time.time() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode} during startup")
+            try:
+                response = stub.Check(health_pb2.HealthCheckRequest(service=''), timeout=1)
+                if response.status == health_pb2.HealthCheckResponse.SERVING:
+                    return
+            except grpc.RpcError:
+                pass
+            time.sleep(0.5)
+    raise RuntimeError(f"Server did not become healthy within {STARTUP_TIMEOUT_SECONDS}s")
+
+
+def start_server(mode, port):
+    env = dict(os.environ, SERVER_MODE=mode, SERVER_PORT=str(port))
+    return subprocess.Popen([sys.executable, "server.py"], env=env, stdout=subprocess.DEVNULL)
+
+
+def benchmark(label, target, args, requests):
+    asyncio.run(warm_up(target, args.rpc, requests))
+    results = []
+    for concurrency in args.concurrency:
+        completed, failures, latencies = asyncio.run(
+            run_load(target, args.rpc, requests, concurrency, args.duration)
+        )
+        p50, p99 = (np.percentile(latencies, [50, 99]) * 1000) if completed else (float('nan'),) * 2
+        results.append((label, concurrency, completed / args.duration, p50, p99, failures))
+        print(f"{label:>8} {concurrency:>12} {completed / args.duration:>10.0f} {p50:>10.1f} {p99:>10.1f} {failures:>8}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare thread-pool and asyncio server throughput.")
+    parser.add_argument('--modes', nargs='+', default=SERVER_MODES, choices=SERVER_MODES)
+    parser.add_argument('--concurrency', nargs='+', type=int, default=CONCURRENCY_LEVELS)
+    parser.add_argument('--duration', type=float, default=15.0, help="Seconds per concurrency level")
+    parser.add_argument('--rpc', default="recommendations", choices=["recommendations", "business"])
+    parser.add_argument('--distinct', type=int, default=500, help="Distinct requests cycled through")
+    parser.add_argument('--max-business-id', type=int, default=150_000)
+    parser.add_argument('--port', type=int, default=50071, help="Port for spawned servers")
+    parser.add_argument('--target', help="Benchmark an already running server instead of spawning one")
+    args = parser.parse_args()
+
+    requests = make_requests(args.rpc, args.distinct, args.max_business_id, random.Random(0))
+    print(f"rpc={args.rpc} duration={args.duration:.0f}s distinct={args.distinct}")
+    print(f"{'mode':>8} {'concurrency':>12} {'rpc/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'failed':>8}")
+
+    if args.target:
+        benchmark("target", args.target, args, requests)
+        return
+
+    for mode in args.modes:
+        target = f"localhost:{args.port}"
+        process = start_server(mode, args.port)
+        try:
+            wait_until_serving(target, process)
+            benchmark(mode, target, args, requests)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Latency of nearest-k (GetBusinessByProximity) and radius (GetBusinessByLocation) queries.
+
+In memory, the SpatialIndex KD-tree is compared with a brute-force haversine scan over every
+business, which is the work the unindexed SQL does per request. Businesses are clustered
+around city centres like the Yelp catalog. With --sql the same queries also run against
+Postgres: the previous full-sort proximity statement, the current KNN statement and the
+earth_box location statement. Apply db/migrations/001_spatial_index.sql to see the indexed
+plans, and run without it for the baseline. The database is read with the DB_* variables.
+
+Run from the backend directory:
+    python -m benchmarks.bench_spatial --sizes 10000 100000 1000000
+    python -m benchmarks.bench_spatial --sql
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from db.queries import STATEMENTS
+from services.business.spatial_index import EARTH_RADIUS_M, SpatialIndex
+
+CATALOG_SIZES = [10_000, 100_000, 1_000_000]
+
+# business_by_proximity before the GiST index: sorts every row by earth_distance
+LEGACY_PROXIMITY = """
+    SELECT *, (earth_distance(ll_to_earth(latitude, longitude), ll_to_earth(%s, %s))) AS calculated_distance
+    FROM Business
+    ORDER BY calculated_distance ASC
+    LIMIT %s
+"""
+
+
+def make_points(size, rng, cities=200, spread_degrees=0.15):
+    centres = np.column_stack((rng.uniform(25, 49, cities), rng.uniform(-124, -67, cities)))
+    assignment = rng.integers(0, cities, size)
+    points = centres[assignment] + rng.normal(0, spread_degrees, (size, 2))
+    return points[:, 0], points[:, 1]
+
+
+def make_queries(latitudes, longitudes, count, rng):
+    """
+    Query points near random businesses, like users searching around where they are.
+    """
+    picks = rng.integers(0, len(latitudes), count)
+    return latitudes[picks] + rng.normal(0, 0.02, count), longitudes[picks] + rng.normal(0, 0.02, count)
+
+
+def haversine_m(latitude, longitude, latitudes, longitudes):
+    latitude, longitude = np.radians(latitude), np.radians(longitude)
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    a = (np.sin((latitudes - latitude) / 2) ** 2
+         + np.cos(latitude) * np.cos(latitudes) * np.sin((longitudes - longitude) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def brute_nearest(latitudes, longitudes, latitude, longitude, k):
+    distances = haversine_m(latitude, longitude, latitudes, longitudes)
+    nearest = np.argpartition(distances, k)[:k]
+    return nearest[np.argsort(distances[nearest])]
+
+
+def brute_within(latitudes, longitudes, latitude, longitude, radius_m):
+    distances = haversine_m(latitude, longitude, latitudes, longitudes)
+    inside = np.flatnonzero(distances <= radius_m)
+    return inside[np.argsort(distances[inside])]
+
+
+def time_queries(fn, queries):
+    """
+    :return: (p50, p99) latency in milliseconds.
+    """
+    latencies = []
+    for latitude, longitude in zip(*queries):
+        start = time.perf_counter()
+        fn(latitude, longitude)
+        latencies.append(time.perf_counter() - start)
+    return tuple(np.percentile(latencies, [50, 99]) * 1000)
+
+
+def print_row(size, label, latencies):
+    print(f"{size:>9} {label:>28} {latencies[0]:>9.3f} {latencies[1]:>9.3f}")
+
+
+def bench_memory(args, rng):
+    print(f"{'rows':>9} {'method':>28} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for size in args.sizes:
+        latitudes, longitudes = make_points(size, rng)
+        start = time.perf_counter()
+        index = SpatialIndex(np.arange(size), latitudes, longitudes)
+        build = time.perf_counter() - start
+        queries = make_queries(latitudes, longitudes, args.queries, rng)
+
+        # Same answers as the scan, up to ties
+        latitude, longitude = queries[0][0], queries[1][0]
+        ids, _ = index.nearest(latitude, longitude, args.k)
+        assert set(ids) == set(brute_nearest(latitudes, longitudes, latitude, longitude, args.k))
+
+        radius_m = args.radius * 1000
+        print_row(size, f"nearest {args.k}, haversine scan", time_queries(
+            lambda lat, lon: brute_nearest(latitudes, longitudes, lat, lon, args.k), queries))
+        print_row(size, f"nearest {args.k}, SpatialIndex", time_queries(
+            lambda lat, lon: index.nearest(lat, lon, args.k), queries))
+        print_row(size, f"{args.radius:g} km, haversine scan", time_queries(
+            lambda lat, lon: brute_within(latitudes, longitudes, lat, lon, radius_m), queries))
+        print_row(size, f"{args.radius:g} km, SpatialIndex", time_queries(
+            lambda lat, lon: index.within(lat, lon, radius_m), queries))
+        print(f"{size:>9} {'index build (s)':>28} {build:>9.3f}")
+
+
+def bench_sql(args, rng):
+    from db.db import Database
+
+    db = Database(
+        db_name=os.getenv('DB_NAME', 'postgres'), user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'rootpass123'), host=os.getenv('DB_HOST', 'localhost'),
+        port=int(os.getenv('DB_PORT', 5432)),
+    )
+    try:
+        rows = db.fetch_all("SELECT latitude, longitude FROM Business WHERE latitude IS NOT NULL")
+        latitudes = np.array([float(row['latitude']) for row in rows])
+        longitudes = np.array([float(row['longitude']) for row in rows])
+        queries = make_queries(latitudes, longitudes, args.queries, rng)
+
+        statements = [
+            (f"nearest {args.k}, full sort", LEGACY_PROXIMITY, lambda lat, lon: (lat, lon, args.k)),
+            (f"nearest {args.k}, KNN <->", STATEMENTS["business_by_proximity"],
+             lambda lat, lon: (lat, lon, lat, lon, args.k)),
+            (f"{args.radius:g} km, earth_box", STATEMENTS["business_by_location"],
+             lambda lat, lon: (lat, lon, args.radius * 1000)),
+        ]
+        print(f"{'rows':>9} {'statement':>28} {'p50 (ms)':>9} {'p99 (ms)':>9}  plan")
+        for label, query, params in statements:
+            plan = db.fetch_all("EXPLAIN " + query, params(queries[0][0], queries[1][0]))
+            uses_index = any('business_earth_idx' in row['QUERY PLAN'] for row in plan)
+            latencies = time_queries(lambda lat, lon: db.fetch_all(query, params(lat, lon)), queries)
+            print(f"{len(rows):>9} {label:>28} {latencies[0]:>9.3f} {latencies[1]:>9.3f}  "
+                  f"{'index scan' if uses_index else 'sequential scan'}")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=CATALOG_SIZES, help="Catalog sizes to index")
+    parser.add_argument('--queries', type=int, default=500, help="Queries timed per method")
+    parser.add_argument('--k', type=int, default=10, help="Neighbours per nearest-k query")
+    parser.add_argument('--radius', type=float, default=2.0, help="Radius query size in km")
+    parser.add_argument('--sql', action='store_true', help="Benchmark the SQL statements against Postgres")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.sql:
+        bench_sql(args, rng)
+    else:
+        bench_memory(args, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark recommender cold start: unpickling full_data.pkl + tfidf_vectorizer.pkl and building
+the catalog and city index, against opening the equivalent memory-mapped artifact directory.
+
+Each load runs in a fresh subprocess so nothing is shared with the parent interpreter.
+Run from the backend directory:
+    python -m benchmarks.bench_startup
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import dump
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from services.recommendation.artifacts import convert
+
+CATALOG_SIZES = [10_000, 100_000, 500_000]
+
+PICKLE_LOADER = """
+import sys, time
+start = time.perf_counter()
+from joblib import load
+from services.recommendation.catalog import BusinessCatalog
+from services.recommendation.city_index import CityIndex
+data = load(sys.argv[1])
+vectorizer = load(sys.argv[2])
+catalog = BusinessCatalog.from_dataframe(data)
+city_index = CityIndex.from_dataframe(data, vectorizer)
+del data
+print(time.perf_counter() - start)
+"""
+
+ARTIFACT_LOADER = """
+import sys, time
+start = time.perf_counter()
+from services.recommendation.artifacts import load_artifacts
+catalog, vectorizer, city_index = load_artifacts(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+WORDS = [
+    "pizza", "bars", "coffee", "tea", "sushi", "korean", "mexican", "tacos", "burgers", "vegan",
+    "bakeries", "breakfast", "brunch", "cocktail", "wine", "seafood", "steakhouses", "ramen",
+    "thai", "indian", "italian", "french", "delis", "sandwiches", "desserts", "noodles",
+]
+
+
+def make_catalog(size, rng):
+    categories = [' '.join(rng.choice(WORDS, 3)) for _ in range(size)]
+    return pd.DataFrame({
+        'id': np.arange(1, size + 1),
+        'businessid': [f"biz-{i}" for i in range(size)],
+        'name': [f"Business {i}" for i in range(size)],
+        'rating': rng.uniform(1, 5, size).round(1),
+        'review_count': rng.integers(0, 5000, size),
+        'address': [f"{i} Main Street" for i in range(size)],
+        'category': categories,
+        'category_features': categories,
+        'city': rng.choice([f"City {i}" for i in range(200)], size),
+        'state': "NY",
+        'country': "US",
+        'zip_code': "10001",
+        'latitude': rng.uniform(25, 48, size),
+        'longitude': rng.uniform(-124, -67, size),
+        'phone': "555-0100",
+        'price': rng.choice(["$", "$$", "$$$"], size),
+        'image_url': [f"https://images.example.com/{i}.jpg" for i in range(size)],
+        'url': [f"https://example.com/biz/{i}" for i in range(size)],
+    })
+
+
+def time_subprocess(script, *args):
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", script, *args], cwd=backend_dir, check=True, capture_output=True, text=True
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per size (median is reported)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'rows':>8} {'pickles (s)':>12} {'artifacts (s)':>14} {'speedup':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in CATALOG_SIZES:
+            data = make_catalog(size, rng)
+            vectorizer = TfidfVectorizer(stop_words='english').fit(data['category_features'])
+            data_file = os.path.join(workdir, "full_data.pkl")
+            vectorizer_file = os.path.join(workdir, "tfidf_vectorizer.pkl")
+            artifacts_dir = os.path.join(workdir, "artifacts")
+            dump(data, data_file)
+            dump(vectorizer, vectorizer_file)
+            convert(data_file, vectorizer_file, artifacts_dir)
+            del data
+
+            pickle_s = np.median([
+                time_subprocess(PICKLE_LOADER, data_file, vectorizer_file) for _ in range(args.repeat)
+            ])
+            artifact_s = np.median([
+                time_subprocess(ARTIFACT_LOADER, artifacts_dir) for _ in range(args.repeat)
+            ])
+            print(f"{size:>8} {pickle_s:>12.3f} {artifact_s:>14.3f} {pickle_s / artifact_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
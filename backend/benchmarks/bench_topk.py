@@ -0,0 +1,76 @@
+"""
+Benchmark recommendation ranking: the old copy + sort_values + head(10) DataFrame path
+against top_k() on the raw similarity vector, as city size grows from 1k to 1M businesses.
+
+Run from the backend directory:
+    python -m benchmarks.bench_topk
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.recommendation.ranking import top_k
+
+CITY_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def make_city(size, rng, match_rate=0.3):
+    """
+    Build a synthetic city frame and a similarity vector where `match_rate` of rows score > 0.
+    """
+    similarities = rng.random(size)
+    similarities[rng.random(size) > match_rate] = 0.0
+    frame = pd.DataFrame({
+        'name': [f"Business {i}" for i in range(size)],
+        'rating': rng.uniform(1, 5, size),
+        'review_count': rng.integers(0, 5000, size),
+    })
+    return frame, similarities
+
+
+def rank_with_sort(frame, similarities, k):
+    ranked = frame.copy()
+    ranked['category_similarity'] = similarities
+    return (
+        ranked[ranked['category_similarity'] > 0]
+        .sort_values(by='category_similarity', ascending=False)
+        .head(k)
+        .index.to_numpy()
+    )
+
+
+def rank_with_top_k(frame, similarities, k):
+    return top_k(similarities, k)
+
+
+def time_call(fn, repeat, *args):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--k', type=int, default=10, help="Number of recommendations to select")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per size (median is reported)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'city size':>10} {'sort_values (ms)':>18} {'top_k (ms)':>12} {'speedup':>9}")
+    for size in CITY_SIZES:
+        frame, similarities = make_city(size, rng)
+        expected = rank_with_sort(frame, similarities, args.k)
+        assert np.array_equal(np.sort(expected), np.sort(rank_with_top_k(frame, similarities, args.k)))
+
+        sort_ms = time_call(rank_with_sort, args.repeat, frame, similarities, args.k)
+        top_k_ms = time_call(rank_with_top_k, args.repeat, frame, similarities, args.k)
+        print(f"{size:>10} {sort_ms:>18.3f} {top_k_ms:>12.3f} {sort_ms / top_k_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
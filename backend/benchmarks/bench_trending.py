@@ -0,0 +1,116 @@
+"""
+p50/p99 latency of GetTrendingBusinesses lists from the in-memory TrendingIndex, against
+ranking the catalog by review_count per request, plus the cost of folding in a new business.
+
+Without a database the baseline is what the trending statement does without an index: sort
+every business (or every business in the city) by review_count. With --sql the statements
+also run against Postgres, using the DB_* variables: the previous `ORDER BY review_count
+DESC LIMIT 3` and the global and per-city statements of the cold path. Apply
+db/migrations/003_trending_indexes.sql to measure them with the review_count indexes.
+
+Run from the backend directory:
+    python -m benchmarks.bench_trending --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from benchmarks.bench_startup import make_catalog
+from cache.keys import canonical_city
+from db.queries import STATEMENTS
+from services.business.trending import TRENDING_DEPTH, TrendingIndex
+from services.recommendation.catalog import BusinessCatalog
+
+CATALOG_SIZES = [10_000, 100_000, 1_000_000]
+
+# business_trending before the materialized lists
+LEGACY_TRENDING = "SELECT * FROM Business ORDER BY review_count DESC LIMIT 3"
+
+
+def latency(fn, queries):
+    """
+    :return: (p50, p99) latency in milliseconds.
+    """
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        latencies.append(time.perf_counter() - start)
+    return tuple(np.percentile(latencies, [50, 99]) * 1000)
+
+
+def scan(cities, review_counts, ids, city, limit):
+    rows = np.flatnonzero(cities == city) if city else np.arange(len(review_counts))
+    order = np.lexsort((-ids[rows], -review_counts[rows]))[:limit]
+    return rows[order]
+
+
+def print_row(size, label, latencies):
+    print(f"{size:>9} {label:>30} {latencies[0]:>9.3f} {latencies[1]:>9.3f}")
+
+
+def bench_sql(args, cities):
+    from db.db import Database
+
+    db = Database(
+        db_name=os.getenv('DB_NAME', 'postgres'), user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'rootpass123'), host=os.getenv('DB_HOST', 'localhost'),
+        port=int(os.getenv('DB_PORT', 5432)),
+    )
+    try:
+        size = db.fetch_one("SELECT COUNT(*) AS count FROM Business")['count']
+        print_row(size, "LIMIT 3 (previous)", latency(lambda _: db.fetch_all(LEGACY_TRENDING), range(args.queries)))
+        print_row(size, f"global top {args.depth}", latency(
+            lambda _: db.fetch_all(STATEMENTS["business_trending"], (args.depth,)), range(args.queries)))
+        print_row(size, f"city top {args.depth}", latency(
+            lambda city: db.fetch_all(STATEMENTS["business_trending_by_city"], (city, args.depth)), cities))
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=CATALOG_SIZES, help="Catalog sizes to index")
+    parser.add_argument('--queries', type=int, default=300, help="Requests timed per path")
+    parser.add_argument('--limit', type=int, default=10, help="Businesses per request")
+    parser.add_argument('--depth', type=int, default=TRENDING_DEPTH, help="Businesses kept per list")
+    parser.add_argument('--sql', action='store_true', help="Also time the statements against Postgres")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'rows':>9} {'path':>30} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for size in args.sizes:
+        frame = make_catalog(size, rng)
+        catalog = BusinessCatalog.from_dataframe(frame)
+        cities = np.array([canonical_city(city) for city in frame['city']], dtype=object)
+        queries = list(rng.choice(cities, args.queries))
+        del frame
+
+        start = time.perf_counter()
+        index = TrendingIndex(catalog, depth=args.depth)
+        build = time.perf_counter() - start
+        review_counts, ids = catalog.numeric['review_count'], catalog.numeric['id']
+
+        print_row(size, "global sort", latency(
+            lambda _: scan(cities, review_counts, ids, "", args.limit), range(args.queries)))
+        print_row(size, "city filter + sort", latency(
+            lambda city: scan(cities, review_counts, ids, city, args.limit), queries))
+        print_row(size, "TrendingIndex global", latency(lambda _: index.top("", args.limit), range(args.queries)))
+        print_row(size, "TrendingIndex city", latency(lambda city: index.top(city, args.limit), queries))
+
+        next_id = int(ids.max()) + 1
+        businesses = [
+            {'id': next_id + i, 'review_count': int(rng.integers(0, 1000)), 'city': city}
+            for i, city in enumerate(queries)
+        ]
+        print_row(size, "TrendingIndex add", latency(lambda business: index.add_businesses([business]), businesses))
+        print(f"{size:>9} {'index build (s)':>30} {build:>9.3f}")
+    if args.sql:
+        bench_sql(args, queries)
+
+
+if __name__ == "__main__":
+    main()
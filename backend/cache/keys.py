@@ -0,0 +1,44 @@
+"""
+Canonical form of recommendation queries and the cache keys derived from it.
+
+TF-IDF scoring of a query ignores the order of its categories, their case and surrounding
+whitespace, so ["Pizza", "Bars"] and ["bars", " pizza "] are the same query. Categories are
+trimmed (inner whitespace collapsed), lower-cased, de-duplicated and sorted, and queries are
+ranked in that form, so every spelling of a query shares one cache entry and one result.
+"""
+import hashlib
+
+
+def canonical_city(city):
+    return " ".join(city.split()).lower()
+
+
+def canonical_categories(categories):
+    """
+    :return: Sorted list of distinct, normalized, non-empty categories.
+    """
+    return sorted({" ".join(category.split()).lower() for category in categories} - {""})
+
+
+def canonical_query(categories, city):
+    """
+    :return: (categories, city) in canonical form.
+    """
+    return canonical_categories(categories), canonical_city(city)
+
+
+def query_hash(categories, city):
+    """
+    Stable digest of a query's canonical form.
+    """
+    categories, city = canonical_query(categories, city)
+    # Unit/record separators cannot appear in category or city names
+    text = "\x1f".join(categories) + "\x1e" + city
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:20]
+
+
+def recommendation_key(categories, city):
+    """
+    Redis key of the serialized RecommendationResponse for a query.
+    """
+    return f"recommendations:q:{query_hash(categories, city)}"
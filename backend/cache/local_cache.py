@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+
+from monitoring.metrics import metrics
+
+
+class LocalCache:
+    """
+    Bounded, thread-safe in-process cache with LRU eviction and per-entry TTL.
+
+    Hit, miss, eviction, expiration and invalidation counts are recorded in the metrics
+    registry as `{name}_hits`, `{name}_misses`, ... and the entry count as `{name}_entries`.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, name="l1_cache"):
+        """
+        :param max_entries: Entries kept before the least recently used one is evicted.
+        :param ttl_seconds: Default lifetime of an entry.
+        :param name: Prefix of the cache's metric names.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation; see `generation()`
+        self._generation = 0
+
+    def get(self, key):
+        """
+        :return: The cached value, or None if the key is absent or expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    metrics.counter(f"{self.name}_hits").inc()
+                    return value
+                del self._entries[key]
+                metrics.counter(f"{self.name}_expirations").inc()
+        metrics.counter(f"{self.name}_misses").inc()
+        return None
+
+    def generation(self):
+        """
+        Current invalidation generation. Read it before fetching a value from the backing
+        store and pass it to `set()`, so a value fetched before a concurrent invalidation
+        is not cached after it.
+        """
+        return self._generation
+
+    def set(self, key, value, ttl_seconds=None, generation=None):
+        """
+        Cache a value, evicting least recently used entries beyond `max_entries`.
+
+        :param ttl_seconds: Lifetime of this entry, capped at the cache's TTL.
+        :param generation: Value of `generation()` when the value was read; the value is
+            dropped if an invalidation has happened since.
+        """
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            size = len(self._entries)
+        if evicted:
+            metrics.counter(f"{self.name}_evictions").inc(evicted)
+        metrics.gauge(f"{self.name}_entries").set(size)
+
+    def invalidate(self, *keys):
+        """
+        Drop keys (present or not) and advance the invalidation generation.
+        """
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+            size = len(self._entries)
+        metrics.counter(f"{self.name}_invalidations").inc(len(keys))
+        metrics.gauge(f"{self.name}_entries").set(size)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+        metrics.gauge(f"{self.name}_entries").set(0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """
+        Hit/miss/eviction counts and the hit ratio.
+        """
+        hits = metrics.counter(f"{self.name}_hits").value
+        misses = metrics.counter(f"{self.name}_misses").value
+        return {
+            "entries": len(self._entries),
+            "hits": hits,
+            "misses": misses,
+            "evictions": metrics.counter(f"{self.name}_evictions").value,
+            "expirations": metrics.counter(f"{self.name}_expirations").value,
+            "invalidations": metrics.counter(f"{self.name}_invalidations").value,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+        }
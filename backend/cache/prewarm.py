@@ -0,0 +1,188 @@
+"""
+Pre-warm the recommendation cache with the most common preference combinations.
+
+After a deploy or a Redis flush every user's first request misses the cache. This job reads
+the distinct preference documents in Users, merges them by canonical query, and ranks the
+most frequent ones in batches with `rank_many`, spread over worker processes that
+memory-map the model artifacts. The serialized responses are written to Redis with one
+pipelined round trip per batch. TTLs are jittered so the warmed keys do not all expire
+together.
+
+Run from the backend directory:
+    python -m cache.prewarm --top 5000
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import redis
+
+from cache.keys import canonical_query, recommendation_key
+from services.recommendation.artifacts import ARTIFACTS_DIR, artifacts_exist
+from services.recommendation.recommendation_service import (
+    BATCH_QUERY_BLOCK, CACHE_STALE_SECONDS, CACHE_TTL_SECONDS, RECOMMENDATION_LIMIT, RecommendationService
+)
+
+# Recommendation service over the model loaded in each worker process
+_worker_service = None
+
+
+def top_queries(db, limit):
+    """
+    Most frequent preference combinations, merged by canonical query.
+
+    :return: List of ((categories, city), users) pairs, most common first.
+    """
+    counts = Counter()
+    for row in db.fetch_all_prepared("user_preference_counts") or []:
+        try:
+            preferences = json.loads(row["preferences"])
+            query = canonical_query(preferences["category"], preferences["city"])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            logging.warning(f"Skipping malformed preferences: {row['preferences']}")
+            continue
+        if query[0] and query[1]:
+            counts[(tuple(query[0]), query[1])] += row["users"]
+    return [((list(categories), city), users) for (categories, city), users in counts.most_common(limit)]
+
+
+def load_service(artifacts_dir, data_file, vectorizer_file):
+    """
+    RecommendationService without Redis or a database, over the artifacts if present or the pickles.
+    """
+    from services.recommendation.artifacts import artifact_version, load_artifacts
+    from services.recommendation.catalog import BusinessCatalog
+    from services.recommendation.city_index import CityIndex
+    from services.recommendation.model import ModelHandle, ModelSnapshot
+
+    if artifacts_exist(artifacts_dir):
+        catalog, vectorizer, city_index = load_artifacts(artifacts_dir)
+        snapshot = ModelSnapshot(catalog, vectorizer, city_index, version=artifact_version(artifacts_dir))
+    else:
+        from joblib import load
+
+        data = load(data_file)
+        vectorizer = load(vectorizer_file)
+        snapshot = ModelSnapshot(
+            BusinessCatalog.from_dataframe(data), vectorizer, CityIndex.from_dataframe(data, vectorizer)
+        )
+    return RecommendationService(redis_client=None, db=None, model=ModelHandle(snapshot))
+
+
+def _init_worker(artifacts_dir):
+    global _worker_service
+    _worker_service = load_service(artifacts_dir, None, None)
+
+
+def rank_batch(service, queries, limit=RECOMMENDATION_LIMIT):
+    """
+    :return: Serialized RecommendationResponse per query; b"" where nothing matched.
+    """
+    snapshot = service.model.current()
+    ranked = service.rank_many(queries, k=limit, snapshot=snapshot)
+    return [result.SerializeToString() for result in service.batch_response(ranked, snapshot).results]
+
+
+def _rank_batch_in_worker(queries):
+    return rank_batch(_worker_service, queries)
+
+
+def write_batch(redis_client, queries, results, jitter, rng):
+    """
+    SET every non-empty result in one pipelined round trip.
+
+    :param jitter: Fraction of CACHE_TTL_SECONDS by which each key's TTL is shortened at random.
+    :return: Number of keys written.
+    """
+    pipeline = redis_client.pipeline(transaction=False)
+    written = 0
+    for (categories, city), serialized in zip(queries, results):
+        if not serialized:
+            continue
+        ttl = CACHE_TTL_SECONDS + CACHE_STALE_SECONDS - rng.randint(0, int(CACHE_TTL_SECONDS * jitter))
+        pipeline.set(recommendation_key(categories, city), serialized, ex=ttl)
+        written += 1
+    pipeline.execute()
+    return written
+
+
+def prewarm(db, redis_client, top, batch_size, processes, artifacts_dir, data_file, vectorizer_file, jitter):
+    """
+    :return: Dictionary of counts and timings.
+    """
+    start = time.perf_counter()
+    queries = [query for query, _ in top_queries(db, top)]
+    queried = time.perf_counter()
+    batches = [queries[i:i + batch_size] for i in range(0, len(queries), batch_size)]
+    rng = random.Random()
+
+    written = 0
+    if processes > 1 and artifacts_exist(artifacts_dir):
+        # Workers memory-map the artifacts; batches are written as they complete
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(artifacts_dir,),
+        ) as executor:
+            for batch, results in zip(batches, executor.map(_rank_batch_in_worker, batches)):
+                written += write_batch(redis_client, batch, results, jitter, rng)
+    else:
+        service = load_service(artifacts_dir, data_file, vectorizer_file)
+        for batch in batches:
+            written += write_batch(redis_client, batch, rank_batch(service, batch), jitter, rng)
+
+    return {
+        "queries": len(queries),
+        "keys": written,
+        "query_seconds": queried - start,
+        "elapsed_seconds": time.perf_counter() - start,
+    }
+
+
+def main():
+    from db.db import Database
+    from db.queries import STATEMENTS
+
+    parser = argparse.ArgumentParser(description="Pre-warm the recommendation cache from user preferences.")
+    parser.add_argument('--top', type=int, default=5000, help="Number of most common preference combinations")
+    parser.add_argument('--batch-size', type=int, default=BATCH_QUERY_BLOCK, help="Queries ranked and written per batch")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help="Ranking processes (needs artifacts)")
+    parser.add_argument('--jitter', type=float, default=0.1, help="Fraction of the TTL to randomize")
+    parser.add_argument('--artifacts', default=ARTIFACTS_DIR)
+    parser.add_argument('--data', default="data/full_data.pkl", help="Pickled catalog, if there are no artifacts")
+    parser.add_argument('--vectorizer', default="data/tfidf_vectorizer.pkl")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db = Database(
+        db_name=os.getenv('DB_NAME', 'postgres'), user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'rootpass123'), host=os.getenv('DB_HOST', 'localhost'),
+        port=int(os.getenv('DB_PORT', 5432)),
+    )
+    db.register_statements(STATEMENTS)
+    redis_client = redis.Redis(
+        host=os.getenv('REDIS_HOST', 'redis-service'), port=int(os.getenv('REDIS_PORT', 6379)), decode_responses=False
+    )
+    try:
+        stats = prewarm(
+            db, redis_client, args.top, args.batch_size, args.processes,
+            args.artifacts, args.data, args.vectorizer, args.jitter,
+        )
+    finally:
+        db.close()
+
+    elapsed = stats["elapsed_seconds"]
+    print(f"Warmed {stats['keys']} keys for {stats['queries']} preference combinations in {elapsed:.2f}s "
+          f"({stats['keys'] / elapsed if elapsed else 0:.0f} keys/s; reading preferences took "
+          f"{stats['query_seconds']:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Request coalescing ("single-flight") for expensive cache fills.
+
+Concurrent callers that miss the same key share one computation: within a process the
+first caller leads and the rest wait for its result, and across processes the leader
+also takes a short-lived Redis lock so other replicas wait for the value it caches
+instead of recomputing it. `refresh()` recomputes a key in the background, which lets
+callers keep serving a stale value while it is revalidated.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent import futures
+
+import redis
+from redis.exceptions import LockError
+
+from monitoring.metrics import metrics
+
+LOCK_PREFIX = "lock:"
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _LeaderCancelled(Exception):
+    """
+    Set on an AsyncSingleFlight call whose leader was cancelled; followers compute themselves.
+    """
+
+
+class SingleFlight:
+    def __init__(self, redis_client=None, lock_timeout=10.0, wait_timeout=5.0, poll_interval=0.05, refresh_workers=2):
+        """
+        :param redis_client: Redis client for the cross-process lock; None coalesces in-process only.
+        :param lock_timeout: Seconds before a lock held by a crashed leader expires.
+        :param wait_timeout: Longest a caller waits on another process before computing itself.
+        :param poll_interval: Seconds between checks for the other process's result.
+        :param refresh_workers: Threads running background refreshes.
+        """
+        self.redis = redis_client
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._refresher = futures.ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="refresh")
+
+    def do(self, key, compute, read=None):
+        """
+        Return `compute()`, running it at most once at a time per key.
+
+        :param key: Key the computation fills.
+        :param compute: Callable that computes (and caches) the value.
+        :param read: Callable returning the cached value or None, polled while another
+            process holds the key's lock; None computes without waiting.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.counter("single_flight_coalesced").inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_locked(key, compute, read)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def refresh(self, key, compute):
+        """
+        Recompute a key in the background unless it is already being computed here or,
+        holding the lock, by another process.
+        """
+        with self._lock:
+            if key in self._calls or key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._refresher.submit(self._refresh, key, compute)
+
+    def _refresh(self, key, compute):
+        try:
+            self._run_locked(key, compute, read=None, wait=False)
+        except Exception as e:
+            logging.error(f"Background refresh of {key} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _run_locked(self, key, compute, read, wait=True):
+        if self.redis is None:
+            return compute()
+        lock = self.redis.lock(LOCK_PREFIX + key, timeout=self.lock_timeout, blocking=False)
+        try:
+            acquired = lock.acquire()
+        except redis.RedisError as e:
+            logging.error(f"Could not take lock for {key}: {e}")
+            return compute()
+
+        if acquired:
+            try:
+                return compute()
+            finally:
+                try:
+                    lock.release()
+                except LockError:
+                    pass  # Expired while computing; another process may hold it now
+        if not wait:
+            return None
+
+        # Another process is computing the value; wait for it to be cached
+        metrics.counter("single_flight_lock_waits").inc()
+        deadline = time.monotonic() + self.wait_timeout
+        while read is not None and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value = read()
+            if value is not None:
+                return value
+            if not lock.locked():
+                break  # Released without caching a value (e.g. nothing matched)
+        return compute()
+
+    def shutdown(self):
+        self._refresher.shutdown(wait=False)
+
+
+class AsyncSingleFlight:
+    """
+    asyncio variant of SingleFlight; `compute` and `read` are coroutine functions.
+    """
+
+    def __init__(self, redis_client=None, lock_timeout=10.0, wait_timeout=5.0, poll_interval=0.05):
+        """
+        :param redis_client: redis.asyncio client for the cross-process lock; None coalesces in-process only.
+        :param lock_timeout: Seconds before a lock held by a crashed leader expires.
+        :param wait_timeout: Longest a caller waits on another process before computing itself.
+        :param poll_interval: Seconds between checks for the other process's result.
+        """
+        self.redis = redis_client
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._refreshing = {}
+
+    async def do(self, key, compute, read=None):
+        """
+        Return `await compute()`, running it at most once at a time per key.
+        """
+        call = self._calls.get(key)
+        if call is not None:
+            metrics.counter("single_flight_coalesced").inc()
+        while call is not None:
+            try:
+                return await asyncio.shield(call)
+            except _LeaderCancelled:
+                # The leader's caller went away; the first follower to get here leads instead
+                call = self._calls.get(key)
+
+        call = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await self._run_locked(key, compute, read)
+        except asyncio.CancelledError:
+            # Only this caller was cancelled: hand the computation to the followers
+            call.set_exception(_LeaderCancelled())
+            call.exception()
+            raise
+        except Exception as e:
+            call.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting
+            call.exception()
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def refresh(self, key, compute):
+        """
+        Recompute a key in a background task unless it is already being computed.
+        """
+        if key in self._calls or key in self._refreshing:
+            return
+        # Holding the task also keeps it from being garbage collected before it finishes
+        self._refreshing[key] = asyncio.get_running_loop().create_task(self._refresh(key, compute))
+
+    async def _refresh(self, key, compute):
+        try:
+            await self._run_locked(key, compute, read=None, wait=False)
+        except Exception as e:
+            logging.error(f"Background refresh of {key} failed: {e}")
+        finally:
+            del self._refreshing[key]
+
+    async def _run_locked(self, key, compute, read, wait=True):
+        if self.redis is None:
+            return await compute()
+        lock = self.redis.lock(LOCK_PREFIX + key, timeout=self.lock_timeout, blocking=False)
+        try:
+            acquired = await lock.acquire()
+        except redis.RedisError as e:
+            logging.error(f"Could not take lock for {key}: {e}")
+            return await compute()
+
+        if acquired:
+            try:
+                return await compute()
+            finally:
+                try:
+                    await lock.release()
+                except LockError:
+                    pass
+        if not wait:
+            return None
+
+        metrics.counter("single_flight_lock_waits").inc()
+        deadline = time.monotonic() + self.wait_timeout
+        while read is not None and time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            value = await read()
+            if value is not None:
+                return value
+            if not await lock.locked():
+                break
+        return await compute()
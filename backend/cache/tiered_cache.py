@@ -0,0 +1,309 @@
+"""
+Redis clients fronted by an in-process LocalCache (L1).
+
+Reads of keys under the cached prefixes are answered from the L1 when possible and fall
+through to Redis otherwise; writes go to both. Deleting a cached key evicts it locally and
+publishes the key on a Redis pub/sub channel, where every replica's InvalidationListener
+evicts it from its own L1. Entries also expire after the L1 TTL, which bounds staleness if
+an invalidation message is lost.
+
+`get_with_ttl()` also reports how long the Redis entry has left to live, so callers can
+serve a value that is about to expire while revalidating it.
+"""
+import json
+import logging
+import threading
+import time
+
+import redis
+
+DEFAULT_PREFIXES = ("recommendations:", "trending:")
+DEFAULT_INVALIDATION_CHANNEL = "cache-invalidation"
+
+
+def _as_str(key):
+    return key.decode("utf-8") if isinstance(key, bytes) else key
+
+
+def _ttl_seconds(ttl_ms):
+    # PTTL is -1 for a key without expiry and -2 for a missing key
+    return ttl_ms / 1000 if ttl_ms >= 0 else None
+
+
+def read_with_ttl(redis_client, key):
+    """
+    GET a key and its remaining TTL in one round trip.
+
+    :return: (value, seconds until the key expires, or None if it does not expire)
+    """
+    pipeline = redis_client.pipeline(transaction=False)
+    pipeline.get(key)
+    pipeline.pttl(key)
+    value, ttl_ms = pipeline.execute()
+    return value, _ttl_seconds(ttl_ms)
+
+
+async def async_read_with_ttl(redis_client, key):
+    """
+    asyncio variant of `read_with_ttl`.
+    """
+    pipeline = redis_client.pipeline(transaction=False)
+    pipeline.get(key)
+    pipeline.pttl(key)
+    value, ttl_ms = await pipeline.execute()
+    return value, _ttl_seconds(ttl_ms)
+
+
+def get_with_ttl(redis_client, key, min_ttl=0):
+    """
+    `read_with_ttl` through the L1 when `redis_client` is a CachedRedis. L1 entries with
+    `min_ttl` seconds or less left in Redis are read from Redis again, since another
+    replica may have refreshed them.
+    """
+    if isinstance(redis_client, CachedRedis):
+        return redis_client.get_with_ttl(key, min_ttl)
+    return read_with_ttl(redis_client, key)
+
+
+async def async_get_with_ttl(redis_client, key, min_ttl=0):
+    if isinstance(redis_client, AsyncCachedRedis):
+        return await redis_client.get_with_ttl(key, min_ttl)
+    return await async_read_with_ttl(redis_client, key)
+
+
+def set_many(redis_client, items, invalidate=False):
+    """
+    SET many keys in one pipelined round trip.
+
+    :param items: (key, value, ex) triples.
+    :param invalidate: Also publish the keys on the invalidation channel (in the same round
+        trip), so other replicas drop their L1 copies of values being replaced.
+    """
+    if isinstance(redis_client, CachedRedis):
+        return redis_client.set_many(items, invalidate)
+    pipeline = redis_client.pipeline(transaction=False)
+    for key, value, ex in items:
+        pipeline.set(key, value, ex=ex)
+    pipeline.execute()
+
+
+async def async_set_many(redis_client, items, invalidate=False):
+    if isinstance(redis_client, AsyncCachedRedis):
+        return await redis_client.set_many(items, invalidate)
+    pipeline = redis_client.pipeline(transaction=False)
+    for key, value, ex in items:
+        pipeline.set(key, value, ex=ex)
+    await pipeline.execute()
+
+
+class _TieredCacheBase:
+    def __init__(self, redis_client, local_cache, prefixes=DEFAULT_PREFIXES, channel=DEFAULT_INVALIDATION_CHANNEL):
+        """
+        :param redis_client: Redis client the cache sits in front of.
+        :param local_cache: LocalCache holding the L1 entries.
+        :param prefixes: Key prefixes that are cached locally; other keys go straight to Redis.
+        :param channel: Pub/sub channel invalidations are published on.
+        """
+        self.redis = redis_client
+        self.local = local_cache
+        self.prefixes = tuple(prefixes)
+        self.channel = channel
+
+    def is_cached(self, key):
+        return _as_str(key).startswith(self.prefixes)
+
+    # L1 entries are (value, monotonic time the Redis entry expires at, or None if unknown)
+
+    def _local_get(self, key):
+        entry = self.local.get(key)
+        return None if entry is None else entry[0]
+
+    def _local_get_with_ttl(self, key, min_ttl):
+        entry = self.local.get(key)
+        if entry is None:
+            return None, None
+        value, expires_at = entry
+        if expires_at is None:
+            return value, None
+        ttl = expires_at - time.monotonic()
+        return (value, ttl) if ttl > min_ttl else (None, None)
+
+    def _local_set(self, key, value, ttl_seconds, generation=None):
+        expires_at = None if ttl_seconds is None else time.monotonic() + ttl_seconds
+        self.local.set(key, (value, expires_at), ttl_seconds=ttl_seconds, generation=generation)
+
+    def _invalidation_message(self, keys):
+        return json.dumps([_as_str(key) for key in keys])
+
+    def _pipeline_set_many(self, items, invalidate):
+        """
+        :return: Pipeline with the SETs and any invalidation queued.
+        """
+        pipeline = self.redis.pipeline(transaction=False)
+        for key, value, ex in items:
+            pipeline.set(key, value, ex=ex)
+        cached = [key for key, _, _ in items if self.is_cached(key)]
+        if invalidate and cached:
+            self.local.invalidate(*cached)
+            pipeline.publish(self.channel, self._invalidation_message(cached))
+        return pipeline
+
+    def _local_set_many(self, items):
+        for key, value, ex in items:
+            if self.is_cached(key):
+                self._local_set(key, value, ex)
+
+    def __getattr__(self, name):
+        # Everything else (pipeline, ping, publish, ...) is served by Redis directly
+        return getattr(self.redis, name)
+
+
+class CachedRedis(_TieredCacheBase):
+    """
+    Synchronous redis.Redis with an L1 in front of the cached prefixes.
+    """
+
+    def get(self, key):
+        if not self.is_cached(key):
+            return self.redis.get(key)
+        value = self._local_get(key)
+        if value is not None:
+            return value
+        generation = self.local.generation()
+        value = self.redis.get(key)
+        if value is not None:
+            self._local_set(key, value, None, generation=generation)
+        return value
+
+    def get_with_ttl(self, key, min_ttl=0):
+        if not self.is_cached(key):
+            return read_with_ttl(self.redis, key)
+        value, ttl = self._local_get_with_ttl(key, min_ttl)
+        if value is not None:
+            return value, ttl
+        generation = self.local.generation()
+        value, ttl = read_with_ttl(self.redis, key)
+        if value is not None:
+            self._local_set(key, value, ttl, generation=generation)
+        return value, ttl
+
+    def set(self, key, value, ex=None, **kwargs):
+        result = self.redis.set(key, value, ex=ex, **kwargs)
+        # Conditional writes (nx/xx) may not have stored `value`; leave those to the next read
+        if result and not kwargs and self.is_cached(key):
+            self._local_set(key, value, ex)
+        return result
+
+    def set_many(self, items, invalidate=False):
+        pipeline = self._pipeline_set_many(items, invalidate)
+        pipeline.execute()
+        self._local_set_many(items)
+
+    def delete(self, *keys):
+        result = self.redis.delete(*keys)
+        cached = [key for key in keys if self.is_cached(key)]
+        if cached:
+            self.local.invalidate(*cached)
+            self.redis.publish(self.channel, self._invalidation_message(cached))
+        return result
+
+
+class AsyncCachedRedis(_TieredCacheBase):
+    """
+    redis.asyncio.Redis with an L1 in front of the cached prefixes.
+    """
+
+    async def get(self, key):
+        if not self.is_cached(key):
+            return await self.redis.get(key)
+        value = self._local_get(key)
+        if value is not None:
+            return value
+        generation = self.local.generation()
+        value = await self.redis.get(key)
+        if value is not None:
+            self._local_set(key, value, None, generation=generation)
+        return value
+
+    async def get_with_ttl(self, key, min_ttl=0):
+        if not self.is_cached(key):
+            return await async_read_with_ttl(self.redis, key)
+        value, ttl = self._local_get_with_ttl(key, min_ttl)
+        if value is not None:
+            return value, ttl
+        generation = self.local.generation()
+        value, ttl = await async_read_with_ttl(self.redis, key)
+        if value is not None:
+            self._local_set(key, value, ttl, generation=generation)
+        return value, ttl
+
+    async def set(self, key, value, ex=None, **kwargs):
+        result = await self.redis.set(key, value, ex=ex, **kwargs)
+        if result and not kwargs and self.is_cached(key):
+            self._local_set(key, value, ex)
+        return result
+
+    async def set_many(self, items, invalidate=False):
+        pipeline = self._pipeline_set_many(items, invalidate)
+        await pipeline.execute()
+        self._local_set_many(items)
+
+    async def delete(self, *keys):
+        result = await self.redis.delete(*keys)
+        cached = [key for key in keys if self.is_cached(key)]
+        if cached:
+            self.local.invalidate(*cached)
+            await self.redis.publish(self.channel, self._invalidation_message(cached))
+        return result
+
+
+class InvalidationListener(threading.Thread):
+    """
+    Background thread that evicts keys published on the invalidation channel from the L1.
+
+    Invalidations published while the subscription is down are lost, so the L1 is cleared
+    every time the listener (re)subscribes.
+    """
+
+    def __init__(self, redis_client, local_cache, channel=DEFAULT_INVALIDATION_CHANNEL, retry_seconds=1.0):
+        """
+        :param redis_client: Synchronous redis.Redis client to subscribe with.
+        :param local_cache: LocalCache to evict from.
+        :param channel: Pub/sub channel to listen on.
+        :param retry_seconds: Delay before resubscribing after a connection error.
+        """
+        super().__init__(name="cache-invalidation", daemon=True)
+        self.redis = redis_client
+        self.local = local_cache
+        self.channel = channel
+        self.retry_seconds = retry_seconds
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                self.local.clear()
+                logging.info(f"Listening for cache invalidations on {self.channel}")
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message":
+                        self.handle(message["data"])
+            except redis.RedisError as e:
+                logging.error(f"Cache invalidation subscription failed: {e}")
+                self._stopped.wait(self.retry_seconds)
+            finally:
+                pubsub.close()
+
+    def handle(self, data):
+        try:
+            keys = json.loads(data)
+        except ValueError:
+            logging.error(f"Malformed cache invalidation message: {data!r}")
+            self.local.clear()
+            return
+        self.local.invalidate(*keys)
+
+    def stop(self):
+        self._stopped.set()
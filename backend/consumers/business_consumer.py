@@ -1,76 +1,470 @@
-from kafka import KafkaConsumer
+from kafka import KafkaConsumer, KafkaProducer
+from kafka.structs import TopicPartition
 from joblib import dump, load
+import numpy as np
 import pandas as pd
 import json
+import os
+import time
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from consumers.business_journal import BusinessJournal
+from services.recommendation.neighbours import NeighbourStore
+from services.recommendation.artifacts import (
+    ARTIFACTS_DIR, artifact_rows, artifacts_exist, load_artifacts, save_artifacts
+)
+from services.recommendation.catalog import BusinessCatalog
+from services.recommendation.city_index import CityIndex, city_keys
 
-# Load existing data and similarity matrix
+# Load existing data and neighbour store
 DATA_FILE = "data/data.pkl"
-SIMILARITY_MATRIX_FILE = "data/similarity_matrix.pkl"
+NEIGHBOURS_FILE = "data/neighbours.pkl"
+BUSINESS_VECTORIZER_FILE = "data/business_vectorizer.pkl"
+FEATURE_MATRIX_FILE = "data/feature_matrix.pkl"
+RECOMMENDER_VECTORIZER_FILE = "data/tfidf_vectorizer.pkl"
+# The gRPC server's startup catalog, published with the new businesses appended when no
+# artifacts exist yet
+SERVED_DATA_FILE = "data/full_data.pkl"
+# Rows of `data` already published to the recommender artifacts
+PUBLISHED_ROWS_FILE = "data/published_rows.pkl"
+# Incremental updates since the files above were last written in full
+JOURNAL_FILE = "data/business_journal.pkl"
 
+# 'incremental' appends new businesses under the fitted vocabulary; 'full' refits on every message
+CONSUMER_MODE = os.getenv('BUSINESS_CONSUMER_MODE', 'incremental')
+# Refit once this share of tokens seen since the last refit is out of vocabulary
+REFIT_DRIFT_THRESHOLD = float(os.getenv('BUSINESS_REFIT_DRIFT_THRESHOLD', 0.05))
+# Refit at least this often, regardless of drift
+REFIT_INTERVAL_SECONDS = int(os.getenv('BUSINESS_REFIT_INTERVAL_SECONDS', 24 * 3600))
+# Number of most similar businesses kept per business
+NEIGHBOUR_K = int(os.getenv('BUSINESS_NEIGHBOUR_K', 20))
+# Micro-batching: records merged into one catalog update, and the longest wait to fill a batch
+BATCH_MAX_RECORDS = int(os.getenv('BUSINESS_BATCH_MAX_RECORDS', 500))
+BATCH_MAX_WAIT_MS = int(os.getenv('BUSINESS_BATCH_MAX_WAIT_MS', 2000))
+# Rewrite the full snapshot once the journal holds this share of the catalog (and at least
+# JOURNAL_COMPACT_MIN_ROWS businesses)
+JOURNAL_COMPACT_FRACTION = float(os.getenv('BUSINESS_JOURNAL_COMPACT_FRACTION', 0.1))
+JOURNAL_COMPACT_MIN_ROWS = 1000
+# Records that fail on their own are sent here, so their offsets can be committed
+DEAD_LETTER_TOPIC = os.getenv('BUSINESS_DEAD_LETTER_TOPIC', 'new-business-data-dead-letter')
+# Wait before re-consuming records that could be neither persisted nor dead-lettered
+RETRY_SECONDS = 5
+
+journal = BusinessJournal(JOURNAL_FILE)
+data = None
+neighbours = None
+tfidf = None
+feature_matrix = None
+# Ids of the businesses in `data`, so redelivered records are not appended twice
+known_ids = set()
+
+# Served (catalog, vectorizer, city_index), loaded on first artifact publish
+served_model = None
+# Rows of `data` from this position on have not reached the recommender artifacts yet
+published_rows = None
+publish_pending = False
+
+# Vocabulary drift since the last refit
+last_refit_at = time.time()
+tokens_since_refit = 0
+oov_tokens_since_refit = 0
+
+
+def load_state():
+    """
+    Load the last snapshot of the consumer's state and replay the journal on top of it. Also
+    used to roll back the in-memory state when an update fails before it is persisted.
+    """
+    global data, neighbours, tfidf, feature_matrix, known_ids
+
+    try:
+        data = load(DATA_FILE)
+        neighbours = load(NEIGHBOURS_FILE)
+        print("Data and neighbour store loaded successfully.")
+    except FileNotFoundError:
+        data = pd.DataFrame(columns=['id', 'businessid', 'name', 'rating', 'review_count', 'address', 'category', 'city', 'price'])
+        neighbours = None
+        print("Initialized with empty data and neighbour store.")
+
+    try:
+        tfidf = load(BUSINESS_VECTORIZER_FILE)
+        feature_matrix = load(FEATURE_MATRIX_FILE)
+        print("Vectorizer and feature matrix loaded successfully.")
+    except FileNotFoundError:
+        tfidf = None
+        feature_matrix = None
+
+    replayed = 0
+    for entry in journal.entries():
+        start = entry["start"]
+        if start < len(data):
+            # Already in the snapshot (written after this entry, before the journal was cleared)
+            continue
+        if start > len(data) or feature_matrix is None or neighbours is None:
+            print(f"Journal entry at row {start} does not follow the snapshot of {len(data)} rows; "
+                  f"ignoring the rest of the journal.")
+            break
+        data = pd.concat([data, entry["rows"]], ignore_index=True)
+        feature_matrix = sparse.vstack([feature_matrix, entry["vectors"]], format='csr')
+        neighbours.set_rows(entry["neighbour_rows"], entry["neighbour_ids"], entry["neighbour_scores"])
+        replayed += len(entry["rows"])
+    if replayed:
+        print(f"Replayed {replayed} businesses from the journal.")
+    known_ids = set(data['id'].tolist())
+
+
+load_state()
 try:
-    data = load(DATA_FILE)
-    similarity_matrix = load(SIMILARITY_MATRIX_FILE)
-    print("Data and similarity matrix loaded successfully.")
+    published_rows = min(load(PUBLISHED_ROWS_FILE), len(data))
 except FileNotFoundError:
-    data = pd.DataFrame(columns=['id', 'businessid', 'name', 'rating', 'review_count', 'address', 'category', 'city', 'price'])
-    similarity_matrix = None
-    print("Initialized with empty data and similarity matrix.")
+    # Nothing published by this consumer yet: publish businesses received from now on
+    published_rows = len(data)
+publish_pending = bool(ARTIFACTS_DIR) and published_rows < len(data)
 
 
-def update_similarity_matrix(new_data):
+def dump_atomic(value, path):
     """
-    Update the similarity matrix dynamically when new data is added.
+    Dump to a temporary file and rename it into place, so a crash never leaves a partial file.
     """
-    global data, similarity_matrix
+    staging_path = f"{path}.tmp"
+    dump(value, staging_path)
+    os.replace(staging_path, path)
 
-    # Print current length of the similarity matrix
-    current_length = len(data) if not data.empty else 0
-    print(f"Current number of businesses: {current_length}")
 
-    # Combine new data with the existing data
-    data = pd.concat([data, pd.DataFrame([new_data])], ignore_index=True)
-
-    # Recompute combined features and update similarity matrix
-    data['combined_features'] = (
-        data['category'] + ' ' +
-        data['city'] + ' ' +
-        data['price'] + ' ' +
-        data['rating'].apply(lambda x: f"rating_{round(x, 1)}") + ' ' +
-        data['review_count'].apply(lambda x: f"reviews_{int(x // 50)}")
+def save_snapshot():
+    """
+    Write the consumer's whole state and clear the journal it supersedes.
+    """
+    dump_atomic(data, DATA_FILE)
+    dump_atomic(neighbours.compact(), NEIGHBOURS_FILE)
+    dump_atomic(tfidf, BUSINESS_VECTORIZER_FILE)
+    dump_atomic(feature_matrix, FEATURE_MATRIX_FILE)
+    journal.clear()
+    print(f"Snapshot of {len(data)} businesses written.")
+
+
+def build_combined_features(frame):
+    """
+    Build the text fed to the TF-IDF vectorizer for each business.
+    """
+    return (
+        frame['category'] + ' ' +
+        frame['city'] + ' ' +
+        frame['price'] + ' ' +
+        frame['rating'].apply(lambda x: f"rating_{round(x, 1)}") + ' ' +
+        frame['review_count'].apply(lambda x: f"reviews_{int(x // 50)}")
     )
 
+
+def vocabulary_drift():
+    """
+    Share of tokens seen since the last refit that are missing from the fitted vocabulary.
+    """
+    if tokens_since_refit == 0:
+        return 0.0
+    return oov_tokens_since_refit / tokens_since_refit
+
+
+def needs_refit(new_tokens):
+    """
+    Decide whether the next update must refit the vectorizer from scratch.
+    """
+    if CONSUMER_MODE == 'full' or tfidf is None or feature_matrix is None or neighbours is None:
+        return True
+    if feature_matrix.shape[0] != len(data) or neighbours.size != len(data) or neighbours.k != NEIGHBOUR_K:
+        return True
+    if time.time() - last_refit_at >= REFIT_INTERVAL_SECONDS:
+        return True
+
+    oov = sum(1 for token in new_tokens if token not in tfidf.vocabulary_)
+    total = tokens_since_refit + len(new_tokens)
+    return total > 0 and (oov_tokens_since_refit + oov) / total > REFIT_DRIFT_THRESHOLD
+
+
+def refit_model():
+    """
+    Refit the vectorizer and recompute all features and neighbour lists from scratch.
+    """
+    global tfidf, feature_matrix, neighbours
+    global last_refit_at, tokens_since_refit, oov_tokens_since_refit
+
+    data['combined_features'] = build_combined_features(data)
     tfidf = TfidfVectorizer(stop_words='english')
     feature_matrix = tfidf.fit_transform(data['combined_features'])
-    similarity_matrix = cosine_similarity(feature_matrix)
+    neighbours = NeighbourStore.build(feature_matrix, NEIGHBOUR_K)
+
+    last_refit_at = time.time()
+    tokens_since_refit = 0
+    oov_tokens_since_refit = 0
+    print(f"Vectorizer refit with {len(tfidf.vocabulary_)} terms.")
+
+
+def append_incrementally(new_rows, new_tokens):
+    """
+    Vectorize the last `new_rows` rows of `data` under the fitted vocabulary and append them
+    to the feature matrix, updating only the neighbour lists the new businesses enter.
+
+    :return: (vectors of the new rows, row positions whose neighbour lists changed)
+    """
+    global feature_matrix
+    global tokens_since_refit, oov_tokens_since_refit
+
+    start = feature_matrix.shape[0]
+    vectors = tfidf.transform(data['combined_features'].iloc[-new_rows:])
+    feature_matrix = sparse.vstack([feature_matrix, vectors], format='csr')
+    affected = [neighbours.add(feature_matrix) for _ in range(new_rows)]
+    changed = np.unique(np.concatenate(affected + [np.arange(start, start + new_rows)]))
+
+    tokens_since_refit += len(new_tokens)
+    oov_tokens_since_refit += sum(1 for token in new_tokens if token not in tfidf.vocabulary_)
+    return vectors, changed
+
+
+def update_businesses(new_businesses):
+    """
+    Merge a batch of new businesses into the catalog with a single model update and persist it.
+    Businesses already in the catalog are skipped. If the update fails, the in-memory state is
+    rolled back to what was last persisted and the error re-raised.
+    """
+    global data, publish_pending
+
+    for business in new_businesses:
+        if business.get('id') is None:
+            raise ValueError(f"Business without an id: {business}")
+    new_businesses = list({
+        business['id']: business for business in new_businesses if business['id'] not in known_ids
+    }.values())
+    if not new_businesses:
+        print("Every business in the batch is already in the catalog.")
+        return
+
+    try:
+        persist_businesses(new_businesses)
+    except Exception:
+        load_state()
+        raise
+    known_ids.update(business['id'] for business in new_businesses)
+
+    # The artifacts are derived from the persisted catalog, so a failed publish is retried
+    # later rather than failing the batch
+    publish_pending = bool(ARTIFACTS_DIR)
+    publish_if_pending()
 
-    # Save updated data and matrix
-    dump(data, DATA_FILE)
-    dump(similarity_matrix, SIMILARITY_MATRIX_FILE)
 
-    # Print updated length of the similarity matrix
-    updated_length = similarity_matrix.shape[0]
+def persist_businesses(new_businesses):
+    global data
+
+    # Print current size of the neighbour store
+    current_length = len(data) if not data.empty else 0
+    print(f"Current number of businesses: {current_length}")
+
+    # Decide between an incremental append and a full refit before growing the data
+    new_rows = pd.DataFrame(new_businesses)
+    new_rows['combined_features'] = build_combined_features(new_rows)
+    new_tokens = []
+    if tfidf is not None:
+        analyzer = tfidf.build_analyzer()
+        for features in new_rows['combined_features']:
+            new_tokens.extend(analyzer(features))
+    refit = needs_refit(new_tokens)
+
+    # Combine new data with the existing data
+    start = len(data)
+    data = pd.concat([data, new_rows], ignore_index=True)
+
+    if refit:
+        refit_model()
+        save_snapshot()
+    else:
+        vectors, changed = append_incrementally(len(new_rows), new_tokens)
+        print(f"Appended {len(new_rows)} businesses incrementally ({len(changed) - len(new_rows)} neighbour "
+              f"lists updated, vocabulary drift {vocabulary_drift():.1%}).")
+        # Persist only what the batch changed, and the full state once the journal has grown
+        journal.append(
+            start, new_rows, vectors, changed, neighbours.ids[changed], neighbours.scores[changed]
+        )
+        if journal.rows > max(JOURNAL_COMPACT_MIN_ROWS, JOURNAL_COMPACT_FRACTION * len(data)):
+            save_snapshot()
+
+    # Print updated size of the neighbour store
+    updated_length = neighbours.size
     print(f"Updated number of businesses: {updated_length}")
 
-    print("Similarity matrix updated successfully.")
+    print("Neighbour store updated successfully.")
+
+
+def publish_if_pending():
+    global publish_pending
+
+    if not publish_pending:
+        return
+    try:
+        publish_recommender_artifacts()
+        publish_pending = False
+    except Exception as e:
+        print(f"Error publishing recommender artifacts, retrying after the next poll: {e}")
+
+
+def load_served_model():
+    """
+    The catalog the servers are serving: the published artifacts, or the startup catalog
+    pickle if nothing has been published yet.
+
+    :return: (catalog, vectorizer, city_index)
+    """
+    if artifacts_exist(ARTIFACTS_DIR):
+        return load_artifacts(ARTIFACTS_DIR)
+    served_data = load(SERVED_DATA_FILE)
+    vectorizer = load(RECOMMENDER_VECTORIZER_FILE)
+    return BusinessCatalog.from_dataframe(served_data), vectorizer, CityIndex.from_dataframe(served_data, vectorizer)
+
+
+def publish_recommender_artifacts():
+    """
+    Append the businesses received since the last publish to the served catalog and export
+    it as recommender artifacts, so running servers hot-swap it in. Only the new rows are
+    encoded and vectorized; cities without new businesses keep their index entries.
+    Businesses received from Kafka have no `category_features`, so their category is used.
+    """
+    global served_model, published_rows
+
+    if served_model is None:
+        served_model = load_served_model()
+    catalog, vectorizer, city_index = served_model
+
+    new_rows = data.iloc[published_rows:]
+    new_rows = new_rows[~new_rows['id'].isin(catalog.numeric['id'])].drop_duplicates('id')
+    if not new_rows.empty:
+        features = new_rows['category_features'] if 'category_features' in new_rows else new_rows['category']
+        new_rows = new_rows.assign(category_features=features.fillna(new_rows['category']))
+        updated_catalog = catalog.append(new_rows)
+        updated_city_index = city_index.append(
+            len(catalog), city_keys(new_rows['city']), vectorizer.transform(new_rows['category_features'].fillna(''))
+        )
+
+        # Never replace the live catalog with a smaller one, e.g. one built from another dataset
+        live_rows = artifact_rows(ARTIFACTS_DIR)
+        if len(updated_catalog) < live_rows:
+            # Published by someone else meanwhile; start from their artifacts on the next attempt
+            served_model = None
+            raise ValueError(
+                f"Refusing to publish {len(updated_catalog)} businesses over the {live_rows} being served"
+            )
+        save_artifacts(ARTIFACTS_DIR, updated_catalog, vectorizer, updated_city_index)
+        # Reopen memory-mapped rather than keeping the copies in memory
+        served_model = load_artifacts(ARTIFACTS_DIR)
+        print(f"Recommender artifacts published to {ARTIFACTS_DIR} "
+              f"({len(new_rows)} new, {len(updated_catalog)} businesses)")
+
+    published_rows = len(data)
+    dump_atomic(published_rows, PUBLISHED_ROWS_FILE)
+
+
+def update_similarity_matrix(new_data):
+    """
+    Update the neighbour store dynamically when new data is added.
+    """
+    update_businesses([new_data])
+
+
+def poll_batch(consumer):
+    """
+    Poll records until BATCH_MAX_RECORDS are collected or BATCH_MAX_WAIT_MS has elapsed.
+    """
+    batch = []
+    deadline = time.monotonic() + BATCH_MAX_WAIT_MS / 1000
+    while len(batch) < BATCH_MAX_RECORDS:
+        remaining_ms = int((deadline - time.monotonic()) * 1000)
+        if remaining_ms <= 0:
+            break
+        records = consumer.poll(timeout_ms=remaining_ms, max_records=BATCH_MAX_RECORDS - len(batch))
+        for partition_records in records.values():
+            batch.extend(partition_records)
+    return batch
+
+
+def process_batch(batch, dead_letter):
+    """
+    Persist a batch, falling back to one record at a time so a single bad record does not
+    block the batch. A record that fails on its own is dead-lettered.
+
+    :param dead_letter: Callable taking (message, error), returning True once the record is
+        durably dead-lettered.
+    :return: Position in `batch` of the first record neither persisted nor dead-lettered,
+        or None if every record was.
+    """
+    try:
+        update_businesses([message.value for message in batch])
+        return None
+    except Exception as e:
+        print(f"Error processing batch, retrying records individually: {e}")
+
+    for position, message in enumerate(batch):
+        try:
+            update_businesses([message.value])
+        except Exception as e:
+            print(f"Error processing message at {message.topic}[{message.partition}]@{message.offset}: {e}")
+            if not dead_letter(message, e):
+                return position
+    return None
+
+
+def rewind(consumer, messages):
+    """
+    Seek every partition back to its first record in `messages`, so the next poll
+    re-consumes them and a commit does not cover them.
+    """
+    first_offsets = {}
+    for message in messages:
+        partition = TopicPartition(message.topic, message.partition)
+        first_offsets[partition] = min(first_offsets.get(partition, message.offset), message.offset)
+    for partition, offset in first_offsets.items():
+        consumer.seek(partition, offset)
+
 
 def consume_business_messages():
-    # Initialize Kafka Consumer
+    # Initialize Kafka Consumer; offsets are committed only for records that were persisted or dead-lettered
     consumer = KafkaConsumer(
         'new-business-data',
         bootstrap_servers='localhost:9092',
         group_id='my-consumer-group',
         auto_offset_reset='latest',
-        enable_auto_commit=True,
+        enable_auto_commit=False,
+        max_poll_records=BATCH_MAX_RECORDS,
         value_deserializer=lambda v: json.loads(v.decode('utf-8'))
     )
+    dead_letter_producer = KafkaProducer(
+        bootstrap_servers='localhost:9092',
+        value_serializer=lambda v: json.dumps(v).encode('utf-8')
+    )
     print("Kafka consumer listening for messages...")
 
-    for message in consumer:
+    def dead_letter(message, error):
         try:
-            new_business = message.value
-            print(f"Received new business: {new_business}")
-            update_similarity_matrix(new_business)
+            dead_letter_producer.send(DEAD_LETTER_TOPIC, value={
+                "business": message.value,
+                "error": str(error),
+                "topic": message.topic,
+                "partition": message.partition,
+                "offset": message.offset,
+            }).get(timeout=10)
+            print(f"Sent message at {message.topic}[{message.partition}]@{message.offset} to {DEAD_LETTER_TOPIC}")
+            return True
         except Exception as e:
-            print(f"Error processing message: {e}")
\ No newline at end of file
+            print(f"Error dead-lettering message: {e}")
+            return False
+
+    while True:
+        batch = poll_batch(consumer)
+        if not batch:
+            publish_if_pending()
+            continue
+
+        print(f"Received {len(batch)} new businesses")
+        failed = process_batch(batch, dead_letter)
+        if failed is not None:
+            # Commit only the records before the failure and re-consume the rest
+            rewind(consumer, batch[failed:])
+        consumer.commit()
+        if failed is not None:
+            time.sleep(RETRY_SECONDS)
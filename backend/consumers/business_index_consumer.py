@@ -0,0 +1,78 @@
+from kafka import KafkaConsumer
+import logging
+import json
+import os
+import time
+
+POLL_TIMEOUT_MS = int(os.getenv('BUSINESS_INDEX_POLL_TIMEOUT_MS', 1000))
+RETRY_SECONDS = 5
+
+
+def add_to_indexes(indexes, businesses, source):
+    """
+    :return: False if any index failed to take the businesses.
+    """
+    ok = True
+    for index in indexes:
+        try:
+            added = index.add_businesses(businesses)
+            logging.info(f"Added {added} of {len(businesses)} businesses {source} to the {index.name}")
+        except Exception as e:
+            logging.error(f"Error adding businesses {source} to the {index.name}: {e}")
+            ok = False
+    return ok
+
+
+def start_business_index_consumer(indexes, catch_up, bootstrap_servers='localhost:9092'):
+    """
+    Keep in-memory business indexes (SyncedIndex) current from `new-business-data`. Runs
+    without a consumer group, so every replica receives every new business, and marks the
+    indexes synced after each poll that reached Kafka. While the broker is unreachable they
+    are not marked synced, and the consumer resumes from its position once it reconnects.
+
+    The consumer starts at the end of the topic, so businesses added between the catalog
+    snapshot and startup never arrive from Kafka. Once the partitions are assigned and their
+    positions fixed, `catch_up` loads those businesses from Postgres, and only then are the
+    indexes marked synced. Until then they are stale and callers query Postgres.
+
+    :param indexes: SyncedIndex instances to feed.
+    :param catch_up: Callable returning the businesses added after the catalog was built.
+    :param bootstrap_servers: Kafka bootstrap servers.
+    """
+    logging.info("Starting Kafka consumer for new-business-data (business indexes)...")
+    while True:
+        try:
+            consumer = KafkaConsumer(
+                'new-business-data',
+                bootstrap_servers=bootstrap_servers,
+                group_id=None,
+                auto_offset_reset='latest',
+                value_deserializer=lambda v: json.loads(v.decode('utf-8'))
+            )
+            caught_up = False
+            while True:
+                records = consumer.poll(timeout_ms=POLL_TIMEOUT_MS)
+                businesses = [message.value for partition_records in records.values() for message in partition_records]
+                if businesses:
+                    add_to_indexes(indexes, businesses, "from Kafka")
+                if not consumer.bootstrap_connected():
+                    continue
+                if not caught_up:
+                    assignment = consumer.assignment()
+                    if not assignment:
+                        continue
+                    # Fix the start offsets first: anything added after the query below is then read from Kafka
+                    for partition in assignment:
+                        consumer.position(partition)
+                    try:
+                        caught_up = add_to_indexes(indexes, catch_up(), "from Postgres")
+                    except Exception as e:
+                        logging.error(f"Business index catch-up failed: {e}")
+                    if not caught_up:
+                        # Indexes stay unsynced; retried after the next poll, claim() skipping what was added
+                        continue
+                for index in indexes:
+                    index.mark_synced()
+        except Exception as e:
+            logging.error(f"Business index consumer failed, retrying in {RETRY_SECONDS}s: {e}")
+            time.sleep(RETRY_SECONDS)
@@ -0,0 +1,88 @@
+"""
+Append-only journal of the incremental updates made by business_consumer.
+
+Between full snapshots of the consumer's state, every batch appends one entry holding only
+what it changed: the new catalog rows, their feature vectors and the neighbour lists that
+were rewritten. Per-batch I/O is therefore proportional to the batch, not to the catalog.
+On startup the consumer loads the last snapshot and replays the entries written after it.
+"""
+import logging
+import os
+import pickle
+
+
+class BusinessJournal:
+    def __init__(self, path):
+        """
+        :param path: Journal file; created on the first append.
+        """
+        self.path = path
+        self.rows = 0
+
+    def append(self, start, rows, vectors, neighbour_rows, neighbour_ids, neighbour_scores):
+        """
+        Durably append one batch. A failed write is truncated away, so the journal never
+        ends in a partial entry it wrote itself.
+
+        :param start: Row position of the first new business.
+        :param rows: DataFrame of the new businesses.
+        :param vectors: Sparse feature vectors of the new businesses.
+        :param neighbour_rows: Row positions whose neighbour lists changed, new businesses included.
+        :param neighbour_ids: Neighbour ids of those rows.
+        :param neighbour_scores: Neighbour scores of those rows.
+        """
+        entry = {
+            "start": start,
+            "rows": rows,
+            "vectors": vectors,
+            "neighbour_rows": neighbour_rows,
+            "neighbour_ids": neighbour_ids,
+            "neighbour_scores": neighbour_scores,
+        }
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        try:
+            with open(self.path, "ab") as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception:
+            if os.path.exists(self.path):
+                os.truncate(self.path, size)
+            raise
+        self.rows += len(rows)
+
+    def entries(self):
+        """
+        Read every complete entry. A partial entry left at the end by a crash is dropped
+        and truncated, so later appends stay readable.
+        """
+        entries = []
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            self.rows = 0
+            return entries
+        with f:
+            end = 0
+            while True:
+                try:
+                    entries.append(pickle.load(f))
+                except EOFError:
+                    break
+                except Exception as e:
+                    logging.warning(f"Dropping partial entry at byte {end} of {self.path}: {e}")
+                    break
+                end = f.tell()
+            size = f.seek(0, os.SEEK_END)
+        if end < size:
+            os.truncate(self.path, end)
+        self.rows = sum(len(entry["rows"]) for entry in entries)
+        return entries
+
+    def clear(self):
+        """
+        Drop every entry, once a snapshot covering them has been written.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.rows = 0
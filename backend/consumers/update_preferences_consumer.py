@@ -1,81 +1,111 @@
 from kafka import KafkaConsumer
 import logging
 import json
+import os
+import time
+from cache.tiered_cache import set_many
 from codegen import recommendation_service_pb2 as rec_pb2
+from services.recommendation.recommendation_service import CACHE_STALE_SECONDS, CACHE_TTL_SECONDS
+
+BATCH_MAX_RECORDS = int(os.getenv('PREFERENCES_BATCH_MAX_RECORDS', 500))
+BATCH_MAX_WAIT_MS = int(os.getenv('PREFERENCES_BATCH_MAX_WAIT_MS', 500))
+
 
 def start_kafka_consumer(redis_client, db, recommendation_service):
     """
-    Starts a Kafka consumer to process user preference updates.
+    Starts a Kafka consumer to process user preference updates in micro-batches.
     """
     logging.info("Starting Kafka consumer for preferences_update...")
     consumer = KafkaConsumer(
         'preferences_update',  # Topic name
         bootstrap_servers='localhost:9092',  # Kafka broker address
         group_id='recommendation-service-group',  # Consumer group ID
+        max_poll_records=BATCH_MAX_RECORDS,
         value_deserializer=lambda v: json.loads(v.decode('utf-8'))  # Deserialize message
     )
 
-    for message in consumer:
+    while True:
+        batch = poll_batch(consumer)
+        if not batch:
+            continue
         try:
-            logging.info(f"Received message from Kafka: {message.value}")
-            process_preference_updates(message.value, redis_client, db, recommendation_service)
+            logging.info(f"Received {len(batch)} preference updates from Kafka")
+            process_preference_batch([message.value for message in batch], redis_client, db, recommendation_service)
         except Exception as e:
-            logging.error(f"Error processing Kafka message: {str(e)}")
+            logging.error(f"Error processing Kafka messages: {str(e)}")
+
+
+def poll_batch(consumer):
+    """
+    Poll records until BATCH_MAX_RECORDS are collected or BATCH_MAX_WAIT_MS has elapsed.
+    """
+    batch = []
+    deadline = time.monotonic() + BATCH_MAX_WAIT_MS / 1000
+    while len(batch) < BATCH_MAX_RECORDS:
+        remaining_ms = int((deadline - time.monotonic()) * 1000)
+        if remaining_ms <= 0:
+            break
+        records = consumer.poll(timeout_ms=remaining_ms, max_records=BATCH_MAX_RECORDS - len(batch))
+        for partition_records in records.values():
+            batch.extend(partition_records)
+    return batch
 
 
 def process_preference_updates(message, redis_client, db, recommendation_service):
     """
     Processes a single Kafka message for updating user preferences.
     """
-    user_id = message.get("user_id")
-    preferences = message.get("preferences")
+    process_preference_batch([message], redis_client, db, recommendation_service)
 
-    if not user_id or not preferences:
-        logging.error("Invalid Kafka message format. Missing 'user_id' or 'preferences'.")
-        return
 
-    logging.info(f"Processing preference update for user_id: {user_id}, preferences: {preferences}")
+def process_preference_batch(messages, redis_client, db, recommendation_service):
+    """
+    Processes a batch of preference updates: each user's preferences are written to the
+    database, then new recommendations for every updated preference set are ranked with a
+    single BatchGetRecommendations call and cached with one pipelined round trip.
+    """
+    updated = []
+    for message in messages:
+        user_id = message.get("user_id")
+        preferences = message.get("preferences")
 
-    try:
-        # Update the database
-        preferences_json = json.dumps(preferences)
-        query = "UPDATE Users SET preferences = %s WHERE id = %s"
-        db.execute(query, (preferences_json, user_id))
-        logging.info(f"Preferences updated in the database for user_id {user_id}.")
+        if not user_id or not preferences:
+            logging.error("Invalid Kafka message format. Missing 'user_id' or 'preferences'.")
+            continue
 
-        # Invalidate cache
-        cache_key = f"recommendations:{' '.join(preferences['category']).lower()}:{preferences['city'].lower()}"
-        if redis_client:
-            redis_client.delete(cache_key)
-            logging.info(f"Invalidated cache for key: {cache_key}")
+        logging.info(f"Processing preference update for user_id: {user_id}, preferences: {preferences}")
+        try:
+            # Update the database
+            preferences_json = json.dumps(preferences)
+            db.execute_prepared("user_update_preferences", (preferences_json, user_id))
+            logging.info(f"Preferences updated in the database for user_id {user_id}.")
+            updated.append(preferences)
+        except Exception as e:
+            logging.error(f"Error processing preference update for user_id {user_id}: {str(e)}")
 
-        # Fetch new recommendations
-        rec_request = rec_pb2.RecommendationRequest(
-            category=preferences["category"],
-            city=preferences["city"]
-        )
-        response = recommendation_service.GetRecommendations(rec_request)
+    if not updated:
+        return
 
-        # Cache new recommendations
-        recommendations = [
-            {
-                "name": rec.name,
-                "category": rec.category,
-                "rating": rec.rating,
-                "review_count": rec.review_count,
-                "city": rec.city,
-                "address": rec.address,
-                "phone": rec.phone,
-                "price": rec.price,
-                "image_url": rec.image_url,
-                "url": rec.url,
-            }
-            for rec in response.recommendations
+    # Fetch new recommendations for the whole batch
+    batch_request = rec_pb2.BatchRecommendationRequest(
+        queries=[
+            rec_pb2.RecommendationRequest(category=preferences["category"], city=preferences["city"])
+            for preferences in updated
         ]
-        serialized_recommendations = json.dumps(recommendations)
-        if redis_client:
-            redis_client.set(cache_key, serialized_recommendations, ex=3600)
-            logging.info(f"Cached new recommendations for key: {cache_key}")
+    )
+    response = recommendation_service.BatchGetRecommendations(batch_request, None)
 
-    except Exception as e:
-        logging.error(f"Error processing preference update for user_id {user_id}: {str(e)}")
\ No newline at end of file
+    # Overwrite the cached recommendations and invalidate other replicas' L1 copies in one round trip
+    if redis_client:
+        items = {
+            recommendation_service.cache_key(preferences["category"], preferences["city"]):
+                result.SerializeToString()
+            for preferences, result in zip(updated, response.results)
+            if result.recommendations
+        }
+        set_many(
+            redis_client,
+            [(cache_key, serialized, CACHE_TTL_SECONDS + CACHE_STALE_SECONDS) for cache_key, serialized in items.items()],
+            invalidate=True,
+        )
+        logging.info(f"Cached new recommendations for {len(items)} keys")
@@ -0,0 +1,124 @@
+import json
+import time
+
+import asyncpg
+from db.db import _to_positional
+from monitoring.metrics import metrics
+
+# Errors after which the statement is retried once on another pooled connection
+CONNECTION_ERRORS = (asyncpg.ConnectionDoesNotExistError, asyncpg.CannotConnectNowError, ConnectionError)
+QUERY_ERRORS = (asyncpg.PostgresError, asyncpg.InterfaceError, OSError)
+
+
+class AsyncDatabase:
+    def __init__(self, db_name, user, password, host, port, min_connections=1, max_connections=10,
+                 command_timeout=30):
+        """
+        asyncpg-backed counterpart of Database for the asyncio server. It exposes the same
+        `*_prepared` API over the same statement registry and returns rows as dicts.
+
+        asyncpg prepares each statement on a connection the first time it runs there and
+        keeps it in that connection's statement cache, so no explicit PREPARE is needed.
+
+        :param min_connections: Connections opened by `connect()` and kept in the pool.
+        :param max_connections: Upper bound on open connections; callers wait when all are in use.
+        :param command_timeout: Seconds a single statement may run before it is cancelled.
+        """
+        self.connect_args = dict(
+            database=db_name, user=user, password=password, host=host, port=port,
+            min_size=min_connections, max_size=max_connections, command_timeout=command_timeout,
+        )
+        self.pool = None
+        self.statements = {}
+
+    async def connect(self):
+        self.pool = await asyncpg.create_pool(init=self._init_connection, **self.connect_args)
+
+    @staticmethod
+    async def _init_connection(connection):
+        # Decode json/jsonb into Python objects like psycopg2 does; strings are sent as-is
+        for type_name in ('json', 'jsonb'):
+            await connection.set_type_codec(
+                type_name, schema='pg_catalog', format='text',
+                encoder=lambda value: value if isinstance(value, str) else json.dumps(value),
+                decoder=json.loads,
+            )
+
+    def register_statements(self, statements):
+        """
+        Register named statements.
+
+        :param statements: Mapping of statement name to a query using %s placeholders.
+        """
+        for name, query in statements.items():
+            self.statements[name] = _to_positional(query)
+
+    async def _run_prepared(self, name, params, fetch):
+        """
+        Execute a registered statement on a pooled connection, retrying once on a fresh
+        connection if the first one is broken, and record its call count and latency.
+        """
+        if name not in self.statements:
+            raise KeyError(f"Unknown prepared statement: {name}")
+        query, _ = self.statements[name]
+        start = time.perf_counter()
+        try:
+            for attempt in range(2):
+                try:
+                    async with self.pool.acquire() as connection:
+                        return await fetch(connection, query, *(params or ()))
+                except CONNECTION_ERRORS as e:
+                    if attempt == 1:
+                        raise
+                    print(f"Database connection lost, reconnecting: {e}")
+        except QUERY_ERRORS:
+            metrics.counter(f"db_statement_errors.{name}").inc()
+            raise
+        finally:
+            metrics.counter(f"db_statement_calls.{name}").inc()
+            metrics.histogram(f"db_statement_seconds.{name}").observe(time.perf_counter() - start)
+
+    async def fetch_one_prepared(self, name, params=None):
+        """
+        Execute a registered statement and fetch a single result.
+        """
+        async def fetch(connection, query, *args):
+            row = await connection.fetchrow(query, *args)
+            return dict(row) if row is not None else None
+        try:
+            return await self._run_prepared(name, params, fetch)
+        except QUERY_ERRORS as e:
+            print(f"Error executing statement {name}: {e}")
+            return None
+
+    async def fetch_all_prepared(self, name, params=None):
+        """
+        Execute a registered statement and fetch all results.
+        """
+        async def fetch(connection, query, *args):
+            return [dict(row) for row in await connection.fetch(query, *args)]
+        try:
+            return await self._run_prepared(name, params, fetch)
+        except QUERY_ERRORS as e:
+            print(f"Error executing statement {name}: {e}")
+            return None
+
+    async def execute_prepared(self, name, params=None):
+        """
+        Execute a registered statement that modifies the database.
+        """
+        async def fetch(connection, query, *args):
+            await connection.execute(query, *args)
+        try:
+            await self._run_prepared(name, params, fetch)
+        except QUERY_ERRORS as e:
+            print(f"Error executing statement {name}: {e}")
+            return None
+
+    async def close(self):
+        """
+        Close all pooled database connections.
+        """
+        if self.pool:
+            await self.pool.close()
+        print("Database connection closed.")
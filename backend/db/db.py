@@ -1,28 +1,217 @@
 import os
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from psycopg2 import OperationalError, Error
+from psycopg2.pool import ThreadedConnectionPool
+from psycopg2 import OperationalError, InterfaceError, Error, errors
+from monitoring.metrics import metrics
+
+# Errors that mean the connection itself is broken and must be replaced
+CONNECTION_ERRORS = (OperationalError, InterfaceError)
 
 
 class Database:
-    def __init__(self, db_name, user, password, host, port):
-        self.connection = psycopg2.connect(
+    def __init__(self, db_name, user, password, host, port, min_connections=1, max_connections=10,
+                 health_check_interval=30, checkout_timeout=30):
+        """
+        Thread-safe pooled database access. Every call checks a connection out of the pool,
+        so concurrent RPCs run their queries in parallel on separate connections.
+
+        :param min_connections: Connections opened up front and kept in the pool.
+        :param max_connections: Upper bound on open connections; callers wait when all are in use.
+        :param health_check_interval: Seconds a connection may sit idle before it is pinged on checkout.
+        :param checkout_timeout: Seconds to wait for a free connection before giving up.
+        """
+        self.pool = ThreadedConnectionPool(
+            min_connections,
+            max_connections,
             dbname=db_name,
             user=user,
             password=password,
             host=host,
             port=port
         )
-        self.connection.autocommit = True
-        self.cursor = self.connection.cursor(cursor_factory=RealDictCursor)
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        # ThreadedConnectionPool raises instead of blocking when exhausted, so bound checkouts here
+        self._available = threading.BoundedSemaphore(max_connections)
+        self._last_used = {}
+        # Named statements (name -> (positional query, parameter count)) and, per connection, those prepared on it
+        self.statements = {}
+        self._prepared = {}
+
+    @contextmanager
+    def connection(self):
+        """
+        Check a healthy connection out of the pool for the duration of the block.
+        Connections that fail with a connection-level error are discarded, not returned.
+        """
+        if not self._available.acquire(timeout=self.checkout_timeout):
+            raise OperationalError("Timed out waiting for a database connection")
+        connection = None
+        broken = False
+        try:
+            connection = self._checkout()
+            yield connection
+        except CONNECTION_ERRORS:
+            broken = True
+            raise
+        finally:
+            if connection is not None:
+                self._last_used[id(connection)] = time.monotonic()
+                if broken or connection.closed:
+                    self._last_used.pop(id(connection), None)
+                    self._prepared.pop(id(connection), None)
+                self.pool.putconn(connection, close=broken or bool(connection.closed))
+            self._available.release()
+
+    def _checkout(self):
+        """
+        Get a connection from the pool, replacing it if it fails its health check.
+        """
+        connection = self.pool.getconn()
+        if not connection.autocommit:
+            connection.autocommit = True
+        idle = time.monotonic() - self._last_used.get(id(connection), 0)
+        if connection.closed or idle > self.health_check_interval:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            except CONNECTION_ERRORS as e:
+                print(f"Discarding unhealthy database connection: {e}")
+                self._last_used.pop(id(connection), None)
+                self._prepared.pop(id(connection), None)
+                self.pool.putconn(connection, close=True)
+                connection = self.pool.getconn()
+                connection.autocommit = True
+        return connection
+
+    def _run(self, query, params, fetch):
+        """
+        Run a query on a pooled connection, retrying once on a fresh connection if the
+        first one turns out to be broken (e.g. after a database restart).
+        """
+        def run(connection, cursor):
+            cursor.execute(query, params)
+            return fetch(cursor)
+        return self._with_cursor(run)
+
+    def _with_cursor(self, work):
+        for attempt in range(2):
+            try:
+                with self.connection() as connection:
+                    with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+                        return work(connection, cursor)
+            except CONNECTION_ERRORS as e:
+                if attempt == 1:
+                    raise
+                print(f"Database connection lost, reconnecting: {e}")
+
+    def register_statements(self, statements):
+        """
+        Register named statements. Each is prepared on a connection the first time it runs there.
+
+        :param statements: Mapping of statement name to a query using %s placeholders.
+        """
+        for name, query in statements.items():
+            self.statements[name] = _to_positional(query)
+
+    def _run_prepared(self, name, params, fetch):
+        """
+        Execute a registered statement, preparing it on the checked-out connection if needed,
+        and record its call count and latency.
+        """
+        if name not in self.statements:
+            raise KeyError(f"Unknown prepared statement: {name}")
+        query, param_count = self.statements[name]
+        placeholders = f" ({', '.join(['%s'] * param_count)})" if param_count else ""
+        execute_query = f"EXECUTE {name}{placeholders}"
+
+        def run(connection, cursor):
+            prepared = self._prepared.setdefault(id(connection), set())
+            if name not in prepared:
+                cursor.execute(f"PREPARE {name} AS {query}")
+                prepared.add(name)
+            try:
+                cursor.execute(execute_query, params)
+            except errors.InvalidSqlStatementName:
+                # Connection was replaced under a recycled id and never saw this statement
+                cursor.execute(f"PREPARE {name} AS {query}")
+                cursor.execute(execute_query, params)
+            except errors.FeatureNotSupported:
+                # Cached plan outdated by a schema change (e.g. a migration added a column)
+                cursor.execute(f"DEALLOCATE {name}")
+                cursor.execute(f"PREPARE {name} AS {query}")
+                cursor.execute(execute_query, params)
+            return fetch(cursor)
+
+        start = time.perf_counter()
+        try:
+            return self._with_cursor(run)
+        except Error:
+            metrics.counter(f"db_statement_errors.{name}").inc()
+            raise
+        finally:
+            metrics.counter(f"db_statement_calls.{name}").inc()
+            metrics.histogram(f"db_statement_seconds.{name}").observe(time.perf_counter() - start)
+
+    def fetch_one_prepared(self, name, params=None):
+        """
+        Execute a registered statement and fetch a single result.
+        """
+        try:
+            return self._run_prepared(name, params, lambda cursor: cursor.fetchone())
+        except Error as e:
+            print(f"Error executing statement {name}: {e}")
+            return None
+
+    def fetch_all_prepared(self, name, params=None):
+        """
+        Execute a registered statement and fetch all results.
+        """
+        try:
+            return self._run_prepared(name, params, lambda cursor: cursor.fetchall())
+        except Error as e:
+            print(f"Error executing statement {name}: {e}")
+            return None
+
+    def execute_prepared(self, name, params=None):
+        """
+        Execute a registered statement that modifies the database.
+        """
+        try:
+            self._run_prepared(name, params, lambda cursor: None)
+        except Error as e:
+            print(f"Error executing statement {name}: {e}")
+            return None
+
+    def statement_stats(self):
+        """
+        Per-statement call counts, error counts and latency percentiles (milliseconds).
+        """
+        stats = {}
+        for name in self.statements:
+            calls = metrics.counter(f"db_statement_calls.{name}").value
+            if not calls:
+                continue
+            latency = metrics.histogram(f"db_statement_seconds.{name}")
+            stats[name] = {
+                "calls": calls,
+                "errors": metrics.counter(f"db_statement_errors.{name}").value,
+                "mean_ms": latency.snapshot()["sum"] / calls * 1000,
+                "p50_ms": latency.quantile(0.5) * 1000,
+                "p99_ms": latency.quantile(0.99) * 1000,
+            }
+        return stats
 
     def fetch_one(self, query, params=None):
         """
         Execute a query and fetch a single result.
         """
         try:
-            self.cursor.execute(query, params)
-            return self.cursor.fetchone()
+            return self._run(query, params, lambda cursor: cursor.fetchone())
         except Error as e:
             print(f"Error executing query: {e}")
             return None
@@ -32,8 +221,7 @@ class Database:
         Execute a query and fetch all results.
         """
         try:
-            self.cursor.execute(query, params)
-            return self.cursor.fetchall()
+            return self._run(query, params, lambda cursor: cursor.fetchall())
         except Error as e:
             print(f"Error executing query: {e}")
             return None
@@ -43,7 +231,7 @@ class Database:
         Execute a query that modifies the database (e.g., INSERT, UPDATE, DELETE).
         """
         try:
-            self.cursor.execute(query, params)
+            self._run(query, params, lambda cursor: None)
             print("Query executed successfully.")
         except Error as e:
             print(f"Error executing query: {e}")
@@ -51,13 +239,23 @@ class Database:
 
     def close(self):
         """
-        Close the database connection.
+        Close all pooled database connections.
         """
         try:
-            if self.cursor:
-                self.cursor.close()
-            if self.connection:
-                self.connection.close()
+            if self.pool:
+                self.pool.closeall()
             print("Database connection closed.")
         except Error as e:
-            print(f"Error closing database connection: {e}")
\ No newline at end of file
+            print(f"Error closing database connection: {e}")
+
+
+def _to_positional(query):
+    """
+    Convert %s placeholders into PREPARE's $1, $2, ... form.
+    :return: (query, parameter count)
+    """
+    parts = query.split("%s")
+    positional = parts[0]
+    for position, part in enumerate(parts[1:], start=1):
+        positional += f"${position}{part}"
+    return " ".join(positional.split()), len(parts) - 1
@@ -1,3 +1,9 @@
+-- earth_box, earth_distance and ll_to_earth used by the location queries
+CREATE EXTENSION IF NOT EXISTS cube;
+CREATE EXTENSION IF NOT EXISTS earthdistance;
+-- Trigram index support for the category search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Create the Business table if it doesn't exist
 CREATE TABLE IF NOT EXISTS Business (
     id SERIAL PRIMARY KEY,
@@ -37,4 +43,16 @@ BEGIN
         QUOTE '"'
         ESCAPE '"';
     END IF;
-END $$;
\ No newline at end of file
+END $$;
+
+-- Indexes, built after the load (see db/migrations)
+-- Spatial index for the location and proximity queries
+CREATE INDEX IF NOT EXISTS business_earth_idx ON Business USING gist (ll_to_earth(latitude, longitude));
+-- Trigram index for the category search
+CREATE INDEX IF NOT EXISTS business_category_trgm_idx ON Business USING gin (category gin_trgm_ops);
+-- Review-count orderings for the trending lists
+CREATE INDEX IF NOT EXISTS business_trending_idx ON Business (review_count DESC NULLS LAST, id DESC);
+CREATE INDEX IF NOT EXISTS business_city_trending_idx ON Business (lower(city), review_count DESC NULLS LAST, id DESC);
+-- Keyset orderings for the rating listings
+CREATE INDEX IF NOT EXISTS business_rating_idx ON Business ((COALESCE(rating, 0)) DESC, id DESC);
+CREATE INDEX IF NOT EXISTS business_city_rating_idx ON Business (lower(city), (COALESCE(rating, 0)) DESC, id DESC);
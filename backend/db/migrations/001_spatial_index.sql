@@ -0,0 +1,15 @@
+-- GiST index on the earth point of every business, for GetBusinessByLocation and GetBusinessByProximity.
+--
+-- business_by_location filters with earth_box(...) @> ll_to_earth(latitude, longitude) and
+-- business_by_proximity orders by ll_to_earth(latitude, longitude) <-> ll_to_earth(...); both
+-- use this index instead of scanning Business. The expression must match the queries exactly.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so apply this file with autocommit:
+--     psql -h $DB_HOST -U $DB_USER -d $DB_NAME -f db/migrations/001_spatial_index.sql
+CREATE EXTENSION IF NOT EXISTS cube;
+CREATE EXTENSION IF NOT EXISTS earthdistance;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS business_earth_idx
+    ON Business USING gist (ll_to_earth(latitude, longitude));
+
+ANALYZE Business;
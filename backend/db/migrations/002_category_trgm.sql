@@ -0,0 +1,13 @@
+-- Trigram index on Business.category for GetBusinessByCategory.
+--
+-- business_by_category filters with category ILIKE '%...%', which a btree cannot serve; a
+-- pg_trgm GIN index answers unanchored, case-insensitive patterns of three or more characters.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so apply this file with autocommit:
+--     psql -h $DB_HOST -U $DB_USER -d $DB_NAME -f db/migrations/002_category_trgm.sql
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS business_category_trgm_idx
+    ON Business USING gin (category gin_trgm_ops);
+
+ANALYZE Business;
@@ -0,0 +1,15 @@
+-- Indexes matching the ORDER BY of business_trending and business_trending_by_city.
+--
+-- With them the trending statements read the first rows of an index instead of sorting the
+-- whole table. They only run when a replica's in-memory trending lists are stale and Redis
+-- has no copy, but then every replica may run them at once.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so apply this file with autocommit:
+--     psql -h $DB_HOST -U $DB_USER -d $DB_NAME -f db/migrations/003_trending_indexes.sql
+CREATE INDEX CONCURRENTLY IF NOT EXISTS business_trending_idx
+    ON Business (review_count DESC NULLS LAST, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS business_city_trending_idx
+    ON Business (lower(city), review_count DESC NULLS LAST, id DESC);
+
+ANALYZE Business;
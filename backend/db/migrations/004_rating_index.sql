@@ -0,0 +1,16 @@
+-- Composite indexes for the keyset pages of GetBusinessByRating.
+--
+-- business_by_rating and business_by_rating_in_city order by (COALESCE(rating, 0), id)
+-- descending and start after the previous page's key. Indexed on that expression, a page is
+-- read from the index starting at the key, so every page costs the same as the first; with
+-- OFFSET, Postgres would read and discard every row of the pages before it.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so apply this file with autocommit:
+--     psql -h $DB_HOST -U $DB_USER -d $DB_NAME -f db/migrations/004_rating_index.sql
+CREATE INDEX CONCURRENTLY IF NOT EXISTS business_rating_idx
+    ON Business ((COALESCE(rating, 0)) DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS business_city_rating_idx
+    ON Business (lower(city), (COALESCE(rating, 0)) DESC, id DESC);
+
+ANALYZE Business;
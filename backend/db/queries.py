@@ -0,0 +1,85 @@
+# Registry of the hot Business and Users queries, prepared once per pooled connection.
+# Statements use %s placeholders like ad-hoc queries; Database converts them for PREPARE.
+STATEMENTS = {
+    # Business
+    "business_by_id": "SELECT * FROM Business WHERE id = %s",
+    "business_by_name": "SELECT * FROM Business WHERE name = %s",
+    "business_find_duplicate": """
+        SELECT id FROM Business
+        WHERE businessid = %s OR
+            (name = %s AND address = %s AND city = %s AND state = %s AND country = %s)
+    """,
+    "business_insert": """
+        INSERT INTO Business (businessid, name, rating, review_count, address, category,
+                            city, state, country, zip_code, latitude, longitude,
+                            phone, price, image_url, url, distance)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING id
+    """,
+    "business_by_location": """
+        SELECT *
+        FROM Business
+        WHERE earth_box(ll_to_earth(%s, %s), %s) @> ll_to_earth(latitude, longitude) LIMIT 3
+    """,
+    # Catch-up of the in-memory business indexes: businesses inserted after the catalog was built
+    "business_added_since": "SELECT * FROM Business WHERE id > %s ORDER BY id",
+    # Rating-ranked keyset pages: rows after the previous page's (rating, id), filtered through
+    # the pg_trgm index on category (db/migrations)
+    "business_by_category": """
+        SELECT *
+        FROM Business
+        WHERE category ILIKE %s AND (COALESCE(rating, 0), id) < (%s, %s)
+        ORDER BY COALESCE(rating, 0) DESC, id DESC
+        LIMIT %s
+    """,
+    # Keyset pages in the order of the rating indexes (db/migrations)
+    "business_by_rating": """
+        SELECT *
+        FROM Business
+        WHERE COALESCE(rating, 0) >= %s AND (COALESCE(rating, 0), id) < (%s, %s)
+        ORDER BY COALESCE(rating, 0) DESC, id DESC
+        LIMIT %s
+    """,
+    "business_by_rating_in_city": """
+        SELECT *
+        FROM Business
+        WHERE lower(city) = %s AND COALESCE(rating, 0) >= %s AND (COALESCE(rating, 0), id) < (%s, %s)
+        ORDER BY COALESCE(rating, 0) DESC, id DESC
+        LIMIT %s
+    """,
+    # Ordering by the <-> operator lets the GiST index on ll_to_earth (db/migrations) walk
+    # nearest-first; chord distance orders rows exactly like earth_distance
+    "business_by_proximity": """
+        SELECT *, (earth_distance(ll_to_earth(latitude, longitude), ll_to_earth(%s, %s))) AS calculated_distance
+        FROM Business
+        ORDER BY ll_to_earth(latitude, longitude) <-> ll_to_earth(%s, %s)
+        LIMIT %s
+    """,
+    # Cold path of the trending lists (services/business/trending.py), served by the
+    # review_count indexes (db/migrations)
+    "business_trending": """
+        SELECT * FROM Business ORDER BY review_count DESC NULLS LAST, id DESC LIMIT %s
+    """,
+    "business_trending_by_city": """
+        SELECT * FROM Business WHERE lower(city) = %s ORDER BY review_count DESC NULLS LAST, id DESC LIMIT %s
+    """,
+
+    # Users
+    "user_insert": """
+        INSERT INTO Users (email, password_hash, name, preferences, preferences_collected)
+        VALUES (%s, %s, %s, %s, TRUE)
+    """,
+    "user_login": "SELECT id, name, password_hash, preferences, preferences_collected FROM Users WHERE email = %s",
+    "user_profile": "SELECT id, email, name, preferences FROM Users WHERE id = %s",
+    "user_update_profile": "UPDATE Users SET name = %s, preferences = %s WHERE id = %s",
+    "user_delete": "DELETE FROM Users WHERE id = %s",
+    "user_preferences": "SELECT preferences FROM Users WHERE id = %s",
+    "user_update_preferences": "UPDATE Users SET preferences = %s WHERE id = %s",
+    # Distinct stored preference documents and how many users hold each (cache pre-warming)
+    "user_preference_counts": """
+        SELECT preferences::text AS preferences, COUNT(*) AS users
+        FROM Users
+        WHERE preferences_collected AND preferences IS NOT NULL
+        GROUP BY preferences::text
+    """,
+}
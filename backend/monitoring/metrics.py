@@ -0,0 +1,185 @@
+import bisect
+import json
+import logging
+import threading
+
+# Default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """
+    Monotonically increasing, thread-safe counter.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return self._value
+
+
+class Gauge:
+    """
+    Thread-safe value that can be set to an arbitrary number.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._value = 0
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return self._value
+
+
+class Histogram:
+    """
+    Thread-safe bucketed histogram of observed values.
+    """
+
+    def __init__(self, name, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket that contains the q-th quantile.
+        """
+        with self._lock:
+            if self._count == 0:
+                return 0.0
+            target = q * self._count
+            seen = 0
+            for upper, count in zip(self.buckets + (float('inf'),), self._counts):
+                seen += count
+                if seen >= target:
+                    return upper
+        return float('inf')
+
+    def summary(self):
+        """
+        Count, mean and bucket-bound p50/p99, compact enough for a log line.
+        """
+        with self._lock:
+            count, total = self._count, self._sum
+        return {
+            "count": count,
+            "mean": total / count if count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "count": self._count,
+                "sum": self._sum,
+                "buckets": dict(zip(self.buckets + (float('inf'),), self._counts)),
+            }
+
+
+class MetricsRegistry:
+    """
+    In-process registry of named metrics; metrics are created on first use.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name, factory):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, factory(name))
+        return metric
+
+    def counter(self, name):
+        return self._get_or_create(name, Counter)
+
+    def gauge(self, name):
+        return self._get_or_create(name, Gauge)
+
+    def histogram(self, name, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(name, lambda metric_name: Histogram(metric_name, buckets))
+
+    def snapshot(self):
+        """
+        Return the current value of every metric, keyed by name.
+        """
+        return {name: metric.snapshot() for name, metric in sorted(self._metrics.items())}
+
+    def report(self):
+        """
+        Like snapshot(), with histograms summarized instead of listing every bucket.
+        """
+        return {
+            name: metric.summary() if isinstance(metric, Histogram) else metric.snapshot()
+            for name, metric in sorted(self._metrics.items())
+        }
+
+
+class MetricsReporter(threading.Thread):
+    """
+    Background thread that logs the registry's report as one JSON line every interval, so
+    the metrics reach the pod logs.
+    """
+
+    def __init__(self, registry, interval_seconds=60, sources=None):
+        """
+        :param registry: MetricsRegistry to report.
+        :param interval_seconds: Seconds between reports.
+        :param sources: Extra report sections, by name: callables returning JSON-serializable values.
+        """
+        super().__init__(name="metrics-reporter", daemon=True)
+        self.registry = registry
+        self.interval_seconds = interval_seconds
+        self.sources = sources or {}
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.wait(self.interval_seconds):
+            self.report()
+
+    def report(self):
+        try:
+            report = self.registry.report()
+            for name, source in self.sources.items():
+                report[name] = source()
+            logging.info(f"metrics {json.dumps(report, default=str)}")
+        except Exception as e:
+            logging.error(f"Error reporting metrics: {e}")
+
+
+# Shared registry for the backend process
+metrics = MetricsRegistry()
@@ -1,16 +1,35 @@
 from concurrent import futures
+import asyncio
 import grpc
 import redis
+import redis.asyncio
 import threading
 import os
 from dotenv import load_dotenv
-from codegen import business_service_pb2_grpc, recommendation_service_pb2_grpc, user_service_pb2_grpc
+from codegen import business_service_pb2_grpc, user_service_pb2_grpc
 from services.business.business_service import BusinessService
-from services.recommendation.recommendation_service import RecommendationService
+from services.business.async_business_service import AsyncBusinessService
+from services.business.category_index import CategoryIndex
+from services.business.proximity_index import ProximityIndex
+from services.business.trending import TrendingIndex
+from services.recommendation.recommendation_service import RecommendationService, add_recommendation_service_to_server
+from services.recommendation.async_recommendation_service import AsyncRecommendationService
+from services.recommendation.catalog import BusinessCatalog
+from services.recommendation.city_index import CityIndex
+from services.recommendation.artifacts import ARTIFACTS_DIR, artifact_version, artifacts_exist, load_artifacts
+from services.recommendation.model import ModelHandle, ModelReloader, ModelSnapshot
+from services.recommendation.worker_pool import RankingWorkerPool
 from services.user.user_service import UserService
+from services.user.async_user_service import AsyncUserService
+from cache.local_cache import LocalCache
+from cache.tiered_cache import AsyncCachedRedis, CachedRedis, InvalidationListener
 from consumers.business_consumer import consume_business_messages
+from consumers.business_index_consumer import start_business_index_consumer
 from consumers.update_preferences_consumer import start_kafka_consumer
 from db.db import Database
+from db.async_db import AsyncDatabase
+from db.queries import STATEMENTS
+from monitoring.metrics import MetricsReporter, metrics
 from joblib import load
 from kafka import KafkaProducer
 import json
@@ -28,9 +47,35 @@ DB_USER = os.getenv('DB_USER', 'postgres')
 DB_PASSWORD = os.getenv('DB_PASSWORD', 'rootpass123')
 DB_HOST = os.getenv('DB_HOST', 'localhost') #postgres-service for docker
 DB_PORT = int(os.getenv('DB_PORT', 5432))
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 2))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 20))
+
+# "threads" serves RPCs on a thread pool; "asyncio" runs async servicers on a grpc.aio server
+SERVER_MODE = os.getenv('SERVER_MODE', 'threads')
+GRPC_MAX_WORKERS = int(os.getenv('GRPC_MAX_WORKERS', 10))
+# asyncio mode: threads for CPU-bound work (ranking, bcrypt) and an optional cap on in-flight RPCs
+CPU_WORKERS = int(os.getenv('CPU_WORKERS', os.cpu_count() or 4))
+MAX_CONCURRENT_RPCS = int(os.getenv('MAX_CONCURRENT_RPCS', 0)) or None
+SERVER_PORT = int(os.getenv('SERVER_PORT', 50051))
 
 DATA_FILE = "data/full_data.pkl"
 VECTORIZER_FILE = "data/tfidf_vectorizer.pkl"
+MODEL_RELOAD_INTERVAL_SECONDS = int(os.getenv('MODEL_RELOAD_INTERVAL_SECONDS', 30))
+# Log a report of the in-process metrics this often (0 disables it)
+METRICS_LOG_INTERVAL_SECONDS = int(os.getenv('METRICS_LOG_INTERVAL_SECONDS', 60))
+# Worker processes for ranking (0 ranks in-process); requires memory-mapped artifacts
+RANKING_PROCESSES = int(os.getenv('RANKING_PROCESSES', 0))
+# In-process L1 cache in front of Redis for recommendations:* and trending:* keys (0 entries disables it)
+L1_CACHE_MAX_ENTRIES = int(os.getenv('L1_CACHE_MAX_ENTRIES', 10000))
+L1_CACHE_TTL_SECONDS = float(os.getenv('L1_CACHE_TTL_SECONDS', 30))
+CACHE_INVALIDATION_CHANNEL = os.getenv('CACHE_INVALIDATION_CHANNEL', 'cache-invalidation')
+# In-memory indexes for GetBusinessByProximity and GetBusinessByCategory; Postgres answers once
+# they have not synced with Kafka for BUSINESS_INDEX_MAX_STALENESS_SECONDS
+PROXIMITY_INDEX_ENABLED = os.getenv('PROXIMITY_INDEX_ENABLED', 'true').lower() == 'true'
+CATEGORY_INDEX_ENABLED = os.getenv('CATEGORY_INDEX_ENABLED', 'true').lower() == 'true'
+BUSINESS_INDEX_MAX_STALENESS_SECONDS = float(os.getenv('BUSINESS_INDEX_MAX_STALENESS_SECONDS', 60))
+# Materialized trending lists, written through to Redis; their freshness SLA is TRENDING_FRESHNESS_SECONDS
+TRENDING_INDEX_ENABLED = os.getenv('TRENDING_INDEX_ENABLED', 'true').lower() == 'true'
 
 # Configure logging
 logging.basicConfig(
@@ -41,15 +86,14 @@ logging.basicConfig(
 # Global resources
 redis_client = None
 db = None
-data = None
-vectorizer = None
+model = None
 kafka_producer = None
 
 def initialize_resources():
     """
     Initializes global resources like Redis, database connection, and data files.
     """
-    global redis_client, db, data, vectorizer, kafka_producer
+    global redis_client, db, model, kafka_producer
 
     # Initialize Redis
     logging.info("Initializing Redis...")
@@ -64,7 +108,11 @@ def initialize_resources():
     # Initialize Database
     logging.info("Initializing Database...")
     try:
-        db = Database(db_name=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT)
+        db = Database(
+            db_name=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT,
+            min_connections=DB_POOL_MIN, max_connections=DB_POOL_MAX
+        )
+        db.register_statements(STATEMENTS)
         print(f"Connected to Database at {DB_HOST}:{DB_PORT}")
     except Exception as e:
         print(f"Error connecting to Database: {e}")
@@ -74,18 +122,28 @@ def initialize_resources():
     # Load data and vectorizer
     logging.info("Loading data and vectorizer from files...")
     try:
-        print("Loading data and vectorizer from files...")
-        data = load(DATA_FILE)
-        vectorizer = load(VECTORIZER_FILE)
+        if artifacts_exist(ARTIFACTS_DIR):
+            # Memory-mapped artifacts: near-constant startup, pages shared between replicas
+            print(f"Opening recommendation artifacts from {ARTIFACTS_DIR}...")
+            version = artifact_version(ARTIFACTS_DIR)
+            catalog, vectorizer, city_index = load_artifacts(ARTIFACTS_DIR)
+        else:
+            print("Loading data and vectorizer from files...")
+            data = load(DATA_FILE)
+            vectorizer = load(VECTORIZER_FILE)
+            # Keep only the columnar catalog and city index; the DataFrame is dropped after conversion
+            catalog = BusinessCatalog.from_dataframe(data)
+            city_index = CityIndex.from_dataframe(data, vectorizer)
+            version = None
+            del data
+        model = ModelHandle(ModelSnapshot(catalog, vectorizer, city_index, version=version))
         print("Data and similarity matrix loaded successfully.")
     except FileNotFoundError:
         print("Data files not found. Ensure that `data.pkl` and `vectorizer.pkl` exist.")
-        data = None
-        vectorizer = None
+        model = None
     except Exception as e:
         print(f"Unexpected error loading data or vectorizer: {e}")
-        data = None
-        vectorizer = None
+        model = None
 
         # Initialize Kafka Producer
     logging.info("Data and vectorizer loaded successfully.")
@@ -111,35 +169,111 @@ def serve():
 
     logging.info(f"Kafka producer started  {kafka_producer}")
 
-    if not db or not redis_client or data is None or vectorizer is None or data.empty:
+    if not db or not redis_client or model is None or len(model.current().catalog) == 0:
         print("Failed to initialize all resources. Exiting...")
         logging.info("Failed to initialize all resources. Exiting...")
         return
 
-    # Create the gRPC server
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    # Rank in worker processes that share the memory-mapped artifacts, so ranking scales past one core
+    ranker = None
+    if RANKING_PROCESSES > 0:
+        if artifacts_exist(ARTIFACTS_DIR):
+            ranker = RankingWorkerPool(ARTIFACTS_DIR, processes=RANKING_PROCESSES)
+            logging.info(f"Ranking in {RANKING_PROCESSES} worker processes")
+        else:
+            logging.warning(f"RANKING_PROCESSES is set but {ARTIFACTS_DIR} has no artifacts; ranking in-process")
 
-    # Add BusinessService to the server
-    business_service = BusinessService(db=db, kafka_producer=kafka_producer)
-    business_service_pb2_grpc.add_BusinessServiceServicer_to_server(business_service, server)
+    # Answer hot recommendation lookups from process memory; deletes are broadcast over pub/sub
+    local_cache = None
+    cache_client = redis_client
+    if L1_CACHE_MAX_ENTRIES > 0:
+        local_cache = LocalCache(max_entries=L1_CACHE_MAX_ENTRIES, ttl_seconds=L1_CACHE_TTL_SECONDS)
+        cache_client = CachedRedis(redis_client, local_cache, channel=CACHE_INVALIDATION_CHANNEL)
+        InvalidationListener(redis_client, local_cache, channel=CACHE_INVALIDATION_CHANNEL).start()
 
-    # Add RecommendationService to the server
-    recommendation_service = RecommendationService(db=db, redis_client=redis_client, data=data, vectorizer=vectorizer)
-    recommendation_service_pb2_grpc.add_RecommendationServiceServicer_to_server(recommendation_service, server)
+    # Synchronous RecommendationService, used by the Kafka consumer (and the thread-pool server)
+    recommendation_service = RecommendationService(db=db, redis_client=cache_client, model=model, ranker=ranker)
+
+    # Hot-swap the recommendation model when new artifacts are published
+    model_reloader = ModelReloader(model, ARTIFACTS_DIR, interval_seconds=MODEL_RELOAD_INTERVAL_SECONDS)
+    model_reloader.start()
+
+    # Log swap latency, memory, cache and index metrics periodically; nothing else reads the registry.
+    # Per-statement stats cover both servers, whose databases record under the same statement names
+    if METRICS_LOG_INTERVAL_SECONDS > 0:
+        MetricsReporter(
+            metrics, interval_seconds=METRICS_LOG_INTERVAL_SECONDS, sources={"db_statements": db.statement_stats}
+        ).start()
 
 
     # Start Kafka consumer in a separate thread
     consumer_thread = threading.Thread(
         target=start_kafka_consumer,
-        args=(redis_client, db, recommendation_service),
+        args=(cache_client, db, recommendation_service),
         daemon=True
     )
     consumer_thread.start()
     print("Kafka consumer thread started...")
 
+    # Serve proximity, category and trending queries from memory, kept current from new-business-data by every replica
+    business_indexes = {}
+    catalog = model.current().catalog
+    if PROXIMITY_INDEX_ENABLED:
+        business_indexes['proximity_index'] = ProximityIndex(
+            catalog, max_staleness_seconds=BUSINESS_INDEX_MAX_STALENESS_SECONDS
+        )
+    if CATEGORY_INDEX_ENABLED:
+        business_indexes['category_index'] = CategoryIndex(
+            catalog, max_staleness_seconds=BUSINESS_INDEX_MAX_STALENESS_SECONDS
+        )
+    if TRENDING_INDEX_ENABLED:
+        business_indexes['trending_index'] = TrendingIndex(catalog, redis_client=cache_client)
+    if business_indexes:
+        # Businesses added after the catalog was built; the consumer loads them before trusting the indexes
+        catalog_max_id = int(catalog.numeric['id'].max())
+        threading.Thread(
+            target=start_business_index_consumer,
+            args=(
+                list(business_indexes.values()),
+                lambda: db.fetch_all_prepared("business_added_since", (catalog_max_id,)),
+                KAFKA_BOOTSTRAP_SERVERS,
+            ),
+            daemon=True
+        ).start()
+        logging.info(f"Business indexes built over {len(catalog)} businesses: {', '.join(business_indexes)}")
+
+    try:
+        if SERVER_MODE == 'asyncio':
+            asyncio.run(serve_async(ranker, local_cache, business_indexes))
+        else:
+            serve_threads(recommendation_service, cache_client, business_indexes)
+    finally:
+        if ranker:
+            ranker.shutdown()
+
+
+def serve_threads(recommendation_service, cache_client, business_indexes=None):
+    """
+    Serve every service from a thread pool of GRPC_MAX_WORKERS blocking handlers.
+
+    :param cache_client: Redis client (optionally fronted by the L1 cache) for UserService and the
+        trending lists.
+    :param business_indexes: Enabled in-memory indexes for BusinessService, by keyword argument name.
+    """
+    # Create the gRPC server
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=GRPC_MAX_WORKERS))
+
+    # Add BusinessService to the server
+    business_service = BusinessService(
+        db=db, kafka_producer=kafka_producer, redis_client=cache_client, **(business_indexes or {})
+    )
+    business_service_pb2_grpc.add_BusinessServiceServicer_to_server(business_service, server)
+
+    # Add RecommendationService to the server
+    add_recommendation_service_to_server(recommendation_service, server)
 
     # Add UserService to the server
-    user_service = UserService(db=db, redis_client=redis_client, recommendation_service=recommendation_service)
+    user_service = UserService(db=db, redis_client=cache_client, recommendation_service=recommendation_service)
     user_service_pb2_grpc.add_UserServiceServicer_to_server(user_service, server)
 
     # Add Health Checking Service
@@ -149,14 +283,68 @@ def serve():
     # Set the health status of the services
     health_service.set('', health_pb2.HealthCheckResponse.SERVING)
 
-    # Bind server to port 50051
-    server.add_insecure_port('[::]:50051')
-    logging.info("gRPC server is running on port 50051 with health checks...")
+    # Bind server to the configured port (50051 by default)
+    server.add_insecure_port(f'[::]:{SERVER_PORT}')
+    logging.info(f"gRPC server is running on port {SERVER_PORT} with health checks...")
 
     # Start the server
     server.start()
     server.wait_for_termination()
 
 
+async def serve_async(ranker=None, local_cache=None, business_indexes=None):
+    """
+    Serve every service as asyncio servicers on a grpc.aio server. Handlers await async
+    Redis and Postgres clients; ranking and bcrypt run on a CPU thread pool.
+
+    :param local_cache: L1 LocalCache to put in front of the async Redis client, if any.
+    :param business_indexes: Enabled in-memory indexes for AsyncBusinessService, by keyword argument name.
+    """
+    async_redis = redis.asyncio.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=False)
+    cache_client = async_redis
+    if local_cache is not None:
+        cache_client = AsyncCachedRedis(async_redis, local_cache, channel=CACHE_INVALIDATION_CHANNEL)
+    async_db = AsyncDatabase(
+        db_name=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT,
+        min_connections=DB_POOL_MIN, max_connections=DB_POOL_MAX
+    )
+    async_db.register_statements(STATEMENTS)
+    await async_db.connect()
+    print(f"Connected to Database at {DB_HOST}:{DB_PORT} (asyncpg)")
+
+    cpu_executor = futures.ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+    server = grpc.aio.server(maximum_concurrent_rpcs=MAX_CONCURRENT_RPCS)
+
+    business_service = AsyncBusinessService(
+        db=async_db, kafka_producer=kafka_producer, redis_client=cache_client, **(business_indexes or {})
+    )
+    business_service_pb2_grpc.add_BusinessServiceServicer_to_server(business_service, server)
+
+    recommendation_service = AsyncRecommendationService(
+        db=async_db, redis_client=cache_client, model=model, executor=cpu_executor, ranker=ranker
+    )
+    add_recommendation_service_to_server(recommendation_service, server)
+
+    user_service = AsyncUserService(
+        db=async_db, redis_client=cache_client, recommendation_service=recommendation_service, executor=cpu_executor
+    )
+    user_service_pb2_grpc.add_UserServiceServicer_to_server(user_service, server)
+
+    health_service = health.aio.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(health_service, server)
+    await health_service.set('', health_pb2.HealthCheckResponse.SERVING)
+
+    server.add_insecure_port(f'[::]:{SERVER_PORT}')
+    logging.info(f"gRPC asyncio server is running on port {SERVER_PORT} with health checks...")
+
+    await server.start()
+    try:
+        await server.wait_for_termination()
+    finally:
+        await async_db.close()
+        await async_redis.aclose()
+        cpu_executor.shutdown(wait=False)
+
+
 if __name__ == "__main__":
-    serve()
\ No newline at end of file
+    serve()
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+
+from cache.tiered_cache import async_get_with_ttl
+from codegen import business_service_pb2 as pb2
+from monitoring.metrics import metrics
+from services.business.business_service import BusinessService, page_limit
+from services.business.trending import TRENDING_DEPTH, TRENDING_FRESHNESS_SECONDS, TRENDING_LIMIT, trending_key
+import grpc
+
+
+class AsyncBusinessService(BusinessService):
+    def __init__(self, db, kafka_producer, proximity_index=None, category_index=None, trending_index=None,
+                 redis_client=None):
+        """
+        asyncio variant of BusinessService for the grpc.aio server.
+
+        :param db: AsyncDatabase instance
+        :param kafka_producer: KafkaProducer instance; sends run on the default executor
+        :param proximity_index: ProximityIndex, queried inline since a lookup takes well under a millisecond
+        :param category_index: CategoryIndex, likewise queried inline
+        :param trending_index: TrendingIndex, likewise queried inline
+        :param redis_client: asyncio Redis client (ideally AsyncCachedRedis) holding the trending lists
+        """
+        super().__init__(
+            db=db, kafka_producer=kafka_producer, proximity_index=proximity_index, category_index=category_index,
+            trending_index=trending_index, redis_client=redis_client
+        )
+
+    async def GetBusiness(self, request, context):
+        business = await self.db.fetch_one_prepared("business_by_id", (request.id,))
+        if not business:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details('Business not found')
+            return pb2.BusinessResponse()
+
+        return self.map_to_business_response(business)
+
+    async def AddBusiness(self, request, context):
+        try:
+            # Check if a similar business already exists
+            existing_business = await self.db.fetch_one_prepared("business_find_duplicate", (
+                request.businessid, request.name, request.address, request.city, request.state, request.country
+            ))
+
+            if existing_business:
+                context.set_code(grpc.StatusCode.ALREADY_EXISTS)
+                context.set_details('Business with this ID or similar details already exists')
+                return pb2.BusinessResponse()
+
+            # Insert new business if no duplicate exists
+            business_id = await self.db.fetch_one_prepared("business_insert", (
+                request.businessid, request.name, request.rating, request.review_count, request.address,
+                request.category, request.city, request.state, request.country, request.zip_code,
+                request.latitude, request.longitude, request.phone, request.price, request.image_url,
+                request.url, request.distance
+            ))
+            logging.info(f'Business ID: {business_id}')
+
+            # Send the new business data to Kafka; send() can block on metadata, so keep it off the loop
+            try:
+                new_business = {
+                    "id": business_id['id'],
+                    "businessid": request.businessid,
+                    "name": request.name,
+                    "rating": request.rating,
+                    "review_count": request.review_count,
+                    "address": request.address,
+                    "category": request.category,
+                    "city": request.city,
+                    "state": request.state,
+                    "country": request.country,
+                    "zip_code": request.zip_code,
+                    "latitude": request.latitude,
+                    "longitude": request.longitude,
+                    "phone": request.phone,
+                    "price": request.price,
+                    "image_url": request.image_url,
+                    "url": request.url
+                }
+                await asyncio.get_running_loop().run_in_executor(
+                    None, lambda: self.kafka_producer.send('new-business-data', value=new_business)
+                )
+                logging.info(f"New business sent to Kafka: {new_business}")
+            except Exception as e:
+                context.set_code(grpc.StatusCode.INTERNAL)
+                context.set_details(f"Failed to send business to Kafka: {str(e)}")
+                logging.info(f"Failed to send business to Kafka: {str(e)}")
+                return pb2.BusinessResponse()
+
+            return pb2.BusinessResponse(
+                id=business_id['id'],
+                businessid=request.businessid,
+                name=request.name,
+                rating=request.rating,
+                review_count=request.review_count,
+                address=request.address,
+                category=request.category,
+                city=request.city,
+                state=request.state,
+                country=request.country,
+                zip_code=request.zip_code,
+                latitude=request.latitude,
+                longitude=request.longitude,
+                phone=request.phone,
+                price=request.price,
+                image_url=request.image_url,
+                url=request.url,
+                distance=request.distance
+            )
+        except Exception as e:
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details('Internal server error')
+            print("Exception occurred:", e)
+            return pb2.BusinessResponse()
+
+    async def GetBusinessByName(self, request, context):
+        business = await self.db.fetch_one_prepared("business_by_name", (request.name,))
+        if not business:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details('Business not found')
+            return pb2.BusinessResponse()
+
+        return self.map_to_business_response(business)
+
+    async def GetBusinessByLocation(self, request, context):
+        try:
+            businesses = await self.db.fetch_all_prepared(
+                "business_by_location", (request.latitude, request.longitude, request.radius * 1000)  # radius in meters
+            )
+
+            if not businesses:
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details('No businesses found near the specified location')
+                return pb2.BusinessListResponse(businesses=[])
+
+            return pb2.BusinessListResponse(
+                businesses=[self.map_to_business_response({**business, 'distance': request.radius})
+                            for business in businesses]
+            )
+        except Exception as e:
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details('Internal server error')
+            return pb2.BusinessListResponse(businesses=[])
+
+    async def GetBusinessByCategory(self, request, context):
+        try:
+            limit, after = self.category_page_params(request)
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        page = self.search_category_index(request, limit, after)
+        if page is None:
+            page = self.keyset_page(
+                await self.db.fetch_all_prepared("business_by_category", self.category_params(request, limit, after)),
+                limit,
+            )
+        return self.page_response(
+            context, page, after, self.category_query(request), 'No businesses found in the specified category'
+        )
+
+    async def GetBusinessByRating(self, request, context):
+        try:
+            limit, after = self.rating_page_params(request)
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        page = self.keyset_page(await self.db.fetch_all_prepared(*self.rating_statement(request, limit, after)), limit)
+        return self.page_response(
+            context, page, after, self.rating_query(request), 'No businesses found with the specified rating'
+        )
+
+    async def GetBusinessByProximity(self, request, context):
+        try:
+            self.check_proximity_limit(request)
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        try:
+            businesses = self.nearest_from_index(request)
+            if businesses is None:
+                businesses = await self.db.fetch_all_prepared(
+                    "business_by_proximity",
+                    (request.latitude, request.longitude, request.latitude, request.longitude, request.limit)
+                )
+
+            if not businesses:
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details('No businesses found')
+                return pb2.BusinessListResponse(businesses=[])
+
+            return pb2.BusinessListResponse(
+                businesses=[self.map_to_business_response({**business, 'distance': business['calculated_distance']})
+                            for business in businesses]
+            )
+        except Exception as e:
+            print("Exception is: ", e)
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details('Internal server error')
+            return pb2.BusinessListResponse(businesses=[])
+
+    async def GetTrendingBusinesses(self, request, context):
+        try:
+            limit = page_limit(request.limit, TRENDING_LIMIT, TRENDING_DEPTH)
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        businesses = self.trending_from_index(request, limit)
+        if businesses is None:
+            key = trending_key(request.city)
+            cached = (await async_get_with_ttl(self.redis_client, key))[0] if self.redis_client is not None else None
+            if cached is not None:
+                metrics.counter("trending_redis_hits").inc()
+                businesses = pb2.BusinessListResponse.FromString(cached).businesses
+            else:
+                response = self.trending_list(await self.db.fetch_all_prepared(*self.trending_statement(request)))
+                if self.redis_client is not None and response.businesses:
+                    await self.redis_client.set(key, response.SerializeToString(), ex=int(TRENDING_FRESHNESS_SECONDS))
+                businesses = response.businesses
+        return self.trending_response(context, businesses[:limit])
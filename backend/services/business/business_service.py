@@ -1,26 +1,63 @@
 import logging
+from decimal import Decimal
 
+from cache.keys import canonical_city
+from cache.tiered_cache import get_with_ttl
 from codegen import business_service_pb2 as pb2
 from codegen import business_service_pb2_grpc as pb2_grpc
+from monitoring.metrics import metrics
+from services.business.category_index import normalize_query
+from services.business.pagination import FIRST_PAGE_KEY, decode_page_token, encode_page_token, page_key
+from services.business.trending import TRENDING_DEPTH, TRENDING_FRESHNESS_SECONDS, TRENDING_LIMIT, trending_key
 import grpc
 
+# Businesses per page of a category or rating listing, by default and at most
+PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+
+def page_limit(requested, default=PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """
+    :return: Businesses to return for a requested limit: `default` if unset, at most `maximum`.
+    :raises ValueError: If the requested limit is negative.
+    """
+    if requested < 0:
+        raise ValueError(f"Limit must not be negative, got {requested}")
+    return min(requested or default, maximum)
+
+
+def contains_pattern(text):
+    """
+    :return: (I)LIKE pattern matching strings that contain `text` literally.
+    """
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
 
 class BusinessService(pb2_grpc.BusinessServiceServicer):
-    def __init__(self, db, kafka_producer):
+    def __init__(self, db, kafka_producer, proximity_index=None, category_index=None, trending_index=None,
+                 redis_client=None):
         """
         Constructor for BusinessService.
 
         :param db: Database connection instance
         :param kafka_producer: KafkaProducer instance
+        :param proximity_index: ProximityIndex answering GetBusinessByProximity while it is fresh;
+            Postgres is queried when it is stale or absent.
+        :param category_index: CategoryIndex answering GetBusinessByCategory, likewise.
+        :param trending_index: TrendingIndex answering GetTrendingBusinesses, likewise; Redis is
+            read before Postgres.
+        :param redis_client: Redis client (ideally CachedRedis) holding the trending lists.
         """
         self.db = db
         self.kafka_producer = kafka_producer
+        self.proximity_index = proximity_index
+        self.category_index = category_index
+        self.trending_index = trending_index
+        self.redis_client = redis_client
 
     def GetBusiness(self, request, context):
-        query = """
-        SELECT * FROM Business WHERE id = %s
-        """
-        business = self.db.fetch_one(query, (request.id,))
+        business = self.db.fetch_one_prepared("business_by_id", (request.id,))
         if not business:
             context.set_code(grpc.StatusCode.NOT_FOUND)
             context.set_details('Business not found')
@@ -50,12 +87,7 @@ class BusinessService(pb2_grpc.BusinessServiceServicer):
     def AddBusiness(self, request, context):
         try:
             # Check if a similar business already exists
-            check_query = """
-            SELECT id FROM Business 
-            WHERE businessid = %s OR 
-                (name = %s AND address = %s AND city = %s AND state = %s AND country = %s)
-            """
-            existing_business = self.db.fetch_one(check_query, (
+            existing_business = self.db.fetch_one_prepared("business_find_duplicate", (
                 request.businessid, request.name, request.address, request.city, request.state, request.country
             ))
 
@@ -67,15 +99,8 @@ class BusinessService(pb2_grpc.BusinessServiceServicer):
             logging.info('Hello1')
 
             # Insert new business if no duplicate exists
-            query = """
-            INSERT INTO Business (businessid, name, rating, review_count, address, category, 
-                                city, state, country, zip_code, latitude, longitude, 
-                                phone, price, image_url, url, distance)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-            """
             logging.info('Hello2')
-            business_id = self.db.fetch_one(query, (
+            business_id = self.db.fetch_one_prepared("business_insert", (
                 request.businessid, request.name, request.rating, request.review_count, request.address,
                 request.category, request.city, request.state, request.country, request.zip_code,
                 request.latitude, request.longitude, request.phone, request.price, request.image_url,
@@ -95,7 +120,15 @@ class BusinessService(pb2_grpc.BusinessServiceServicer):
                     "address": request.address,
                     "category": request.category,
                     "city": request.city,
-                    "price": request.price
+                    "state": request.state,
+                    "country": request.country,
+                    "zip_code": request.zip_code,
+                    "latitude": request.latitude,
+                    "longitude": request.longitude,
+                    "phone": request.phone,
+                    "price": request.price,
+                    "image_url": request.image_url,
+                    "url": request.url
                 }
                 logging.info(f'new_business: {new_business}')
                 self.kafka_producer.send('new-business-data', value=new_business)
@@ -134,10 +167,7 @@ class BusinessService(pb2_grpc.BusinessServiceServicer):
         
 
     def GetBusinessByName(self, request, context):
-        query = """
-        SELECT * FROM Business WHERE name = %s
-        """
-        business = self.db.fetch_one(query, (request.name,))
+        business = self.db.fetch_one_prepared("business_by_name", (request.name,))
         if not business:
             context.set_code(grpc.StatusCode.NOT_FOUND)
             context.set_details('Business not found')
@@ -167,12 +197,9 @@ class BusinessService(pb2_grpc.BusinessServiceServicer):
 
     def GetBusinessByLocation(self, request, context):
         try:
-            query = """
-            SELECT *
-            FROM Business
-            WHERE earth_box(ll_to_earth(%s, %s), %s) @> ll_to_earth(latitude, longitude) LIMIT 3
-            """
-            businesses = self.db.fetch_all(query, (request.latitude, request.longitude, request.radius * 1000))  # radius in meters
+            businesses = self.db.fetch_all_prepared(
+                "business_by_location", (request.latitude, request.longitude, request.radius * 1000)  # radius in meters
+            )
 
             if not businesses:
                 context.set_code(grpc.StatusCode.NOT_FOUND)
@@ -209,38 +236,132 @@ class BusinessService(pb2_grpc.BusinessServiceServicer):
             return pb2.BusinessListResponse(businesses=[])
 
     def GetBusinessByCategory(self, request, context):
-        query = "SELECT * FROM Business WHERE category ILIKE %s  LIMIT 3"
-        businesses = self.db.fetch_all(query, (f"%{request.category}%",))
+        try:
+            limit, after = self.category_page_params(request)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        page = self.search_category_index(request, limit, after)
+        if page is None:
+            page = self.keyset_page(
+                self.db.fetch_all_prepared("business_by_category", self.category_params(request, limit, after)), limit
+            )
+        return self.page_response(
+            context, page, after, self.category_query(request), 'No businesses found in the specified category'
+        )
+
+    @staticmethod
+    def category_page_params(request):
+        """
+        :return: (limit, after) for a category search, `after` being the page token's (rating, id) key.
+        :raises ValueError: If the limit is negative or the page token is invalid for the request.
+        """
+        limit = page_limit(request.limit)
+        after = FIRST_PAGE_KEY
+        if request.page_token:
+            after = decode_page_token(request.page_token, *BusinessService.category_query(request))
+        return limit, after
+
+    @staticmethod
+    def category_query(request):
+        # What a category page token is bound to
+        return "category", normalize_query(request.category)
+
+    @staticmethod
+    def category_params(request, limit, after):
+        # One row past the page tells whether there is a next page
+        rating, business_id = after
+        return contains_pattern(normalize_query(request.category)), Decimal(f"{rating:.2f}"), business_id, limit + 1
+
+    @staticmethod
+    def keyset_page(rows, limit):
+        """
+        :return: (businesses, has_more) from up to limit + 1 rows.
+        """
+        rows = rows or []
+        return rows[:limit], len(rows) > limit
+
+    def search_category_index(self, request, limit, after):
+        """
+        :return: (businesses, has_more) from the category index, or None if it cannot be trusted.
+        """
+        if self.category_index is None or not self.category_index.is_fresh():
+            metrics.counter("category_postgres_fallbacks").inc()
+            return None
+        metrics.counter("category_index_queries").inc()
+        return self.category_index.search(request.category, after=after, limit=limit)
+
+    def page_response(self, context, page, after, query, not_found_details):
+        """
+        :param page: (businesses, has_more)
+        :param after: (rating, id) key the page starts after.
+        :param query: What the next page token is bound to.
+        :param not_found_details: Details of the NOT_FOUND status sent for an empty first page.
+        """
+        businesses, has_more = page
         if not businesses:
-            context.set_code(grpc.StatusCode.NOT_FOUND)
-            context.set_details('No businesses found in the specified category')
+            if after == FIRST_PAGE_KEY:
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details(not_found_details)
             return pb2.BusinessListResponse()
 
+        next_page_token = encode_page_token(page_key(businesses[-1]), *query) if has_more else ""
         return pb2.BusinessListResponse(
-            businesses=[self.map_to_business_response(business) for business in businesses]
+            businesses=[self.map_to_business_response(business) for business in businesses],
+            next_page_token=next_page_token,
         )
 
     def GetBusinessByRating(self, request, context):
-        query = "SELECT * FROM Business WHERE rating >= %s  LIMIT 3"
-        businesses = self.db.fetch_all(query, (request.min_rating,))
-        if not businesses:
-            context.set_code(grpc.StatusCode.NOT_FOUND)
-            context.set_details('No businesses found with the specified rating')
-            return pb2.BusinessListResponse()
-
-        return pb2.BusinessListResponse(
-            businesses=[self.map_to_business_response(business) for business in businesses]
+        try:
+            limit, after = self.rating_page_params(request)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        page = self.keyset_page(self.db.fetch_all_prepared(*self.rating_statement(request, limit, after)), limit)
+        return self.page_response(
+            context, page, after, self.rating_query(request), 'No businesses found with the specified rating'
         )
 
+    @staticmethod
+    def rating_page_params(request):
+        """
+        :return: (limit, after) for a rating listing, `after` being the page token's (rating, id) key.
+        :raises ValueError: If the limit is negative or the page token is invalid for the request.
+        """
+        limit = page_limit(request.limit)
+        after = FIRST_PAGE_KEY
+        if request.page_token:
+            after = decode_page_token(request.page_token, *BusinessService.rating_query(request))
+        return limit, after
+
+    @staticmethod
+    def rating_query(request):
+        # min_rating is a float32; compare it at the NUMERIC(3, 2) precision of the column
+        return "rating", f"{request.min_rating:.2f}", canonical_city(request.city)
+
+    @staticmethod
+    def rating_statement(request, limit, after):
+        """
+        :return: (statement name, params) of a keyset page of businesses rated at least min_rating,
+            with one row past the page.
+        """
+        _, min_rating, city = BusinessService.rating_query(request)
+        rating, business_id = after
+        params = (Decimal(min_rating), Decimal(f"{rating:.2f}"), business_id, limit + 1)
+        if city:
+            return "business_by_rating_in_city", (city,) + params
+        return "business_by_rating", params
+
     def GetBusinessByProximity(self, request, context):
         try:
-            query = """
-            SELECT *, (earth_distance(ll_to_earth(latitude, longitude), ll_to_earth(%s, %s))) AS calculated_distance
-            FROM Business
-            ORDER BY calculated_distance ASC
-            LIMIT %s
-            """
-            businesses = self.db.fetch_all(query, (request.latitude, request.longitude, request.limit))
+            self.check_proximity_limit(request)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        try:
+            businesses = self.nearest_from_index(request)
+            if businesses is None:
+                businesses = self.db.fetch_all_prepared(
+                    "business_by_proximity",
+                    (request.latitude, request.longitude, request.latitude, request.longitude, request.limit)
+                )
 
             if not businesses:
                 context.set_code(grpc.StatusCode.NOT_FOUND)
@@ -278,17 +399,75 @@ class BusinessService(pb2_grpc.BusinessServiceServicer):
             return pb2.BusinessListResponse(businesses=[])
 
 
+    @staticmethod
+    def check_proximity_limit(request):
+        """
+        :raises ValueError: If the request asks for fewer than one business.
+        """
+        if request.limit < 1:
+            raise ValueError(f"limit must be at least 1, got {request.limit}")
+
+    def nearest_from_index(self, request):
+        """
+        :return: The nearest businesses from the proximity index, or None if it cannot be trusted.
+        :raises ValueError: If the request asks for fewer than one business.
+        """
+        self.check_proximity_limit(request)
+        if self.proximity_index is None or not self.proximity_index.is_fresh():
+            metrics.counter("proximity_postgres_fallbacks").inc()
+            return None
+        metrics.counter("proximity_index_queries").inc()
+        return self.proximity_index.nearest(request.latitude, request.longitude, request.limit)
+
     def GetTrendingBusinesses(self, request, context):
-        query = "SELECT * FROM Business ORDER BY review_count DESC LIMIT 3"
-        businesses = self.db.fetch_all(query)
+        try:
+            limit = page_limit(request.limit, TRENDING_LIMIT, TRENDING_DEPTH)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        businesses = self.trending_from_index(request, limit)
+        if businesses is None:
+            key = trending_key(request.city)
+            cached = get_with_ttl(self.redis_client, key)[0] if self.redis_client is not None else None
+            if cached is not None:
+                metrics.counter("trending_redis_hits").inc()
+                businesses = pb2.BusinessListResponse.FromString(cached).businesses
+            else:
+                response = self.trending_list(self.db.fetch_all_prepared(*self.trending_statement(request)))
+                if self.redis_client is not None and response.businesses:
+                    self.redis_client.set(key, response.SerializeToString(), ex=int(TRENDING_FRESHNESS_SECONDS))
+                businesses = response.businesses
+        return self.trending_response(context, businesses[:limit])
+
+    def trending_from_index(self, request, limit):
+        """
+        :return: BusinessResponses from the trending index, or None if it cannot be trusted.
+        """
+        if self.trending_index is None or not self.trending_index.is_fresh():
+            metrics.counter("trending_index_misses").inc()
+            return None
+        metrics.counter("trending_index_queries").inc()
+        return [self.map_to_business_response(business) for business in self.trending_index.top(request.city, limit)]
+
+    @staticmethod
+    def trending_statement(request):
+        """
+        :return: (statement name, params) reading a full trending list from Postgres.
+        """
+        city = canonical_city(request.city)
+        if city:
+            return "business_trending_by_city", (city, TRENDING_DEPTH)
+        return "business_trending", (TRENDING_DEPTH,)
+
+    def trending_list(self, rows):
+        return pb2.BusinessListResponse(businesses=[self.map_to_business_response(business) for business in rows or []])
+
+    @staticmethod
+    def trending_response(context, businesses):
         if not businesses:
             context.set_code(grpc.StatusCode.NOT_FOUND)
             context.set_details('No trending businesses found')
             return pb2.BusinessListResponse()
-
-        return pb2.BusinessListResponse(
-            businesses=[self.map_to_business_response(business) for business in businesses]
-        )
+        return pb2.BusinessListResponse(businesses=businesses)
 
     @staticmethod
     def map_to_business_response(business):
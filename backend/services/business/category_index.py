@@ -0,0 +1,243 @@
+"""
+In-memory inverted index over business categories for GetBusinessByCategory.
+
+A business's category text ("Pizza, Italian, Wine Bars") is split on commas into terms. A
+query matches a business when it is a case-insensitive substring of one of its terms, which
+is `category ILIKE '%query%'` unless the query spans a comma. Distinct terms number in the
+hundreds to low thousands, so a query scans them for matches and merges their posting lists.
+
+Posting lists hold positions in the global (rating, id) descending order, so merged postings
+are already rating-ranked and a page starts at the first position after its page token's
+key; only the first `limit` + 1 entries of each list are read. Businesses from Kafka go to a
+delta list merged in at query time, and are folded into the posting lists once it grows.
+"""
+import copy
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from monitoring.metrics import metrics
+from services.business.pagination import FIRST_PAGE_KEY
+from services.business.synced_index import SyncedIndex, catalog_row, event_row
+
+# Fold the delta list into the posting lists once it exceeds this share of the index
+# (and at least REBUILD_MIN_ROWS)
+REBUILD_FRACTION = 0.05
+REBUILD_MIN_ROWS = 1024
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
+
+
+def category_terms(category):
+    """
+    :return: Distinct normalized, non-empty comma-separated terms of a category string.
+    """
+    terms = (normalize_query(part) for part in (category or '').split(','))
+    return list(dict.fromkeys(term for term in terms if term))
+
+
+class _CategoryState:
+    """
+    Immutable view of the index. Slots are catalog rows first, then businesses added from Kafka.
+
+    :param ratings: Rating per slot (float32, missing ratings are 0).
+    :param ids: Business ID per slot.
+    :param pair_slots: Slot of every (slot, term) pair.
+    :param pair_terms: Term code of every (slot, term) pair.
+    :param vocabulary: Term per term code.
+    :param delta: (slot, rating, id, terms) of businesses not yet in the posting lists.
+    """
+
+    def __init__(self, ratings, ids, pair_slots, pair_terms, vocabulary, delta=()):
+        self.ratings = ratings
+        self.ids = ids
+        self.pair_slots = pair_slots
+        self.pair_terms = pair_terms
+        self.vocabulary = vocabulary
+        self.term_codes = {term: code for code, term in enumerate(vocabulary)}
+        self.delta = tuple(delta)
+
+        # Positions in (rating, id) descending order, as ascending (-rating, -id)
+        self.order_slots = np.lexsort((-ids, -ratings))
+        self.neg_ratings = -ratings[self.order_slots]
+        self.neg_ids = -ids[self.order_slots]
+        positions = np.empty(len(ratings), dtype=np.int64)
+        positions[self.order_slots] = np.arange(len(ratings))
+
+        pair_positions = positions[pair_slots]
+        pairs = np.lexsort((pair_positions, pair_terms))
+        self.term_positions = pair_positions[pairs]
+        self.term_offsets = np.searchsorted(pair_terms[pairs], np.arange(len(vocabulary) + 1))
+
+    def start_position(self, rating, business_id):
+        """
+        :return: Position of the first business whose (rating, id) comes after the key.
+        """
+        low = np.searchsorted(self.neg_ratings, -rating, side='left')
+        high = np.searchsorted(self.neg_ratings, -rating, side='right')
+        return low + np.searchsorted(self.neg_ids[low:high], -business_id, side='right')
+
+    def with_delta(self, delta):
+        """
+        :return: A copy sharing this state's posting lists, with a new delta list.
+        """
+        state = copy.copy(self)
+        state.delta = tuple(delta)
+        return state
+
+    def postings(self, code):
+        return self.term_positions[self.term_offsets[code]:self.term_offsets[code + 1]]
+
+
+class CategoryIndex(SyncedIndex):
+    name = "category_index"
+
+    def __init__(self, catalog, max_staleness_seconds=60):
+        """
+        :param catalog: BusinessCatalog to index.
+        :param max_staleness_seconds: How long after the last Kafka sync the index is still trusted.
+        """
+        super().__init__(catalog, max_staleness_seconds)
+        pair_slots, pair_terms, vocabulary = self._catalog_pairs(catalog.text['category'])
+        self._added = []
+        self._lock = threading.Lock()
+        self._state = _CategoryState(
+            catalog.numeric['rating'].astype(np.float32),
+            catalog.numeric['id'].astype(np.int64),
+            pair_slots,
+            pair_terms,
+            vocabulary,
+        )
+        logging.info(f"Category index built with {len(vocabulary)} terms over {len(catalog)} businesses")
+
+    @staticmethod
+    def _catalog_pairs(column):
+        """
+        (slot, term) pairs of a catalog's category column. Many businesses share a category
+        string, so each distinct string is split into terms only once.
+
+        :return: (pair_slots, pair_terms, vocabulary)
+        """
+        buffer = column.buffer.tobytes()
+        bounds = column.offsets.tolist()
+        codes, distinct = pd.factorize(pd.Series(
+            [buffer[start:end] for start, end in zip(bounds[:-1], bounds[1:])], dtype=object
+        ))
+
+        vocabulary, term_codes, distinct_terms = [], {}, []
+        for category in distinct:
+            terms = []
+            for term in category_terms(category.decode('utf-8')):
+                if term not in term_codes:
+                    term_codes[term] = len(vocabulary)
+                    vocabulary.append(term)
+                terms.append(term_codes[term])
+            distinct_terms.append(terms)
+
+        # Repeat each slot once per term of its category string, then look the terms up in
+        # the flattened per-string term lists
+        counts = np.array([len(terms) for terms in distinct_terms], dtype=np.int64)
+        flat_terms = np.array([code for terms in distinct_terms for code in terms], dtype=np.int64)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        slot_counts = counts[codes]
+        pair_slots = np.repeat(np.arange(len(codes), dtype=np.int64), slot_counts)
+        within = np.arange(len(pair_slots)) - np.repeat(np.cumsum(slot_counts) - slot_counts, slot_counts)
+        pair_terms = flat_terms[np.repeat(starts[codes], slot_counts) + within]
+        return pair_slots, pair_terms, vocabulary
+
+    def __len__(self):
+        return len(self._state.ratings) + len(self._state.delta)
+
+    def add_businesses(self, businesses):
+        """
+        Index businesses from `new-business-data` events. Events without an id, and businesses
+        already indexed, are skipped.
+
+        :return: Number of businesses added.
+        """
+        with self._lock:
+            state = self._state
+            delta = list(state.delta)
+            added = 0
+            for business in businesses:
+                business_id = business.get('id')
+                if business_id is None or not self.claim(business_id):
+                    continue
+                slot = len(self.catalog) + len(self._added)
+                self._added.append(event_row(business))
+                rating = np.float32(business.get('rating') or 0)
+                delta.append((slot, rating, int(business_id), tuple(category_terms(business.get('category')))))
+                added += 1
+            if not added:
+                return 0
+
+            if len(delta) > max(REBUILD_MIN_ROWS, REBUILD_FRACTION * len(state.ratings)):
+                self._state = self._rebuild(state, delta)
+                metrics.counter("category_index_rebuilds").inc()
+            else:
+                self._state = state.with_delta(delta)
+            metrics.counter("category_index_added").inc(added)
+        return added
+
+    @staticmethod
+    def _rebuild(state, delta):
+        vocabulary = list(state.vocabulary)
+        term_codes = dict(state.term_codes)
+        pair_slots, pair_terms = [], []
+        for slot, _, _, terms in delta:
+            for term in terms:
+                if term not in term_codes:
+                    term_codes[term] = len(vocabulary)
+                    vocabulary.append(term)
+                pair_slots.append(slot)
+                pair_terms.append(term_codes[term])
+        return _CategoryState(
+            np.concatenate((state.ratings, np.array([entry[1] for entry in delta], dtype=np.float32))),
+            np.concatenate((state.ids, np.array([entry[2] for entry in delta], dtype=np.int64))),
+            np.concatenate((state.pair_slots, np.array(pair_slots, dtype=np.int64))),
+            np.concatenate((state.pair_terms, np.array(pair_terms, dtype=np.int64))),
+            vocabulary,
+        )
+
+    def search(self, query, after=FIRST_PAGE_KEY, limit=10):
+        """
+        Businesses whose category matches `query`, best rated first.
+
+        :param after: (rating, id) key of the last business on the previous page.
+        :return: (rows, has_more) with at most `limit` row dicts.
+        """
+        state = self._state
+        query = normalize_query(query)
+        rating, business_id = np.float32(after[0]), int(after[1])
+
+        # First limit + 1 matches after the key: the head of each matching posting list suffices
+        start = state.start_position(rating, business_id)
+        heads = []
+        for code, term in enumerate(state.vocabulary):
+            if query in term:
+                postings = state.postings(code)
+                heads.append(postings[np.searchsorted(postings, start):][:limit + 1])
+        positions = np.unique(np.concatenate(heads))[:limit + 1] if heads else np.empty(0, dtype=np.int64)
+        candidates = [
+            ((neg_rating, neg_id), slot) for neg_rating, neg_id, slot in zip(
+                state.neg_ratings[positions].tolist(), state.neg_ids[positions].tolist(),
+                state.order_slots[positions].tolist(),
+            )
+        ]
+        candidates.extend(
+            ((-float(entry_rating), -entry_id), slot) for slot, entry_rating, entry_id, terms in state.delta
+            if (entry_rating, entry_id) < (rating, business_id) and any(query in term for term in terms)
+        )
+        candidates.sort()
+
+        rows = [self._row(slot) for _, slot in candidates[:limit]]
+        return rows, len(candidates) > limit
+
+    def _row(self, slot):
+        if slot < len(self.catalog):
+            return catalog_row(self.catalog, slot)
+        return self._added[slot - len(self.catalog)]
@@ -0,0 +1,48 @@
+"""
+Keyset page tokens for business listings ranked by rating.
+
+Listings are ordered by (rating, id) descending, with a missing rating counted as 0. A page
+token carries the key of the last business on the previous page plus a fingerprint of the
+query, so the next page starts strictly after that key. The key is the same whether the page
+came from Postgres or from an in-memory index, so a client can keep scrolling when a replica
+switches between them. Unlike offsets, businesses added between pages do not shift it.
+"""
+import base64
+import hashlib
+
+# Sorts before every (rating, id) key, so the first page needs no special statement
+FIRST_PAGE_KEY = (100.0, 2 ** 31 - 1)
+
+
+def query_fingerprint(*parts):
+    return hashlib.sha1("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:16]
+
+
+def page_key(business):
+    """
+    :return: The (rating, id) key of a business row, with the rating rounded like NUMERIC(3, 2).
+    """
+    return round(float(business['rating'] or 0), 2), int(business['id'])
+
+
+def encode_page_token(key, *query):
+    rating, business_id = key
+    token = f"{rating:.2f}:{business_id}:{query_fingerprint(*query)}"
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii")
+
+
+def decode_page_token(page_token, *query):
+    """
+    :return: The (rating, id) key encoded in the token.
+    :raises ValueError: If the token is malformed or was issued for a different query.
+    """
+    try:
+        rating, business_id, fingerprint = base64.urlsafe_b64decode(
+            page_token.encode("ascii")
+        ).decode("utf-8").split(":")
+        key = float(rating), int(business_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Malformed page token") from e
+    if fingerprint != query_fingerprint(*query):
+        raise ValueError("Page token does not belong to this query")
+    return key
@@ -0,0 +1,80 @@
+"""
+In-memory nearest-business lookups for GetBusinessByProximity.
+
+The index is built from the recommendation catalog at startup and extended with the
+businesses announced on the `new-business-data` topic; while it is stale callers query
+Postgres instead (see SyncedIndex).
+"""
+import threading
+
+import numpy as np
+
+from monitoring.metrics import metrics
+from services.business.spatial_index import SpatialIndex
+from services.business.synced_index import SyncedIndex, catalog_row, event_row
+
+
+class ProximityIndex(SyncedIndex):
+    name = "proximity_index"
+
+    def __init__(self, catalog, max_staleness_seconds=60):
+        """
+        :param catalog: BusinessCatalog to index; rows without coordinates are left out.
+        :param max_staleness_seconds: How long after the last Kafka sync the index is still trusted.
+        """
+        super().__init__(catalog, max_staleness_seconds)
+        latitudes = catalog.numeric['latitude']
+        longitudes = catalog.numeric['longitude']
+        located = np.flatnonzero((latitudes != 0) | (longitudes != 0))
+        # Points are keyed by slot: catalog rows first, then businesses added from Kafka
+        self.index = SpatialIndex(located, latitudes[located], longitudes[located])
+        self._added = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.index)
+
+    def add_businesses(self, businesses):
+        """
+        Index businesses from `new-business-data` events. Events without an id or coordinates,
+        and businesses already indexed, are skipped.
+
+        :return: Number of businesses added.
+        """
+        with self._lock:
+            rows = []
+            for business in businesses:
+                business_id = business.get('id')
+                latitude, longitude = business.get('latitude'), business.get('longitude')
+                if business_id is None or latitude is None or longitude is None or (latitude == 0 and longitude == 0):
+                    continue
+                if not self.claim(business_id):
+                    continue
+                rows.append(event_row(business))
+            if rows:
+                # Rows are in place before their points become visible to readers
+                first_slot = len(self.catalog) + len(self._added)
+                self._added.extend(rows)
+                self.index.add(
+                    np.arange(first_slot, first_slot + len(rows)),
+                    [row['latitude'] for row in rows], [row['longitude'] for row in rows],
+                )
+                metrics.counter("proximity_index_added").inc(len(rows))
+        return len(rows)
+
+    def nearest(self, latitude, longitude, k):
+        """
+        :return: The k nearest businesses as row dicts, nearest first, each with
+            `calculated_distance` in meters like the business_by_proximity statement.
+        :raises ValueError: If k is less than 1.
+        """
+        slots, distances = self.index.nearest(latitude, longitude, k)
+        return [
+            dict(self._row(slot), calculated_distance=distance)
+            for slot, distance in zip(slots.tolist(), distances.tolist())
+        ]
+
+    def _row(self, slot):
+        if slot < len(self.catalog):
+            return catalog_row(self.catalog, slot)
+        return self._added[slot - len(self.catalog)]
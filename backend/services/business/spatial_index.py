@@ -0,0 +1,155 @@
+"""
+In-process spatial index over business coordinates.
+
+Businesses are stored as points on the unit sphere (the same embedding earthdistance's
+ll_to_earth uses), so straight-line chord distance orders neighbours exactly like
+great-circle distance. Static points live in a scipy cKDTree; points added afterwards go to
+a small delta buffer that is scanned brute force and folded into a rebuilt tree once it
+grows past a fraction of the tree. Readers take the current state with one reference read,
+so queries never wait on an add or a rebuild.
+"""
+import logging
+import threading
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from monitoring.metrics import metrics
+
+# Radius of earthdistance's earth(), so distances match earth_distance() in SQL
+EARTH_RADIUS_M = 6378168.0
+# Rebuild the tree once the delta buffer exceeds this share of it (and at least REBUILD_MIN_POINTS)
+REBUILD_FRACTION = 0.05
+REBUILD_MIN_POINTS = 1024
+
+
+def to_unit_vectors(latitudes, longitudes):
+    """
+    :return: (n, 3) array of points on the unit sphere.
+    """
+    latitudes = np.radians(np.asarray(latitudes, dtype=np.float64))
+    longitudes = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_latitudes = np.cos(latitudes)
+    return np.column_stack((
+        cos_latitudes * np.cos(longitudes), cos_latitudes * np.sin(longitudes), np.sin(latitudes)
+    ))
+
+
+def chord_to_meters(chords):
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(np.asarray(chords) / 2, 1.0))
+
+
+def meters_to_chord(meters):
+    return 2 * np.sin(min(meters / EARTH_RADIUS_M, np.pi) / 2)
+
+
+class _IndexState:
+    """
+    Immutable view of the index: the tree with its ids, plus the delta buffer.
+    """
+
+    def __init__(self, tree, ids, delta_ids, delta_points):
+        self.tree = tree
+        self.ids = ids
+        self.delta_ids = delta_ids
+        self.delta_points = delta_points
+
+    def __len__(self):
+        return len(self.ids) + len(self.delta_ids)
+
+
+class SpatialIndex:
+    def __init__(self, ids, latitudes, longitudes):
+        """
+        :param ids: Business IDs, one per coordinate pair.
+        :param latitudes: Latitudes in degrees.
+        :param longitudes: Longitudes in degrees.
+        """
+        self._lock = threading.Lock()
+        self._state = self._build(np.asarray(ids, dtype=np.int64), to_unit_vectors(latitudes, longitudes))
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        """
+        Index every catalog row with coordinates; the catalog stores missing ones as (0, 0).
+        """
+        latitudes = catalog.numeric['latitude']
+        longitudes = catalog.numeric['longitude']
+        located = (latitudes != 0) | (longitudes != 0)
+        return cls(catalog.numeric['id'][located], latitudes[located], longitudes[located])
+
+    @staticmethod
+    def _build(ids, points):
+        tree = cKDTree(points) if len(ids) else None
+        metrics.gauge("spatial_index_points").set(len(ids))
+        return _IndexState(tree, ids, np.empty(0, dtype=np.int64), np.empty((0, 3)))
+
+    def __len__(self):
+        return len(self._state)
+
+    def add(self, ids, latitudes, longitudes):
+        """
+        Add businesses to the delta buffer, rebuilding the tree when the buffer grows too large.
+        """
+        points = to_unit_vectors(latitudes, longitudes)
+        with self._lock:
+            state = self._state
+            delta_ids = np.concatenate((state.delta_ids, np.asarray(ids, dtype=np.int64)))
+            delta_points = np.concatenate((state.delta_points, points))
+            if len(delta_ids) > max(REBUILD_MIN_POINTS, REBUILD_FRACTION * len(state.ids)):
+                tree_points = state.tree.data if state.tree is not None else np.empty((0, 3))
+                self._state = self._build(
+                    np.concatenate((state.ids, delta_ids)), np.concatenate((tree_points, delta_points))
+                )
+                metrics.counter("spatial_index_rebuilds").inc()
+                logging.info(f"Spatial index rebuilt with {len(self._state)} points")
+            else:
+                self._state = _IndexState(state.tree, state.ids, delta_ids, delta_points)
+
+    def nearest(self, latitude, longitude, k):
+        """
+        :return: (ids, distances in meters) of the k nearest businesses, nearest first.
+        :raises ValueError: If k is less than 1.
+        """
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        state = self._state
+        query = to_unit_vectors([latitude], [longitude])[0]
+        candidate_ids, candidate_chords = [], []
+        if state.tree is not None:
+            chords, positions = state.tree.query(query, k=min(k, len(state.ids)))
+            candidate_ids.append(state.ids[np.atleast_1d(positions)])
+            candidate_chords.append(np.atleast_1d(chords))
+        if len(state.delta_ids):
+            candidate_ids.append(state.delta_ids)
+            candidate_chords.append(np.linalg.norm(state.delta_points - query, axis=1))
+        return self._closest(candidate_ids, candidate_chords, k)
+
+    def within(self, latitude, longitude, radius_m, limit=None):
+        """
+        :return: (ids, distances in meters) of businesses within `radius_m`, nearest first,
+            at most `limit` of them.
+        """
+        state = self._state
+        query = to_unit_vectors([latitude], [longitude])[0]
+        radius = meters_to_chord(radius_m)
+        candidate_ids, candidate_chords = [], []
+        if state.tree is not None:
+            positions = np.asarray(state.tree.query_ball_point(query, radius), dtype=np.int64)
+            candidate_ids.append(state.ids[positions])
+            candidate_chords.append(np.linalg.norm(state.tree.data[positions] - query, axis=1))
+        if len(state.delta_ids):
+            chords = np.linalg.norm(state.delta_points - query, axis=1)
+            inside = chords <= radius
+            candidate_ids.append(state.delta_ids[inside])
+            candidate_chords.append(chords[inside])
+        return self._closest(candidate_ids, candidate_chords, limit)
+
+    @staticmethod
+    def _closest(candidate_ids, candidate_chords, limit):
+        if not candidate_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        ids = np.concatenate(candidate_ids)
+        chords = np.concatenate(candidate_chords)
+        order = np.argsort(chords, kind='stable')[:limit]
+        return ids[order], chord_to_meters(chords[order])
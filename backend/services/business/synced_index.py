@@ -0,0 +1,89 @@
+"""
+Freshness tracking and row access shared by the in-memory business indexes.
+
+Indexes are built from the catalog at startup and extended from the `new-business-data`
+topic (see consumers/business_index_consumer.py). The consumer first loads the businesses
+added since the catalog was built from Postgres, then marks them synced after every poll
+that reached Kafka; an index that has not been synced within
+`max_staleness_seconds` may be missing new businesses, and callers query Postgres instead.
+"""
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from monitoring.metrics import metrics
+from services.recommendation.catalog import INTERNED_FIELDS, NUMERIC_FIELDS, TEXT_FIELDS
+
+# Row fields the indexes return, matching the Business columns the SQL statements select
+BUSINESS_FIELDS = tuple(NUMERIC_FIELDS) + INTERNED_FIELDS + TEXT_FIELDS
+
+
+def catalog_row(catalog, row):
+    """
+    Materialize a catalog row as a dict of BUSINESS_FIELDS, like a Business row from Postgres.
+    """
+    return {field: catalog.get(row, field) for field in BUSINESS_FIELDS}
+
+
+def event_row(business):
+    """
+    BUSINESS_FIELDS of a `new-business-data` event; fields the event lacks are None.
+    """
+    return {field: business.get(field) for field in BUSINESS_FIELDS}
+
+
+class SyncedIndex(ABC):
+    # Prefix of the freshness gauge, set by subclasses
+    name = "index"
+
+    def __init__(self, catalog, max_staleness_seconds=60):
+        """
+        :param catalog: BusinessCatalog the index is built from.
+        :param max_staleness_seconds: How long after the last Kafka sync the index is still trusted.
+        """
+        self.catalog = catalog
+        self.max_staleness_seconds = max_staleness_seconds
+        self.synced_at = None
+        self._catalog_ids = np.sort(catalog.numeric['id'])
+        self._added_ids = set()
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    @abstractmethod
+    def add_businesses(self, businesses):
+        """
+        Index businesses from `new-business-data` events.
+
+        :return: Number of businesses added.
+        """
+
+    def claim(self, business_id):
+        """
+        Record a business about to be added from Kafka; events can be redelivered.
+
+        :return: False if the business is already indexed.
+        """
+        position = np.searchsorted(self._catalog_ids, business_id)
+        if position < len(self._catalog_ids) and self._catalog_ids[position] == business_id:
+            return False
+        if business_id in self._added_ids:
+            return False
+        self._added_ids.add(business_id)
+        return True
+
+    def mark_synced(self):
+        self.synced_at = time.monotonic()
+
+    def staleness(self):
+        """
+        :return: Seconds since the last Kafka sync, or infinity if there has been none.
+        """
+        return float('inf') if self.synced_at is None else time.monotonic() - self.synced_at
+
+    def is_fresh(self):
+        fresh = len(self) > 0 and self.staleness() <= self.max_staleness_seconds
+        metrics.gauge(f"{self.name}_fresh").set(int(fresh))
+        return fresh
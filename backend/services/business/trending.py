@@ -0,0 +1,162 @@
+"""
+Materialized trending lists for GetTrendingBusinesses.
+
+TrendingIndex keeps the TRENDING_DEPTH most reviewed businesses overall and per city,
+ordered by (review_count, id) descending. The lists are built from the catalog at startup
+and updated incrementally from `new-business-data`: a new business only has to be compared
+with the last entry of its city's list and of the global list. Every change is written
+through to Redis (and, through CachedRedis, to every replica's L1), with the freshness SLA
+as TTL, so a replica whose own lists are stale reads Redis before it falls back to Postgres.
+"""
+import bisect
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cache.keys import canonical_city
+from cache.tiered_cache import set_many
+from codegen import business_service_pb2 as pb2
+from monitoring.metrics import metrics
+from services.business.synced_index import SyncedIndex, catalog_row, event_row
+
+# Businesses kept per list, and returned per request by default
+TRENDING_DEPTH = int(os.getenv('TRENDING_DEPTH', 100))
+TRENDING_LIMIT = 10
+# Oldest a served list may be: the in-memory lists' staleness bound and the Redis TTL
+TRENDING_FRESHNESS_SECONDS = float(os.getenv('TRENDING_FRESHNESS_SECONDS', 60))
+
+GLOBAL = ""
+
+
+def trending_key(city):
+    """
+    Redis key of the trending list for a city, or the global list for an empty city.
+    """
+    city = canonical_city(city)
+    return f"trending:city:{city}" if city else "trending:global"
+
+
+class TrendingIndex(SyncedIndex):
+    name = "trending_index"
+
+    def __init__(self, catalog, depth=TRENDING_DEPTH, max_staleness_seconds=TRENDING_FRESHNESS_SECONDS,
+                 redis_client=None):
+        """
+        :param catalog: BusinessCatalog the lists are built from.
+        :param depth: Businesses kept per list.
+        :param max_staleness_seconds: Freshness SLA; also the TTL of the lists written to Redis.
+        :param redis_client: Redis client (ideally CachedRedis) changed lists are written to, if any.
+        """
+        super().__init__(catalog, max_staleness_seconds)
+        self.depth = depth
+        self.redis_client = redis_client
+        self._added = []
+        self._lock = threading.Lock()
+        self._lists = self._build(catalog, depth)
+        logging.info(f"Trending lists built for {len(self._lists) - 1} cities (depth {depth})")
+
+    @staticmethod
+    def _build(catalog, depth):
+        """
+        :return: Mapping of canonical city (GLOBAL for all businesses) to a tuple of
+            (-review_count, -id, slot) entries, ascending.
+        """
+        review_counts = catalog.numeric['review_count'].astype(np.int64)
+        ids = catalog.numeric['id'].astype(np.int64)
+        city = catalog.interned['city']
+        groups, cities = pd.factorize(pd.Series([canonical_city(value) for value in city.values], dtype=object))
+        row_groups = groups[city.codes]
+
+        def entries(rows):
+            return tuple(zip((-review_counts[rows]).tolist(), (-ids[rows]).tolist(), rows.tolist()))
+
+        lists = {GLOBAL: entries(np.lexsort((-ids, -review_counts))[:depth])}
+
+        # Top `depth` of every city at once: sort by city, then rank within each city's run
+        order = np.lexsort((-ids, -review_counts, row_groups))
+        sorted_groups = row_groups[order]
+        rank = np.arange(len(order)) - np.searchsorted(sorted_groups, sorted_groups, side='left')
+        kept = order[rank < depth]
+        kept_groups = row_groups[kept]
+        bounds = np.searchsorted(kept_groups, np.arange(len(cities) + 1))
+        for group, name in enumerate(cities):
+            if name:
+                lists[name] = entries(kept[bounds[group]:bounds[group + 1]])
+        return lists
+
+    def __len__(self):
+        return len(self.catalog) + len(self._added)
+
+    def add_businesses(self, businesses):
+        """
+        Merge businesses from `new-business-data` events into the lists they qualify for and
+        write the changed lists to Redis. Businesses already indexed are skipped.
+
+        :return: Number of businesses added.
+        """
+        changed = set()
+        added = 0
+        with self._lock:
+            for business in businesses:
+                business_id = business.get('id')
+                if business_id is None or not self.claim(business_id):
+                    continue
+                slot = len(self.catalog) + len(self._added)
+                self._added.append(event_row(business))
+                entry = (-int(business.get('review_count') or 0), -int(business_id), slot)
+                for name in {GLOBAL, canonical_city(business.get('city') or '')}:
+                    if self._insert(name, entry):
+                        changed.add(name)
+                added += 1
+        if changed:
+            metrics.counter("trending_lists_updated").inc(len(changed))
+            self.publish(changed)
+        return added
+
+    def _insert(self, name, entry):
+        """
+        :return: True if the entry made it onto the list.
+        """
+        current = self._lists.get(name, ())
+        if len(current) >= self.depth and entry > current[-1]:
+            return False
+        updated = list(current)
+        bisect.insort(updated, entry)
+        # Replacing the tuple is atomic, so readers see the old or the new list
+        self._lists[name] = tuple(updated[:self.depth])
+        return True
+
+    def publish(self, names):
+        """
+        Write lists to Redis in one round trip, evicting them from every replica's L1.
+        """
+        if self.redis_client is None:
+            return
+        # business_service imports this module
+        from services.business.business_service import BusinessService
+
+        items = []
+        for name in names:
+            response = pb2.BusinessListResponse(
+                businesses=[BusinessService.map_to_business_response(business) for business in self.top(name, self.depth)]
+            )
+            items.append((trending_key(name), response.SerializeToString(), int(self.max_staleness_seconds)))
+        try:
+            set_many(self.redis_client, items, invalidate=True)
+        except Exception as e:
+            logging.error(f"Error writing trending lists to Redis: {e}")
+
+    def top(self, city, limit):
+        """
+        :return: Up to `limit` most reviewed businesses in `city` (all cities if empty) as row dicts.
+        """
+        entries = self._lists.get(canonical_city(city), ())[:limit]
+        return [self._row(slot) for _, _, slot in entries]
+
+    def _row(self, slot):
+        if slot < len(self.catalog):
+            return catalog_row(self.catalog, slot)
+        return self._added[slot - len(self.catalog)]
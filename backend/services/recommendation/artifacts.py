@@ -0,0 +1,232 @@
+"""
+On-disk, memory-mappable artifact format for the recommendation model.
+
+An artifact directory holds the business catalog, the TF-IDF vocabulary and IDF weights,
+and the per-city CSR category matrices as plain .npy files plus a manifest.json. Loading
+opens every array with mmap, so replicas on one node share the same page-cache pages and
+startup cost does not grow with catalog size.
+
+Convert the existing pickles (run from the backend directory):
+    python -m services.recommendation.artifacts --data data/full_data.pkl \
+        --vectorizer data/tfidf_vectorizer.pkl --out data/artifacts
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from services.recommendation.catalog import BusinessCatalog, InternedColumn, TextColumn
+from services.recommendation.city_index import CityIndex
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+# Artifact directory shared by the gRPC server, which opens and hot-swaps it, and the business
+# consumer, which publishes to it; relative paths resolve from the backend directory
+ARTIFACTS_DIR = os.getenv('ARTIFACTS_DIR', 'data/artifacts')
+
+# TfidfVectorizer parameters that are persisted; callables (custom tokenizers/analyzers) are not supported
+VECTORIZER_PARAMS = (
+    'lowercase', 'strip_accents', 'stop_words', 'token_pattern', 'ngram_range', 'analyzer',
+    'binary', 'norm', 'use_idf', 'smooth_idf', 'sublinear_tf',
+)
+# TfidfVectorizer parameters that cannot be persisted and must be left at their default (None)
+UNSUPPORTED_VECTORIZER_PARAMS = ('tokenizer', 'preprocessor')
+
+
+def vectorizer_params(vectorizer):
+    """
+    :return: The vectorizer's persisted parameters, JSON-serializable.
+    :raises ValueError: If the vectorizer relies on a callable, which would be silently lost
+        and make the loaded vectorizer tokenize differently.
+    """
+    for name in UNSUPPORTED_VECTORIZER_PARAMS:
+        if getattr(vectorizer, name, None) is not None:
+            raise ValueError(f"Vectorizer parameter {name!r} is set and cannot be stored")
+    params = {}
+    for name in VECTORIZER_PARAMS:
+        value = getattr(vectorizer, name)
+        if callable(value):
+            raise ValueError(f"Vectorizer parameter {name!r} is a callable and cannot be stored")
+        params[name] = list(value) if isinstance(value, (tuple, frozenset, set)) else value
+    return params
+
+
+def save_artifacts(path, catalog, vectorizer, city_index):
+    """
+    Write the catalog, vectorizer and city index to an artifact directory.
+
+    The directory is written next to `path` and renamed into place, so readers never
+    observe a partially written artifact.
+
+    :raises ValueError: If the vectorizer cannot be stored (see `vectorizer_params`).
+    """
+    params = vectorizer_params(vectorizer)
+    staging_path = f"{path.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(staging_path, ignore_errors=True)
+    os.makedirs(staging_path)
+
+    def save_array(name, array):
+        np.save(os.path.join(staging_path, f"{name}.npy"), np.ascontiguousarray(array))
+
+    for field, values in catalog.numeric.items():
+        save_array(f"numeric.{field}", values)
+    for field, column in catalog.interned.items():
+        save_array(f"interned.{field}.codes", column.codes)
+    for field, column in catalog.text.items():
+        save_array(f"text.{field}.buffer", column.buffer)
+        save_array(f"text.{field}.offsets", column.offsets)
+
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    vocabulary = TextColumn.from_values(terms)
+    save_array("vocabulary.buffer", vocabulary.buffer)
+    save_array("vocabulary.offsets", vocabulary.offsets)
+    if getattr(vectorizer, 'use_idf', False):
+        save_array("idf", vectorizer.idf_)
+
+    cities, city_offsets, row_ids, data, indices, indptr, n_features = city_index.pack()
+    save_array("cities.offsets", city_offsets)
+    save_array("cities.row_ids", row_ids)
+    save_array("cities.data", data)
+    save_array("cities.indices", indices)
+    save_array("cities.indptr", indptr)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at": time.time(),
+        "rows": len(catalog),
+        "numeric": list(catalog.numeric),
+        "interned": {field: column.values for field, column in catalog.interned.items()},
+        "text": list(catalog.text),
+        "cities": cities,
+        "n_features": int(n_features),
+        "vectorizer": params,
+    }
+    with open(os.path.join(staging_path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+
+    # Swap the new directory into place
+    if os.path.exists(path):
+        retired_path = f"{path.rstrip(os.sep)}.old-{os.getpid()}"
+        os.rename(path, retired_path)
+        os.rename(staging_path, path)
+        shutil.rmtree(retired_path, ignore_errors=True)
+    else:
+        os.rename(staging_path, path)
+    logging.info(f"Artifacts written to {path} ({len(catalog)} rows, {len(cities)} cities)")
+
+
+def load_artifacts(path, attempts=3):
+    """
+    Open an artifact directory with every array memory-mapped read-only.
+
+    If a writer replaces the directory mid-load, the load is retried so the result never
+    mixes files from two versions.
+
+    :return: (catalog, vectorizer, city_index)
+    """
+    for _ in range(attempts):
+        version = artifact_version(path)
+        loaded = _load_artifacts(path)
+        if artifact_version(path) == version:
+            return loaded
+    raise RuntimeError(f"Artifacts at {path} kept changing while loading")
+
+
+def _load_artifacts(path):
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest["format_version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version {manifest['format_version']}")
+
+    def open_array(name):
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+
+    numeric = {field: open_array(f"numeric.{field}") for field in manifest["numeric"]}
+    interned = {
+        field: InternedColumn(open_array(f"interned.{field}.codes"), values)
+        for field, values in manifest["interned"].items()
+    }
+    text = {
+        field: TextColumn(open_array(f"text.{field}.buffer"), open_array(f"text.{field}.offsets"))
+        for field in manifest["text"]
+    }
+    catalog = BusinessCatalog(numeric, interned, text)
+
+    vocabulary = TextColumn(open_array("vocabulary.buffer"), open_array("vocabulary.offsets"))
+    params = dict(manifest["vectorizer"])
+    params["ngram_range"] = tuple(params["ngram_range"])
+    vectorizer = TfidfVectorizer(**params, vocabulary={vocabulary[i]: i for i in range(len(vocabulary))})
+    if params["use_idf"]:
+        vectorizer.idf_ = open_array("idf")
+
+    city_index = CityIndex.from_packed(
+        manifest["cities"],
+        open_array("cities.offsets"),
+        open_array("cities.row_ids"),
+        open_array("cities.data"),
+        open_array("cities.indices"),
+        open_array("cities.indptr"),
+        manifest["n_features"],
+    )
+    return catalog, vectorizer, city_index
+
+
+def artifacts_exist(path):
+    return os.path.exists(os.path.join(path, MANIFEST_FILE))
+
+
+def artifact_version(path):
+    """
+    Return the version stamp of the artifacts at `path`, or None if there are none.
+    """
+    try:
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            return json.load(f)["created_at"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+
+
+def artifact_rows(path):
+    """
+    Return the number of catalog rows in the artifacts at `path`, or 0 if there are none.
+    """
+    try:
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            return json.load(f)["rows"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return 0
+
+
+def convert(data_file, vectorizer_file, out_path):
+    """
+    Convert the pickled DataFrame and vectorizer into an artifact directory.
+    """
+    from joblib import load
+
+    data = load(data_file)
+    vectorizer = load(vectorizer_file)
+    catalog = BusinessCatalog.from_dataframe(data)
+    city_index = CityIndex.from_dataframe(data, vectorizer)
+    save_artifacts(out_path, catalog, vectorizer, city_index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert recommendation pickles into mmap artifacts.")
+    parser.add_argument('--data', default="data/full_data.pkl", help="Pickled catalog DataFrame")
+    parser.add_argument('--vectorizer', default="data/tfidf_vectorizer.pkl", help="Pickled TfidfVectorizer")
+    parser.add_argument('--out', default="data/artifacts", help="Artifact directory to write")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    start = time.perf_counter()
+    convert(args.data, args.vectorizer, args.out)
+    print(f"Artifacts written to {args.out} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+
+import grpc
+from cache.keys import canonical_city, canonical_query
+from cache.single_flight import AsyncSingleFlight
+from cache.tiered_cache import async_get_with_ttl, async_set_many
+from codegen import recommendation_service_pb2 as pb2
+from monitoring.metrics import metrics
+from services.recommendation.pagination import cursor_key, pack_ranked
+from services.recommendation.recommendation_service import (
+    CACHE_STALE_SECONDS, CACHE_TTL_SECONDS, CURSOR_TTL_SECONDS, RECOMMENDATION_LIMIT, RecommendationService,
+    result_limit
+)
+
+
+class AsyncRecommendationService(RecommendationService):
+    """
+    asyncio variant of RecommendationService for the grpc.aio server. Cache lookups
+    await an async Redis client; ranking runs on `executor` so it never blocks the event loop.
+    """
+
+    def __init__(self, redis_client, db, model, executor=None, ranker=None, single_flight=None):
+        """
+        :param redis_client: redis.asyncio client instance.
+        :param db: AsyncDatabase instance.
+        :param model: ModelHandle holding the live catalog, vectorizer and city index.
+        :param executor: Executor that runs ranking; None uses the event loop's default executor.
+        :param ranker: Optional RankingWorkerPool; executor threads then only wait on worker processes.
+        :param single_flight: AsyncSingleFlight that coalesces cache fills; defaults to one locking through `redis_client`.
+        """
+        super().__init__(
+            redis_client=redis_client, db=db, model=model, ranker=ranker,
+            single_flight=single_flight if single_flight is not None else AsyncSingleFlight(redis_client),
+        )
+        self.executor = executor
+
+    async def GetRecommendations(self, request, context):
+        """
+        Provide recommendations as a RecommendationResponse message for in-process callers.
+        """
+        return pb2.RecommendationResponse.FromString(await self.GetRecommendationsSerialized(request, context))
+
+    async def GetRecommendationsSerialized(self, request, context):
+        """
+        Provide recommendations as serialized RecommendationResponse bytes, passing cache hits
+        through. Misses are coalesced and stale values revalidated as in RecommendationService.
+        """
+        cache_key = self.cache_key(request.category, request.city)
+
+        # Check the cache
+        cached_recommendations, ttl = await async_get_with_ttl(
+            self.redis_client, cache_key, min_ttl=CACHE_STALE_SECONDS
+        )
+        if cached_recommendations:
+            if ttl is not None and ttl <= CACHE_STALE_SECONDS:
+                logging.info(f"Stale cache hit for key: {cache_key}")
+                metrics.counter("recommendation_cache_stale_hits").inc()
+                self.single_flight.refresh(cache_key, lambda: self.compute_recommendations(request, cache_key))
+            else:
+                logging.info(f"Cache hit for key: {cache_key}")
+                metrics.counter("recommendation_cache_hits").inc()
+            return cached_recommendations
+
+        logging.info(f"Cache miss for key: {cache_key}")
+        metrics.counter("recommendation_cache_misses").inc()
+        serialized = await self.single_flight.do(
+            cache_key,
+            lambda: self.compute_recommendations(request, cache_key),
+            read=lambda: self.redis_client.get(cache_key),
+        )
+        if not serialized:
+            self.not_found(request, context, canonical_city(request.city) in self.model.current().city_index)
+        return serialized
+
+    async def refresh_recommendations(self, request, context):
+        """
+        Recompute a query's recommendations and overwrite its cache entry in one round trip.
+        """
+        serialized = await self.compute_recommendations(
+            request, self.cache_key(request.category, request.city), invalidate=True
+        )
+        if not serialized:
+            self.not_found(request, context, canonical_city(request.city) in self.model.current().city_index)
+        return pb2.RecommendationResponse.FromString(serialized)
+
+    async def compute_recommendations(self, request, cache_key, invalidate=False):
+        """
+        Rank a query off the event loop and cache the serialized response.
+
+        :return: The serialized RecommendationResponse, or b"" if nothing matches.
+        """
+        # Rank off the event loop, pinned to one model snapshot
+        snapshot = self.model.current()
+        categories, city = canonical_query(request.category, request.city)
+        ranked = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.rank, categories, city, RECOMMENDATION_LIMIT, snapshot
+        )
+        response = self.recommendation_response(ranked, snapshot)
+        if response is None:
+            return b""  # An empty RecommendationResponse
+
+        serialized = response.SerializeToString()
+        await async_set_many(
+            self.redis_client, [(cache_key, serialized, CACHE_TTL_SECONDS + CACHE_STALE_SECONDS)], invalidate
+        )
+        return serialized
+
+    async def BatchGetRecommendations(self, request, context):
+        """
+        Rank many category/city queries in one call, off the event loop.
+        """
+        try:
+            k = result_limit(request.limit)
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        snapshot = self.model.current()
+        queries = [canonical_query(query.category, query.city) for query in request.queries]
+        ranked = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.rank_many, queries, k, snapshot
+        )
+        return self.batch_response(ranked, snapshot)
+
+    async def StreamRecommendations(self, request, context):
+        """
+        Stream ranked recommendations page by page, starting at the request's page token.
+        """
+        categories, user_city = canonical_query(request.category, request.city)
+        try:
+            page_size, max_pages, offset = self.page_params(request)
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        snapshot = self.model.current()
+        if user_city not in snapshot.city_index:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details(f"No businesses found in {request.city}")
+            return
+
+        depth = offset + page_size * max_pages
+        key = cursor_key(request.category, request.city, self.model_version(snapshot))
+        cached = await self.redis_client.get(key)
+        ranked = self.from_cursor(cached, depth)
+        if ranked is None:
+            depth = self.ranking_depth(cached, depth)
+            row_ids, _ = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.rank, categories, user_city, depth, snapshot
+            )
+            await self.redis_client.set(key, pack_ranked(row_ids, depth), ex=CURSOR_TTL_SECONDS)
+            ranked = row_ids, len(row_ids) < depth
+
+        for page in self.pages(request, context, ranked, offset, page_size, max_pages, snapshot):
+            yield page
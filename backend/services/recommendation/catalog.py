@@ -0,0 +1,201 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from codegen import recommendation_service_pb2 as pb2
+
+# Column layout of the catalog. Numeric fields live in typed NumPy arrays, low-cardinality
+# strings are interned into a code array plus a value table, and free-text strings are
+# stored as one UTF-8 buffer with an offsets array.
+NUMERIC_FIELDS = {
+    'id': np.int64,
+    'rating': np.float32,
+    'review_count': np.int32,
+    'latitude': np.float64,
+    'longitude': np.float64,
+}
+INTERNED_FIELDS = ('city', 'state', 'country', 'price')
+TEXT_FIELDS = ('businessid', 'name', 'category', 'address', 'zip_code', 'phone', 'image_url', 'url')
+
+# Fields of pb2.BusinessRecommendation, in declaration order
+RECOMMENDATION_FIELDS = (
+    'name', 'category', 'rating', 'review_count', 'city',
+    'address', 'phone', 'price', 'image_url', 'url',
+)
+
+
+class TextColumn:
+    """
+    Offset-encoded string column: row i is buffer[offsets[i]:offsets[i + 1]] as UTF-8.
+    """
+
+    def __init__(self, buffer, offsets):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @classmethod
+    def from_values(cls, values):
+        encoded = [_to_str(value).encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(buffer, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.buffer[self.offsets[row]:self.offsets[row + 1]].tobytes().decode('utf-8')
+
+    def concat(self, other):
+        """
+        :return: A new column with the rows of `other` after these.
+        """
+        offsets = np.concatenate((self.offsets, np.asarray(other.offsets[1:]) + self.offsets[-1]))
+        return TextColumn(np.concatenate((self.buffer, other.buffer)), offsets)
+
+    @property
+    def nbytes(self):
+        return self.buffer.nbytes + self.offsets.nbytes
+
+
+class InternedColumn:
+    """
+    Dictionary-encoded string column: row i is values[codes[i]].
+    """
+
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+
+    @classmethod
+    def from_values(cls, values):
+        codes, uniques = pd.factorize(pd.Series([_to_str(value) for value in values], dtype=object))
+        return cls(codes.astype(np.int32), [str(value) for value in uniques])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+    def concat(self, other):
+        """
+        :return: A new column with the rows of `other` after these; existing codes are kept.
+        """
+        values = list(self.values)
+        codes = {value: code for code, value in enumerate(values)}
+        remap = np.empty(len(other.values), dtype=np.int32)
+        for code, value in enumerate(other.values):
+            if value not in codes:
+                codes[value] = len(values)
+                values.append(value)
+            remap[code] = codes[value]
+        return InternedColumn(np.concatenate((self.codes, remap[other.codes])).astype(np.int32), values)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + sum(len(value) for value in self.values)
+
+
+class BusinessCatalog:
+    """
+    Compact, array-backed business catalog used on the recommendation serving path.
+
+    Rows are addressed by position, matching the row IDs produced by the CityIndex,
+    and any row can be materialized into a protobuf message in O(1).
+    """
+
+    def __init__(self, numeric, interned, text):
+        """
+        :param numeric: Mapping of field name to NumPy array.
+        :param interned: Mapping of field name to InternedColumn.
+        :param text: Mapping of field name to TextColumn.
+        """
+        self.numeric = numeric
+        self.interned = interned
+        self.text = text
+        self._size = len(next(iter(numeric.values())))
+
+    @classmethod
+    def from_dataframe(cls, data):
+        """
+        Convert the pickled catalog DataFrame into columnar form.
+        Fields missing from the frame are filled with zeros or empty strings, except `id`.
+
+        :raises ValueError: If the frame has no `id` column or a row without a numeric id;
+            ids identify businesses and break ties in the keyset pages.
+        """
+        size = len(data)
+        if 'id' not in data:
+            raise ValueError("Catalog data has no 'id' column")
+        if pd.to_numeric(data['id'], errors='coerce').isna().any():
+            raise ValueError("Catalog data has rows without a numeric id")
+
+        def column(field):
+            return data[field].to_numpy() if field in data else [''] * size
+
+        numeric = {}
+        for field, dtype in NUMERIC_FIELDS.items():
+            if field in data:
+                values = pd.to_numeric(data[field], errors='coerce').fillna(0).to_numpy()
+            else:
+                values = np.zeros(size)
+            numeric[field] = values.astype(dtype)
+        interned = {field: InternedColumn.from_values(column(field)) for field in INTERNED_FIELDS}
+        text = {field: TextColumn.from_values(column(field)) for field in TEXT_FIELDS}
+
+        catalog = cls(numeric, interned, text)
+        logging.info(f"Business catalog built with {size} rows ({catalog.nbytes / 1e6:.1f} MB)")
+        return catalog
+
+    def __len__(self):
+        return self._size
+
+    def append(self, data):
+        """
+        Return a new catalog with the rows of DataFrame `data` after this one's. Only the new
+        rows are encoded; existing columns are copied as they are.
+        """
+        tail = BusinessCatalog.from_dataframe(data)
+        numeric = {field: np.concatenate((values, tail.numeric[field])) for field, values in self.numeric.items()}
+        interned = {field: column.concat(tail.interned[field]) for field, column in self.interned.items()}
+        text = {field: column.concat(tail.text[field]) for field, column in self.text.items()}
+        return BusinessCatalog(numeric, interned, text)
+
+    @property
+    def nbytes(self):
+        return (
+            sum(values.nbytes for values in self.numeric.values())
+            + sum(column.nbytes for column in self.interned.values())
+            + sum(column.nbytes for column in self.text.values())
+        )
+
+    def get(self, row, field):
+        """
+        Return a single field of a row as a native Python value.
+        """
+        if field in self.numeric:
+            return self.numeric[field][row].item()
+        if field in self.interned:
+            return self.interned[field][row]
+        return self.text[field][row]
+
+    def to_dict(self, row):
+        """
+        Materialize a row as a dict of its recommendation fields.
+        """
+        return {field: self.get(row, field) for field in RECOMMENDATION_FIELDS}
+
+    def to_recommendation(self, row):
+        """
+        Materialize a row as a pb2.BusinessRecommendation.
+        """
+        return pb2.BusinessRecommendation(**self.to_dict(row))
+
+
+def _to_str(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ''
+    return str(value)
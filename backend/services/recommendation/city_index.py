@@ -0,0 +1,178 @@
+import logging
+
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from cache.keys import canonical_city
+
+
+def city_keys(cities):
+    """
+    :return: Index keys of a Series of city names, as an object array. Keys are the
+        `canonical_city` form requests are looked up by.
+    """
+    return np.array([canonical_city(str(city)) for city in cities.fillna('')], dtype=object)
+
+
+class CityIndex:
+    """
+    Startup-built index over the catalog's TF-IDF category vectors, grouped by city.
+
+    Each canonical city (`cache.keys.canonical_city`) maps to the positional row IDs of its
+    businesses in the catalog and a prebuilt, L2-normalized CSR matrix of their category
+    vectors, so scoring a query is one vectorizer transform and one sparse mat-vec.
+    """
+
+    def __init__(self, entries):
+        """
+        :param entries: Mapping of normalized city to a (row_ids, category_matrix) pair.
+        """
+        self._entries = entries
+        logging.info(f"City index ready for {len(self._entries)} cities")
+
+    @classmethod
+    def build(cls, cities, category_matrix):
+        """
+        Group catalog rows by city.
+
+        :param cities: Array of normalized city names, one per catalog row.
+        :param category_matrix: Sparse matrix of category vectors, one row per catalog row.
+        """
+        entries = {}
+        category_matrix = normalize(category_matrix.tocsr(), norm='l2', copy=False)
+
+        cities = np.asarray(cities, dtype=object)
+        order = np.argsort(cities, kind='stable')
+        sorted_cities = cities[order]
+        boundaries = np.flatnonzero(sorted_cities[1:] != sorted_cities[:-1]) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(sorted_cities)]))
+
+        for start, end in zip(starts, ends):
+            if start == end:
+                continue
+            row_ids = np.sort(order[start:end]).astype(np.int64)
+            entries[sorted_cities[start]] = (row_ids, category_matrix[row_ids])
+
+        return cls(entries)
+
+    @classmethod
+    def from_dataframe(cls, data, vectorizer):
+        """
+        Build the index from the catalog DataFrame and a fitted vectorizer.
+        """
+        cities = city_keys(data['city'])
+        category_matrix = vectorizer.transform(data['category_features'].fillna(''))
+        return cls.build(cities, category_matrix)
+
+    def append(self, first_row, cities, category_matrix):
+        """
+        Return a new index with catalog rows `first_row` onward added. Cities without new
+        rows share their entries with this index.
+
+        :param cities: Index keys of the new rows.
+        :param category_matrix: Sparse category vectors of the new rows.
+        """
+        entries = dict(self._entries)
+        category_matrix = normalize(category_matrix.tocsr(), norm='l2', copy=False)
+        cities = np.asarray(cities, dtype=object)
+        for city in dict.fromkeys(cities):
+            positions = np.flatnonzero(cities == city)
+            row_ids = positions.astype(np.int64) + first_row
+            if city in entries:
+                existing_ids, existing_matrix = entries[city]
+                entries[city] = (
+                    np.concatenate((existing_ids, row_ids)),
+                    sparse.vstack([existing_matrix, category_matrix[positions]], format='csr'),
+                )
+            else:
+                entries[city] = (row_ids, category_matrix[positions])
+        return CityIndex(entries)
+
+    @classmethod
+    def from_packed(cls, cities, city_offsets, row_ids, data, indices, indptr, n_features):
+        """
+        Rebuild the index from the packed layout produced by `pack()`, without copying
+        the row ID, data or indices arrays (they may be memory-mapped).
+        """
+        entries = {}
+        for position, city in enumerate(cities):
+            start, end = city_offsets[position], city_offsets[position + 1]
+            first, last = indptr[start], indptr[end]
+            city_indptr = np.asarray(indptr[start:end + 1]) - first
+            category_matrix = sparse.csr_matrix(
+                (data[first:last], indices[first:last], city_indptr),
+                shape=(end - start, n_features),
+                copy=False,
+            )
+            entries[city] = (row_ids[start:end], category_matrix)
+        return cls(entries)
+
+    def pack(self):
+        """
+        Flatten the index into contiguous arrays, with cities in sorted order.
+
+        :return: (cities, city_offsets, row_ids, data, indices, indptr, n_features)
+        """
+        cities = sorted(self._entries)
+        city_offsets = np.zeros(len(cities) + 1, dtype=np.int64)
+        np.cumsum([len(self._entries[city][0]) for city in cities], out=city_offsets[1:])
+        if not cities:
+            return cities, city_offsets, np.empty(0, dtype=np.int64), np.empty(0), \
+                np.empty(0, dtype=np.int32), np.zeros(1, dtype=np.int64), 0
+
+        row_ids = np.concatenate([self._entries[city][0] for city in cities])
+        category_matrix = sparse.vstack([self._entries[city][1] for city in cities], format='csr')
+        return (
+            cities, city_offsets, row_ids, category_matrix.data, category_matrix.indices,
+            category_matrix.indptr.astype(np.int64), category_matrix.shape[1],
+        )
+
+    def __contains__(self, city):
+        return city in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, city):
+        """
+        Return the (row_ids, category_matrix) pair for a normalized city, or None.
+        """
+        return self._entries.get(city)
+
+    def score(self, city, query_vector):
+        """
+        Score every business in a city against a vectorized query.
+
+        :param city: Normalized city name.
+        :param query_vector: 1 x V sparse query vector from the vectorizer.
+        :return: (row_ids, similarities) arrays, or None if the city is unknown.
+        """
+        entry = self._entries.get(city)
+        if entry is None:
+            return None
+        row_ids, category_matrix = entry
+        query_vector = normalize(query_vector, norm='l2')
+        similarities = (category_matrix @ query_vector.T).toarray().ravel()
+        return row_ids, similarities
+
+    def score_many(self, city, query_matrix):
+        """
+        Score every business in a city against several vectorized queries with one sparse
+        matrix-matrix multiply.
+
+        :param city: Normalized city name.
+        :param query_matrix: Q x V sparse matrix of query vectors from the vectorizer.
+        :return: (row_ids, similarities) where similarities is a sparse CSC matrix of shape
+            (businesses in city, Q) holding only non-zero scores, row indices sorted within
+            each column; or None if the city is unknown.
+        """
+        entry = self._entries.get(city)
+        if entry is None:
+            return None
+        row_ids, category_matrix = entry
+        query_matrix = normalize(query_matrix, norm='l2')
+        similarities = (category_matrix @ query_matrix.T).tocsc()
+        similarities.sort_indices()
+        return row_ids, similarities
@@ -0,0 +1,120 @@
+import logging
+import os
+import resource
+import threading
+import time
+
+from monitoring.metrics import metrics
+from services.recommendation.artifacts import artifact_version, load_artifacts
+
+
+class ModelSnapshot:
+    """
+    Immutable bundle of everything a recommendation request reads: catalog, vectorizer
+    and city index. Row IDs are only meaningful within the snapshot that produced them.
+    """
+
+    def __init__(self, catalog, vectorizer, city_index, version=None):
+        self.catalog = catalog
+        self.vectorizer = vectorizer
+        self.city_index = city_index
+        self.version = version
+        self.loaded_at = time.time()
+
+
+class ModelHandle:
+    """
+    Versioned reference to the live ModelSnapshot with read-copy-update semantics.
+
+    Readers call `current()` once per request and use that snapshot throughout, so an
+    in-flight request finishes on the snapshot it started with. `swap()` publishes a new
+    snapshot with a single reference assignment; the old one is released once the last
+    request holding it completes.
+    """
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+        self._lock = threading.Lock()
+        metrics.gauge("recommendation_model_rows").set(len(snapshot.catalog))
+
+    def current(self):
+        return self._snapshot
+
+    def swap(self, snapshot):
+        """
+        Publish a new snapshot and return the one it replaced.
+        """
+        with self._lock:
+            previous = self._snapshot
+            self._snapshot = snapshot
+        metrics.counter("recommendation_model_swaps").inc()
+        metrics.gauge("recommendation_model_rows").set(len(snapshot.catalog))
+        logging.info(f"Recommendation model swapped: version {previous.version} -> {snapshot.version}")
+        return previous
+
+
+class ModelReloader(threading.Thread):
+    """
+    Background thread that watches an artifact directory and hot-swaps a new snapshot
+    into the ModelHandle whenever a newer artifact version is published.
+    """
+
+    def __init__(self, handle, artifacts_dir, interval_seconds=30):
+        super().__init__(name="model-reloader", daemon=True)
+        self.handle = handle
+        self.artifacts_dir = artifacts_dir
+        self.interval_seconds = interval_seconds
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        logging.info(f"Watching {self.artifacts_dir} for new recommendation artifacts...")
+        while not self._stopped.wait(self.interval_seconds):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                metrics.counter("recommendation_model_reload_errors").inc()
+                logging.error(f"Error reloading recommendation artifacts: {e}")
+
+    def reload_if_changed(self):
+        """
+        Load and swap in the artifacts if their version differs from the live snapshot.
+        :return: True if a new snapshot was published.
+        """
+        version = artifact_version(self.artifacts_dir)
+        if version is None or version == self.handle.current().version:
+            return False
+
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        catalog, vectorizer, city_index = load_artifacts(self.artifacts_dir)
+        snapshot = ModelSnapshot(catalog, vectorizer, city_index, version=version)
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.handle.swap(snapshot)
+        swap_seconds = time.perf_counter() - start
+
+        rss_after = current_rss_bytes()
+        metrics.histogram("recommendation_model_load_seconds").observe(load_seconds)
+        metrics.histogram("recommendation_model_swap_seconds").observe(swap_seconds)
+        metrics.gauge("recommendation_model_catalog_bytes").set(catalog.nbytes)
+        metrics.gauge("process_resident_bytes").set(rss_after)
+        logging.info(
+            f"Loaded recommendation artifacts version {version} in {load_seconds:.3f}s, "
+            f"swapped in {swap_seconds * 1e6:.0f}us, RSS {rss_before / 1e6:.1f} -> {rss_after / 1e6:.1f} MB"
+        )
+        return True
+
+
+def current_rss_bytes():
+    """
+    Resident set size of this process, falling back to peak RSS where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
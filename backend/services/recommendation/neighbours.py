@@ -0,0 +1,149 @@
+import logging
+
+import numpy as np
+from sklearn.preprocessing import normalize
+
+from services.recommendation.ranking import top_k
+
+# Upper bound on the dense similarity block materialized during a build (float64 cells)
+DEFAULT_BLOCK_CELLS = 8 * 1024 * 1024
+
+
+class NeighbourStore:
+    """
+    Sparse k-nearest-neighbour store over business feature vectors.
+
+    For every business (by row position) it keeps its top-k most similar businesses in two
+    fixed-width arrays: `ids` (int32, -1 padded) and `scores` (float32, 0 padded), each row
+    sorted by descending cosine similarity. Memory is O(N * k) instead of O(N^2).
+    """
+
+    def __init__(self, ids, scores, size=None):
+        self.k = ids.shape[1]
+        self.ids = ids
+        self.scores = scores
+        self.size = ids.shape[0] if size is None else size
+
+    @classmethod
+    def build(cls, feature_matrix, k, block_cells=DEFAULT_BLOCK_CELLS):
+        """
+        Build the store from scratch, scoring rows in blocks so peak memory stays bounded
+        by roughly `block_cells` similarities regardless of catalog size.
+
+        :param feature_matrix: N x V sparse feature matrix, one row per business.
+        :param k: Number of neighbours kept per business.
+        :param block_cells: Maximum number of similarities held in memory at once.
+        """
+        features = normalize(feature_matrix.tocsr(), norm='l2')
+        size = features.shape[0]
+        ids = np.full((size, k), -1, dtype=np.int32)
+        scores = np.zeros((size, k), dtype=np.float32)
+        if size == 0:
+            return cls(ids, scores)
+
+        transposed = features.T.tocsc()
+        block_rows = max(1, block_cells // size)
+        width = min(k, size - 1)
+        for start in range(0, size, block_rows):
+            end = min(start + block_rows, size)
+            if width <= 0:
+                break
+            # Negated in place so the partition selects the highest similarities without a copy
+            block = (features[start:end] @ transposed).toarray()
+            np.negative(block, out=block)
+            block[np.arange(end - start), np.arange(start, end)] = np.inf
+
+            candidates = np.argpartition(block, width - 1, axis=1)[:, :width]
+            candidate_scores = -np.take_along_axis(block, candidates, axis=1)
+            del block
+            order = np.argsort(-candidate_scores, axis=1, kind='stable')
+            block_ids = np.take_along_axis(candidates, order, axis=1)
+            block_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+            matched = block_scores > 0
+            ids[start:end, :width] = np.where(matched, block_ids, -1)
+            scores[start:end, :width] = np.where(matched, block_scores, 0)
+
+        logging.info(f"Neighbour store built for {size} businesses (k={k}, block={block_rows} rows)")
+        return cls(ids, scores)
+
+    def add(self, feature_matrix):
+        """
+        Append row `size` of `feature_matrix` as a new business. Its neighbour list is
+        computed with one sparse mat-vec, and only existing lists it enters are rewritten.
+
+        :param feature_matrix: CSR feature matrix whose first `size` rows are already indexed.
+            Its rows must be L2-normalized, as TF-IDF rows are; only the new row is
+            normalized again, and the matrix is neither sliced nor copied.
+        :return: Row positions of the existing businesses whose lists were rewritten.
+        """
+        new_id = self.size
+        new_row = normalize(feature_matrix[new_id], norm='l2').toarray().ravel()
+        similarities = (feature_matrix @ new_row)[:new_id]
+        self._ensure_capacity(new_id + 1)
+
+        neighbours = top_k(similarities, self.k)
+        self.ids[new_id] = -1
+        self.scores[new_id] = 0
+        self.ids[new_id, :len(neighbours)] = neighbours
+        self.scores[new_id, :len(neighbours)] = similarities[neighbours]
+
+        # Existing businesses whose k-th neighbour is weaker than the new business
+        affected = np.flatnonzero(similarities > self.scores[:new_id, -1])
+        if len(affected):
+            candidate_ids = np.hstack([self.ids[affected], np.full((len(affected), 1), new_id, dtype=np.int32)])
+            candidate_scores = np.hstack([self.scores[affected], similarities[affected, None].astype(np.float32)])
+            order = np.argsort(-candidate_scores, axis=1, kind='stable')[:, :self.k]
+            self.ids[affected] = np.take_along_axis(candidate_ids, order, axis=1)
+            self.scores[affected] = np.take_along_axis(candidate_scores, order, axis=1)
+
+        self.size = new_id + 1
+        return affected
+
+    def set_rows(self, rows, ids, scores):
+        """
+        Overwrite the neighbour lists of `rows`, growing the store to cover them. Used to
+        replay the changes of `add` persisted elsewhere.
+        """
+        if len(rows) == 0:
+            return
+        size = max(self.size, int(rows.max()) + 1)
+        self._ensure_capacity(size)
+        self.ids[rows] = ids
+        self.scores[rows] = scores
+        self.size = size
+
+    def similar_to(self, row, n=None):
+        """
+        Return the businesses most similar to the business at `row`.
+
+        :param row: Row position of the business.
+        :param n: Maximum number of neighbours to return (defaults to k).
+        :return: (ids, scores) arrays, best first.
+        """
+        if not 0 <= row < self.size:
+            raise IndexError(f"Business row {row} is not in the neighbour store")
+        ids = self.ids[row, :n]
+        valid = ids >= 0
+        return ids[valid], self.scores[row, :n][valid]
+
+    def compact(self):
+        """
+        Return a copy trimmed to `size` rows, dropping spare capacity before persisting.
+        """
+        return NeighbourStore(np.array(self.ids[:self.size]), np.array(self.scores[:self.size]))
+
+    @property
+    def nbytes(self):
+        return self.ids[:self.size].nbytes + self.scores[:self.size].nbytes
+
+    def _ensure_capacity(self, size):
+        if self.ids.shape[0] >= size:
+            return
+        capacity = max(size, int(self.ids.shape[0] * 1.25) + 16)
+        ids = np.full((capacity, self.k), -1, dtype=np.int32)
+        scores = np.zeros((capacity, self.k), dtype=np.float32)
+        ids[:self.size] = self.ids[:self.size]
+        scores[:self.size] = self.scores[:self.size]
+        self.ids = ids
+        self.scores = scores
@@ -0,0 +1,61 @@
+"""
+Cursor state for paginated recommendations.
+
+A query's ranked list is computed once and cached in Redis as packed int32 row IDs (4 bytes
+per business), keyed by the query and the model version the row IDs belong to. Page tokens
+only carry an offset plus a fingerprint of the query, so scrolling deeper slices the cached
+list instead of re-ranking the city.
+"""
+import base64
+
+import numpy as np
+
+from cache.keys import query_hash
+
+
+def query_fingerprint(categories, city):
+    # Canonical, so every spelling of a query shares its ranked list and page tokens
+    return query_hash(categories, city)[:16]
+
+
+def cursor_key(categories, city, model_version):
+    """
+    Redis key of the cached ranked list for a query against one model version.
+    """
+    return f"recommendations:ranked:{query_fingerprint(categories, city)}:{model_version}"
+
+
+def pack_ranked(row_ids, depth):
+    """
+    Pack a ranked list for caching. `depth` is the k it was ranked with; a list shorter
+    than its depth holds every match.
+    """
+    return np.concatenate(([depth], np.asarray(row_ids))).astype(np.int32).tobytes()
+
+
+def unpack_ranked(packed):
+    """
+    :return: (row_ids, depth)
+    """
+    values = np.frombuffer(packed, dtype=np.int32)
+    return values[1:], int(values[0])
+
+
+def encode_page_token(categories, city, offset):
+    token = f"{offset}:{query_fingerprint(categories, city)}"
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii")
+
+
+def decode_page_token(page_token, categories, city):
+    """
+    :return: The offset encoded in the token.
+    :raises ValueError: If the token is malformed or was issued for a different query.
+    """
+    try:
+        offset, fingerprint = base64.urlsafe_b64decode(page_token.encode("ascii")).decode("utf-8").split(":")
+        offset = int(offset)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Malformed page token") from e
+    if offset < 0 or fingerprint != query_fingerprint(categories, city):
+        raise ValueError("Page token does not belong to this query")
+    return offset
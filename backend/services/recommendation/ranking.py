@@ -0,0 +1,25 @@
+import numpy as np
+
+
+def top_k(similarities, k):
+    """
+    Select the indices of the k highest positive similarities, best first.
+
+    Uses argpartition so selection is O(n) over the city, followed by a sort of the
+    k survivors only. Ties are broken by position so results are deterministic.
+
+    :param similarities: 1-D NumPy array of similarity scores.
+    :param k: Maximum number of indices to return.
+    :return: Array of indices into `similarities`, ordered by descending score.
+    """
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    candidates = np.flatnonzero(similarities > 0)
+    if len(candidates) > k:
+        scores = similarities[candidates]
+        partitioned = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[partitioned]
+
+    order = np.lexsort((candidates, -similarities[candidates]))
+    return candidates[order]
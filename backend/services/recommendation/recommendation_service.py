@@ -1,129 +1,380 @@
+from collections import defaultdict
 import grpc
 from codegen import recommendation_service_pb2 as pb2
 from codegen import recommendation_service_pb2_grpc as pb2_grpc
 import logging
-import json
-from sklearn.metrics.pairwise import cosine_similarity
+from cache.keys import canonical_city, canonical_query, recommendation_key
+from cache.single_flight import SingleFlight
+from cache.tiered_cache import get_with_ttl, set_many
+from monitoring.metrics import metrics
+from services.recommendation.pagination import (
+    cursor_key, decode_page_token, encode_page_token, pack_ranked, unpack_ranked
+)
+from services.recommendation.ranking import top_k
+from services.recommendation.worker_pool import RankingUnavailableError
+
+RECOMMENDATION_LIMIT = 10
+# Cached recommendations are fresh for CACHE_TTL_SECONDS, then served stale for up to
+# CACHE_STALE_SECONDS more while one caller refreshes them
+CACHE_TTL_SECONDS = 3600
+CACHE_STALE_SECONDS = 300
+# Queries scored per sparse matrix-matrix multiply; bounds the size of the score matrix
+BATCH_QUERY_BLOCK = 256
+# Paginated recommendations: page limits, and how deep and how long ranked lists are cached
+MAX_PAGE_SIZE = 100
+MAX_PAGES_PER_CALL = 100
+# Deepest position a page token may point at; keeps ranking depths well inside the int32 cursors
+MAX_PAGE_OFFSET = 100_000
+RANKED_LIST_DEPTH = 200
+CURSOR_TTL_SECONDS = 900
+
+
+def result_limit(requested, default=RECOMMENDATION_LIMIT):
+    """
+    :return: Results to return for a requested limit: `default` if unset, at most MAX_PAGE_SIZE.
+    :raises ValueError: If the requested limit is negative.
+    """
+    if requested < 0:
+        raise ValueError(f"Limit must not be negative, got {requested}")
+    return min(requested or default, MAX_PAGE_SIZE)
+
 
 class RecommendationService(pb2_grpc.RecommendationServiceServicer):
 
-    def __init__(self, redis_client, db, data, vectorizer):
+    def __init__(self, redis_client, db, model, ranker=None, single_flight=None):
         """
         Initializes the RecommendationService with the required resources.
         :param redis_client: Redis client instance.
         :param db: Database instance.
-        :param data: Preloaded data for recommendations.
-        :param similarity_matrix: Preloaded similarity matrix.
+        :param model: ModelHandle holding the live catalog, vectorizer and city index.
+        :param ranker: Optional RankingWorkerPool that ranks in worker processes instead of in-process.
+        :param single_flight: SingleFlight that coalesces cache fills; defaults to one locking through `redis_client`.
         """
         self.redis_client = redis_client
         self.db = db
-        self.data = data
-        self.vectorizer = vectorizer
+        self.model = model
+        self.ranker = ranker
+        self.single_flight = single_flight if single_flight is not None else SingleFlight(redis_client)
+
+    def rank(self, categories, city, k=RECOMMENDATION_LIMIT, snapshot=None):
+        """
+        Rank the businesses of a city against the given categories.
+
+        :param categories: List of category strings from the request.
+        :param city: Normalized (lower-cased) city name.
+        :param k: Maximum number of businesses to return.
+        :param snapshot: ModelSnapshot to rank against; the returned row IDs index its catalog.
+        :return: (row_ids, scores) of the top-k matches, best first, or None if the city is unknown.
+        """
+        snapshot = snapshot or self.model.current()
+        if city not in snapshot.city_index:
+            return None
+
+        if self.ranker is not None:
+            try:
+                return self.ranker.rank(categories, city, k, snapshot)
+            except RankingUnavailableError as e:
+                logging.info(f"Ranking in-process: {e}")
+
+        user_vector = snapshot.vectorizer.transform([' '.join(categories)])
+        row_ids, similarities = snapshot.city_index.score(city, user_vector)
+        top = top_k(similarities, k)
+        return row_ids[top], similarities[top]
+
+    def rank_many(self, queries, k=RECOMMENDATION_LIMIT, snapshot=None):
+        """
+        Rank many queries at once. Identical queries are ranked once, all queries are vectorized
+        in one transform, and each city's queries are scored with one sparse matrix-matrix multiply.
+
+        :param queries: List of (categories, normalized city) pairs.
+        :param k: Maximum number of businesses to return per query.
+        :param snapshot: ModelSnapshot to rank against; the returned row IDs index its catalog.
+        :return: List with one (row_ids, scores) pair per query, or None where the city is unknown.
+        """
+        snapshot = snapshot or self.model.current()
+        unique_positions = {}
+        by_city = defaultdict(list)
+        for categories, city in queries:
+            key = (' '.join(categories), city)
+            if key not in unique_positions and city in snapshot.city_index:
+                unique_positions[key] = len(unique_positions)
+                by_city[city].append(key)
+
+        unique_results = {}
+        if unique_positions:
+            query_matrix = snapshot.vectorizer.transform([text for text, _ in unique_positions]).tocsr()
+            for city, keys in by_city.items():
+                for block_start in range(0, len(keys), BATCH_QUERY_BLOCK):
+                    block = keys[block_start:block_start + BATCH_QUERY_BLOCK]
+                    rows = [unique_positions[key] for key in block]
+                    row_ids, similarities = snapshot.city_index.score_many(city, query_matrix[rows])
+                    for column, key in enumerate(block):
+                        start, end = similarities.indptr[column], similarities.indptr[column + 1]
+                        positions = similarities.indices[start:end]
+                        scores = similarities.data[start:end]
+                        top = top_k(scores, k)
+                        unique_results[key] = (row_ids[positions[top]], scores[top])
+
+        return [unique_results.get((' '.join(categories), city)) for categories, city in queries]
 
     def GetRecommendations(self, request, context):
         """
         Provide recommendations based on category and city preferences, with caching.
+        Returns a RecommendationResponse message for in-process callers; over gRPC the
+        RPC is served by GetRecommendationsSerialized.
+        """
+        return pb2.RecommendationResponse.FromString(self.GetRecommendationsSerialized(request, context))
+
+    def GetRecommendationsSerialized(self, request, context):
+        """
+        Provide recommendations as serialized RecommendationResponse bytes. The cache holds
+        the same bytes, so a hit is returned without any decoding or re-encoding and
+        `add_recommendation_service_to_server` sends it as-is.
+
+        Concurrent misses on a key share one ranking, across replicas as well, and a value
+        in its last CACHE_STALE_SECONDS is served while it is refreshed in the background.
         """
-        # Combine user-selected categories into a single string for caching key
-        user_categories = ' '.join(request.category).lower()
-        user_city = request.city.lower()
-        cache_key = f"recommendations:{user_categories}:{user_city}"
+        cache_key = self.cache_key(request.category, request.city)
 
         # Check the cache
-        cached_recommendations = self.redis_client.get(cache_key)
+        cached_recommendations, ttl = get_with_ttl(self.redis_client, cache_key, min_ttl=CACHE_STALE_SECONDS)
         if cached_recommendations:
-            print(f"Cache hit for key: {cache_key}")
-            logging.info(f"Cache hit for key: {cache_key}")
-            recommendations_data = json.loads(cached_recommendations)
-            return pb2.RecommendationResponse(
-                recommendations=[
-                    pb2.BusinessRecommendation(
-                        name=rec["name"],
-                        category=rec["category"],
-                        rating=rec["rating"],
-                        review_count=rec["review_count"],
-                        city=rec["city"],
-                        address=rec["address"],
-                        phone=rec["phone"],
-                        price=rec["price"],
-                        image_url=rec["image_url"],
-                        url=rec["url"]
-                    )
-                    for rec in recommendations_data
-                ]
-            )
+            if ttl is not None and ttl <= CACHE_STALE_SECONDS:
+                logging.info(f"Stale cache hit for key: {cache_key}")
+                metrics.counter("recommendation_cache_stale_hits").inc()
+                self.single_flight.refresh(cache_key, lambda: self.compute_recommendations(request, cache_key))
+            else:
+                logging.info(f"Cache hit for key: {cache_key}")
+                metrics.counter("recommendation_cache_hits").inc()
+            return cached_recommendations
 
-        print(f"Cache miss for key: {cache_key}")
         logging.info(f"Cache miss for key: {cache_key}")
+        metrics.counter("recommendation_cache_misses").inc()
+        serialized = self.single_flight.do(
+            cache_key,
+            lambda: self.compute_recommendations(request, cache_key),
+            read=lambda: self.redis_client.get(cache_key),
+        )
+        if not serialized:
+            self.not_found(request, context, canonical_city(request.city) in self.model.current().city_index)
+        return serialized
 
-        print("Data check", self.data.head())
+    def refresh_recommendations(self, request, context):
+        """
+        Recompute a query's recommendations and overwrite its cache entry. The write and the
+        invalidation of other replicas' L1 copies share one Redis round trip.
+
+        :return: RecommendationResponse message.
+        """
+        serialized = self.compute_recommendations(
+            request, self.cache_key(request.category, request.city), invalidate=True
+        )
+        if not serialized:
+            self.not_found(request, context, canonical_city(request.city) in self.model.current().city_index)
+        return pb2.RecommendationResponse.FromString(serialized)
 
-        # Filter data by city
-        city_filtered_data = self.data[self.data['city'].str.lower() == user_city]
-        if city_filtered_data.empty:
+    def compute_recommendations(self, request, cache_key, invalidate=False):
+        """
+        Rank a query and cache the serialized response.
+
+        :param invalidate: Tell other replicas to drop their L1 copies of the key.
+        :return: The serialized RecommendationResponse, or b"" if nothing matches.
+        """
+        # Score the city's businesses and select the top matches, pinned to one model snapshot
+        snapshot = self.model.current()
+        categories, city = canonical_query(request.category, request.city)
+        ranked = self.rank(categories, city, snapshot=snapshot)
+        response = self.recommendation_response(ranked, snapshot)
+        if response is None:
+            return b""  # An empty RecommendationResponse
+
+        # Cache the serialized recommendations
+        serialized = response.SerializeToString()
+        set_many(self.redis_client, [(cache_key, serialized, CACHE_TTL_SECONDS + CACHE_STALE_SECONDS)], invalidate)
+        return serialized
+
+    @staticmethod
+    def recommendation_response(ranked, snapshot):
+        """
+        Build the RecommendationResponse for a ranking, or return None if the city is
+        unknown or nothing matched.
+        """
+        if ranked is None or len(ranked[0]) == 0:
+            return None
+        row_ids, _ = ranked
+        return pb2.RecommendationResponse(
+            recommendations=[snapshot.catalog.to_recommendation(row) for row in row_ids]
+        )
+
+    @staticmethod
+    def not_found(request, context, city_known):
+        context.set_code(grpc.StatusCode.NOT_FOUND)
+        if city_known:
+            # If no businesses match the category
+            context.set_details(f"No businesses match the preferences in {request.city}")
+        else:
+            context.set_details(f"No businesses found in {request.city}")
+
+    def BatchGetRecommendations(self, request, context):
+        """
+        Rank many category/city queries in one call. Results are computed directly from the
+        model, bypassing the recommendation cache; a query whose city is unknown or that
+        matches nothing gets an empty result.
+        """
+        try:
+            k = result_limit(request.limit)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        snapshot = self.model.current()
+        ranked = self.rank_many(
+            [canonical_query(query.category, query.city) for query in request.queries], k=k, snapshot=snapshot
+        )
+        return self.batch_response(ranked, snapshot)
+
+    def StreamRecommendations(self, request, context):
+        """
+        Stream ranked recommendations page by page, starting at the request's page token.
+        The ranked list is cached per query and model version, so later pages are slices
+        of it rather than a new ranking.
+        """
+        categories, user_city = canonical_query(request.category, request.city)
+        try:
+            page_size, max_pages, offset = self.page_params(request)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        snapshot = self.model.current()
+        if user_city not in snapshot.city_index:
             context.set_code(grpc.StatusCode.NOT_FOUND)
             context.set_details(f"No businesses found in {request.city}")
-            return pb2.RecommendationResponse()
+            return
 
-        # Prepare the user query
-        user_query = ' '.join(request.category)
-        user_vector = self.vectorizer.transform([user_query])
+        depth = offset + page_size * max_pages
+        key = cursor_key(request.category, request.city, self.model_version(snapshot))
+        cached = self.redis_client.get(key) if self.redis_client else None
+        ranked = self.from_cursor(cached, depth)
+        if ranked is None:
+            depth = self.ranking_depth(cached, depth)
+            row_ids, _ = self.rank(categories, user_city, k=depth, snapshot=snapshot)
+            if self.redis_client:
+                self.redis_client.set(key, pack_ranked(row_ids, depth), ex=CURSOR_TTL_SECONDS)
+            ranked = row_ids, len(row_ids) < depth
 
-        # Vectorize the category features of the filtered data
-        category_vectors = self.vectorizer.transform(city_filtered_data['category_features'])
+        yield from self.pages(request, context, ranked, offset, page_size, max_pages, snapshot)
 
-        # Compute cosine similarity
-        category_similarity = cosine_similarity(user_vector, category_vectors).flatten()
+    @staticmethod
+    def page_params(request):
+        """
+        :return: (page_size, max_pages, offset) for a paginated request.
+        :raises ValueError: If the page size is negative or the page token is invalid for the request.
+        """
+        page_size = result_limit(request.page_size)
+        max_pages = min(max(request.max_pages, 1), MAX_PAGES_PER_CALL)
+        offset = decode_page_token(request.page_token, request.category, request.city) if request.page_token else 0
+        if offset > MAX_PAGE_OFFSET:
+            raise ValueError(f"Page token is deeper than the {MAX_PAGE_OFFSET} recommendations served")
+        return page_size, max_pages, offset
 
-        # Add similarity scores to the filtered data
-        city_filtered_data = city_filtered_data.copy()
-        city_filtered_data['category_similarity'] = category_similarity
+    @staticmethod
+    def model_version(snapshot):
+        # Snapshots loaded from pickles carry no artifact version; their load time identifies them
+        return snapshot.version if snapshot.version is not None else snapshot.loaded_at
 
-        # Filter and sort by similarity
-        recommended_businesses = (
-            city_filtered_data[city_filtered_data['category_similarity'] > 0]
-            .sort_values(by='category_similarity', ascending=False)
-        )
+    @staticmethod
+    def from_cursor(cached, depth):
+        """
+        Use a cached ranked list if it reaches `depth` or already holds every match.
+        :return: (row_ids, complete), or None if the list must be (re-)ranked.
+        """
+        if not cached:
+            return None
+        row_ids, cached_depth = unpack_ranked(cached)
+        complete = len(row_ids) < cached_depth
+        if complete or cached_depth >= depth:
+            return row_ids, complete
+        return None
 
-        # If no businesses match the category
-        if recommended_businesses.empty:
+    @staticmethod
+    def ranking_depth(cached, depth):
+        """
+        How deep to rank when the cache cannot serve `depth`; cursors grow geometrically
+        so scrolling deep re-ranks only a logarithmic number of times.
+        """
+        cached_depth = unpack_ranked(cached)[1] if cached else 0
+        return max(depth, RANKED_LIST_DEPTH, 2 * cached_depth)
+
+    @staticmethod
+    def pages(request, context, ranked, offset, page_size, max_pages, snapshot):
+        """
+        Yield up to `max_pages` RecommendationPages of a ranked list, starting at `offset`.
+        """
+        row_ids, complete = ranked
+        if offset == 0 and len(row_ids) == 0:
             context.set_code(grpc.StatusCode.NOT_FOUND)
             context.set_details(f"No businesses match the preferences in {request.city}")
-            return pb2.RecommendationResponse()
-
-        # Prepare the recommendations
-        recommendations = []
-        for _, business in recommended_businesses.head(10).iterrows():
-            recommendations.append({
-                "name": business['name'],
-                "category": business['category'],
-                "rating": business['rating'],
-                "review_count": business['review_count'],
-                "city": business['city'],
-                "address": business['address'],
-                "phone": business['phone'],
-                "price": business['price'],
-                "image_url": business['image_url'],
-                "url": business['url']
-            })
-        logging.info(f"Generated recommendations: {recommendations}")
-        # Cache the recommendations
-        self.redis_client.set(cache_key, json.dumps(recommendations), ex=3600)  # Cache for 1 hour
-        # Return recommendations in the response
-        return pb2.RecommendationResponse(
-            recommendations=[
-                pb2.BusinessRecommendation(
-                    name=rec["name"],
-                    category=rec["category"],
-                    rating=rec["rating"],
-                    review_count=rec["review_count"],
-                    city=rec["city"],
-                    address=rec["address"],
-                    phone=rec["phone"],
-                    price=rec["price"],
-                    image_url=rec["image_url"],
-                    url=rec["url"]
-                )
-                for rec in recommendations
+            return
+
+        for page_start in range(offset, offset + page_size * max_pages, page_size):
+            page_rows = row_ids[page_start:page_start + page_size]
+            page_end = page_start + len(page_rows)
+            has_more = len(page_rows) > 0 and page_end <= MAX_PAGE_OFFSET and (page_end < len(row_ids) or not complete)
+            yield pb2.RecommendationPage(
+                recommendations=[snapshot.catalog.to_recommendation(row) for row in page_rows],
+                next_page_token=encode_page_token(request.category, request.city, page_end) if has_more else "",
+            )
+            if not has_more:
+                break
+
+    @staticmethod
+    def batch_response(ranked, snapshot):
+        return pb2.BatchRecommendationResponse(
+            results=[
+                pb2.RecommendationResponse(
+                    recommendations=[snapshot.catalog.to_recommendation(row) for row in result[0]]
+                ) if result is not None else pb2.RecommendationResponse()
+                for result in ranked
             ]
-        )
\ No newline at end of file
+        )
+
+    @staticmethod
+    def cache_key(categories, city):
+        """
+        Redis key under which the serialized recommendations for a category/city pair are cached.
+        Every spelling of a query (category order, case, whitespace, duplicates) maps to one key.
+        """
+        return recommendation_key(categories, city)
+
+
+def serialized_response(response):
+    """
+    gRPC response serializer that sends pre-serialized bytes unchanged.
+    """
+    return response if isinstance(response, bytes) else response.SerializeToString()
+
+
+def add_recommendation_service_to_server(servicer, server):
+    """
+    Register a RecommendationService (sync or async) like the generated
+    add_RecommendationServiceServicer_to_server, except that GetRecommendations is served by
+    GetRecommendationsSerialized and its bytes are written to the wire without re-encoding.
+    """
+    rpc_method_handlers = {
+        'GetRecommendations': grpc.unary_unary_rpc_method_handler(
+            servicer.GetRecommendationsSerialized,
+            request_deserializer=pb2.RecommendationRequest.FromString,
+            response_serializer=serialized_response,
+        ),
+        'BatchGetRecommendations': grpc.unary_unary_rpc_method_handler(
+            servicer.BatchGetRecommendations,
+            request_deserializer=pb2.BatchRecommendationRequest.FromString,
+            response_serializer=pb2.BatchRecommendationResponse.SerializeToString,
+        ),
+        'StreamRecommendations': grpc.unary_stream_rpc_method_handler(
+            servicer.StreamRecommendations,
+            request_deserializer=pb2.RecommendationPageRequest.FromString,
+            response_serializer=pb2.RecommendationPage.SerializeToString,
+        ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+        'recommendation.RecommendationService', rpc_method_handlers
+    )
+    server.add_generic_rpc_handlers((generic_handler,))
@@ -0,0 +1,120 @@
+"""
+Multi-process ranking for RecommendationService.
+
+Ranking (vectorizer transform, sparse cosine scoring, top-k selection) is CPU-bound Python and
+NumPy work, so in-process it is limited to roughly one core by the GIL. RankingWorkerPool runs it
+in worker processes instead. Each worker memory-maps the same artifact directory as the server,
+so the catalog and city matrices are shared through the page cache rather than copied per process.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from monitoring.metrics import metrics
+from services.recommendation.ranking import top_k
+
+# Snapshot loaded in each worker process; replaced when a request asks for a newer version
+_worker_snapshot = None
+_worker_artifacts_dir = None
+
+
+class RankingUnavailableError(Exception):
+    """
+    The worker pool cannot rank a request (its model version cannot be loaded, or the
+    pool had to be restarted); the caller should rank in-process instead.
+    """
+
+
+def _init_worker(artifacts_dir):
+    global _worker_artifacts_dir
+    _worker_artifacts_dir = artifacts_dir
+    _load_worker_snapshot()
+
+
+def _load_worker_snapshot():
+    from services.recommendation.artifacts import artifact_version, load_artifacts
+    from services.recommendation.model import ModelSnapshot
+
+    global _worker_snapshot
+    version = artifact_version(_worker_artifacts_dir)
+    catalog, vectorizer, city_index = load_artifacts(_worker_artifacts_dir)
+    _worker_snapshot = ModelSnapshot(catalog, vectorizer, city_index, version=version)
+
+
+def _rank_in_worker(version, categories, city, k):
+    """
+    Rank in a worker process against the snapshot with the given version.
+    :return: (row_ids, scores), or None if the city is unknown.
+    """
+    if _worker_snapshot is None or _worker_snapshot.version != version:
+        _load_worker_snapshot()
+        if _worker_snapshot.version != version:
+            raise RankingUnavailableError(
+                f"Requested model version {version}, artifacts are at {_worker_snapshot.version}"
+            )
+
+    snapshot = _worker_snapshot
+    if city not in snapshot.city_index:
+        return None
+    user_vector = snapshot.vectorizer.transform([' '.join(categories)])
+    row_ids, similarities = snapshot.city_index.score(city, user_vector)
+    top = top_k(similarities, k)
+    return row_ids[top], similarities[top]
+
+
+class RankingWorkerPool:
+    def __init__(self, artifacts_dir, processes):
+        """
+        Pool of ranking worker processes that memory-map the artifacts in `artifacts_dir`.
+
+        Workers are started with the "spawn" method so they never inherit the server's gRPC,
+        Redis or database state.
+
+        :param artifacts_dir: Artifact directory the live model is loaded from.
+        :param processes: Number of worker processes (typically the pod's core count).
+        """
+        self.artifacts_dir = artifacts_dir
+        self.processes = processes
+        self._lock = threading.Lock()
+        self._executor = self._start()
+
+    def _start(self):
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.artifacts_dir,),
+        )
+
+    def rank(self, categories, city, k, snapshot):
+        """
+        Rank in a worker process against `snapshot`'s model version.
+
+        :return: (row_ids, scores) of the top-k matches, best first, or None if the city is unknown.
+        :raises RankingUnavailableError: If the workers cannot rank against that version (e.g. the snapshot
+            was not loaded from artifacts, or newer artifacts have already replaced it).
+        """
+        if snapshot.version is None:
+            raise RankingUnavailableError("Snapshot was not loaded from artifacts")
+        executor = self._executor
+        try:
+            return executor.submit(_rank_in_worker, snapshot.version, list(categories), city, k).result()
+        except RankingUnavailableError:
+            metrics.counter("ranking_worker_stale").inc()
+            raise
+        except BrokenProcessPool as e:
+            metrics.counter("ranking_worker_failures").inc()
+            logging.error(f"Ranking worker pool broke, restarting it: {e}")
+            self._restart(executor)
+            raise RankingUnavailableError("Ranking worker pool was restarted") from e
+
+    def _restart(self, broken_executor):
+        with self._lock:
+            if self._executor is broken_executor:
+                self._executor = self._start()
+        broken_executor.shutdown(wait=False)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
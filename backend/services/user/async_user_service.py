@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+
+import grpc
+from codegen import user_service_pb2 as user_pb2
+from codegen import recommendation_service_pb2 as rec_pb2
+from services.user.user_service import UserService
+
+
+class AsyncUserService(UserService):
+    def __init__(self, db, redis_client, recommendation_service, executor=None):
+        """
+        asyncio variant of UserService for the grpc.aio server. bcrypt hashing and
+        verification run on `executor` so they never block the event loop.
+
+        :param db: AsyncDatabase instance
+        :param redis_client: redis.asyncio client instance
+        :param recommendation_service: AsyncRecommendationService instance
+        :param executor: Executor for CPU-bound work; None uses the event loop's default executor
+        """
+        super().__init__(db=db, redis_client=redis_client, recommendation_service=recommendation_service)
+        self.executor = executor
+
+    async def _offload(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def RegisterUser(self, request, context):
+        """
+        Register a new user and fetch initial recommendations based on preferences.
+        """
+        try:
+            hashed_password = await self._offload(self.hash_password, request.password)
+
+            logging.info(f"Raw preferences from request: {request.preferences}")
+            normalized_preferences = self.normalize_preferences(request.preferences)
+            preferences_json = json.dumps(normalized_preferences)
+
+            # Insert user into the database
+            await self.db.execute_prepared(
+                "user_insert", (request.email, hashed_password, request.name, preferences_json)
+            )
+
+            # Call RecommendationService
+            rec_request = rec_pb2.RecommendationRequest(
+                category=normalized_preferences["category"],
+                city=normalized_preferences["city"]
+            )
+            response = await self.recommendation_service.GetRecommendations(rec_request, context)
+            serialized_recommendations = self.serialize_recommendations(response, split_category=True)
+            logging.info(f'Recommendations: {serialized_recommendations}')
+
+            return user_pb2.RegisterUserResponse(
+                message="User registered successfully.",
+                success=True,
+                recommendations=serialized_recommendations  # Return as JSON string
+            )
+        except grpc.RpcError as e:
+            logging.error(f"Error calling Recommendation Service: {e.details()}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details("Failed to fetch recommendations.")
+            return user_pb2.RegisterUserResponse(
+                message="User registered, but recommendations failed.",
+                success=False,
+            )
+        except Exception as e:
+            logging.error(f"Error during registration: {str(e)}")
+            context.set_code(grpc.StatusCode.ALREADY_EXISTS)
+            context.set_details("Email already exists.")
+            return user_pb2.RegisterUserResponse(
+                message="User registration failed.",
+                success=False,
+            )
+
+    async def LoginUser(self, request, context):
+        """
+        Authenticate a user and fetch recommendations for returning users.
+        """
+        try:
+            user = await self.db.fetch_one_prepared("user_login", (request.email,))
+            if not user:
+                logging.error("User not found.")
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details("User not found")
+                return user_pb2.LoginUserResponse(message="Invalid email or password", success=False)
+
+            # Verify password
+            if not await self._offload(self.check_password, request.password, user["password_hash"]):
+                logging.error("Invalid password.")
+                context.set_code(grpc.StatusCode.UNAUTHENTICATED)
+                context.set_details("Invalid credentials")
+                return user_pb2.LoginUserResponse(message="Invalid email or password", success=False)
+
+            token = self.issue_token(user["id"])
+
+            # Returning user logic
+            if isinstance(user["preferences"], str):
+                preferences = json.loads(user["preferences"])
+            else:
+                preferences = user["preferences"]
+
+            # Check if preferences are collected
+            if not user["preferences_collected"]:
+                logging.info("User has not set preferences yet.")
+                return user_pb2.LoginUserResponse(
+                    message="Preferences required",
+                    success=True,
+                    token=token,
+                    user_id=user["id"],
+                    preferences=json.dumps(preferences),
+                    name=user["name"],
+                )
+
+            # Read the shared cache entry for the user's preferences (one round trip on a hit)
+            rec_request = rec_pb2.RecommendationRequest(
+                category=preferences["category"], city=preferences["city"]
+            )
+            response = await self.recommendation_service.GetRecommendations(rec_request, context)
+            serialized_recommendations = self.serialize_recommendations(response)
+
+            return user_pb2.LoginUserResponse(
+                message="Login successful.",
+                success=True,
+                token=token,
+                user_id=user["id"],
+                preferences=json.dumps(preferences),
+                recommendations=serialized_recommendations,
+                name=user["name"],
+            )
+        except Exception as e:
+            logging.error(f"Error during login: {str(e)}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details("Internal server error.")
+            return user_pb2.LoginUserResponse(message="Login failed.", success=False)
+
+    async def GetUserProfile(self, request, context):
+        try:
+            user = await self.db.fetch_one_prepared("user_profile", (request.user_id,))
+            if not user:
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details('User not found')
+                return user_pb2.GetUserProfileResponse()
+
+            # Serialize the preferences field to JSON string
+            serialized_preferences = json.dumps(user['preferences']) if user['preferences'] else ""
+
+            return user_pb2.GetUserProfileResponse(
+                id=user['id'],
+                email=user['email'],
+                name=user['name'],
+                preferences=serialized_preferences
+            )
+        except Exception as e:
+            print("Exception is:", e)
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details('Internal server error')
+            return user_pb2.GetUserProfileResponse()
+
+    async def UpdateUserProfile(self, request, context):
+        try:
+            await self.db.execute_prepared("user_update_profile", (request.name, request.preferences, request.user_id))
+            return user_pb2.UpdateUserProfileResponse(message="User profile updated", success=True)
+        except Exception as e:
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details('Internal server error')
+            return user_pb2.UpdateUserProfileResponse(message="Update failed", success=False)
+
+    async def DeleteUser(self, request, context):
+        try:
+            await self.db.execute_prepared("user_delete", (request.user_id,))
+            return user_pb2.DeleteUserResponse(message="User deleted successfully", success=True)
+        except Exception as e:
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details('Internal server error')
+            return user_pb2.DeleteUserResponse(message="Delete failed", success=False)
+
+    async def UpdatePreferences(self, request, context):
+        """
+        Updates user preferences, generates new recommendations if needed, and manages caching appropriately.
+        """
+        try:
+            existing_user = await self.db.fetch_one_prepared("user_preferences", (request.user_id,))
+            if not existing_user:
+                logging.warning(f"User not found for user_id: {request.user_id}")
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details("User not found.")
+                return user_pb2.UpdatePreferencesResponse(
+                    message="User not found.",
+                    success=False,
+                    recommendations="[]"
+                )
+
+            existing_preferences = existing_user["preferences"]
+            if isinstance(existing_preferences, str):
+                existing_preferences = json.loads(existing_preferences)
+
+            new_preferences = {
+                "category": list(request.category),
+                "city": request.city
+            }
+
+            cache_key = self.recommendation_service.cache_key(request.category, request.city)
+
+            # Check if preferences have changed
+            if self.same_preferences(existing_preferences, new_preferences) and self.redis_client:
+                cached_recommendations = await self.redis_client.get(cache_key)
+                if cached_recommendations:
+                    logging.info("Returning cached recommendations.")
+                    return user_pb2.UpdatePreferencesResponse(
+                        message="Preferences unchanged. Returning cached recommendations.",
+                        success=True,
+                        recommendations=self.serialize_recommendations(
+                            rec_pb2.RecommendationResponse.FromString(cached_recommendations)
+                        )
+                    )
+
+            # Update preferences in the database
+            preferences_json = json.dumps(new_preferences)
+            await self.db.execute_prepared("user_update_preferences", (preferences_json, request.user_id))
+            logging.info(f"Preferences updated in the database for user_id {request.user_id}.")
+
+            # Recompute the recommendations, overwriting the cache entry in one round trip
+            rec_request = rec_pb2.RecommendationRequest(
+                category=request.category,
+                city=request.city
+            )
+            response = await self.recommendation_service.refresh_recommendations(rec_request, context)
+
+            return user_pb2.UpdatePreferencesResponse(
+                message="Preferences updated successfully.",
+                success=True,
+                recommendations=self.serialize_recommendations(response)
+            )
+        except Exception as e:
+            logging.error(f"Error during preference update: {str(e)}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details("Internal server error.")
+            return user_pb2.UpdatePreferencesResponse(
+                message="Failed to update preferences.",
+                success=False,
+                recommendations="[]"
+            )
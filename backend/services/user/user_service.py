@@ -7,16 +7,7 @@ from codegen import recommendation_service_pb2 as rec_pb2
 import grpc
 import json
 import logging
-from kafka import KafkaConsumer
-
-# Initialize Kafka consumer
-consumer = KafkaConsumer(
-    'preferences_update',
-    bootstrap_servers='localhost:9092',  # Update with your Kafka broker address
-    value_deserializer=lambda v: json.loads(v.decode('utf-8')),
-    group_id='recommendation-service'
-)
-
+from cache.keys import canonical_query
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "fallback-secret-key")
 
@@ -36,29 +27,17 @@ class UserService(user_pb2_grpc.UserServiceServicer):
         """
         try:
             # Hash the password
-            hashed_password = bcrypt.hashpw(request.password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+            hashed_password = self.hash_password(request.password)
 
             # Log raw preferences for debugging
             logging.info(f"Raw preferences from request: {request.preferences}")
 
             # Parse preferences from JSON string
-            preferences = json.loads(request.preferences)
-
-            # Ensure preferences are JSON-serializable (convert any non-native types)
-            normalized_preferences = {
-                key: (
-                    [str(item) for item in value] if isinstance(value, list) else str(value)
-                )
-                for key, value in preferences.items()
-            }
+            normalized_preferences = self.normalize_preferences(request.preferences)
             preferences_json = json.dumps(normalized_preferences)
 
             # Insert user into the database
-            query = """
-            INSERT INTO Users (email, password_hash, name, preferences, preferences_collected)
-            VALUES (%s, %s, %s, %s, TRUE)
-            """
-            self.db.execute(query, (request.email, hashed_password, request.name, preferences_json))
+            self.db.execute_prepared("user_insert", (request.email, hashed_password, request.name, preferences_json))
 
             # Call RecommendationService
             rec_request = rec_pb2.RecommendationRequest(
@@ -69,27 +48,9 @@ class UserService(user_pb2_grpc.UserServiceServicer):
             response = self.recommendation_service.GetRecommendations(rec_request, context)
             logging.info(f'Response from recommendation service: {response}')
 
-            # Prepare recommendations response
-            recommendations = [
-                {
-                    "name": rec.name,
-                    "category": rec.category.split(", "),  # Already a string in this structure
-                    "rating": float(rec.rating),  # Ensure rating is treated as float
-                    "review_count": int(rec.review_count),  # Ensure review_count is an integer
-                    "city": rec.city,
-                    "address": rec.address,
-                    "phone": rec.phone,
-                    "price": rec.price,
-                    "image_url": rec.image_url,
-                    "url": rec.url,
-                }
-                for rec in response.recommendations
-            ]
-
-            logging.info(f'Recommendations: {recommendations}')
-
             # Serialize recommendations to JSON
-            serialized_recommendations = json.dumps(recommendations)
+            serialized_recommendations = self.serialize_recommendations(response, split_category=True)
+            logging.info(f'Recommendations: {serialized_recommendations}')
 
             # Return the response
             return user_pb2.RegisterUserResponse(
@@ -120,8 +81,7 @@ class UserService(user_pb2_grpc.UserServiceServicer):
         """
         try:
             # Fetch user from the database
-            query = "SELECT id,name, password_hash, preferences, preferences_collected FROM Users WHERE email = %s"
-            user = self.db.fetch_one(query, (request.email,))
+            user = self.db.fetch_one_prepared("user_login", (request.email,))
             if not user:
                 logging.error("User not found.")
                 context.set_code(grpc.StatusCode.NOT_FOUND)
@@ -131,18 +91,14 @@ class UserService(user_pb2_grpc.UserServiceServicer):
             logging.info(f"User found: ID {user['id']}")
 
             # Verify password
-            if not bcrypt.checkpw(request.password.encode("utf-8"), user["password_hash"].encode("utf-8")):
+            if not self.check_password(request.password, user["password_hash"]):
                 logging.error("Invalid password.")
                 context.set_code(grpc.StatusCode.UNAUTHENTICATED)
                 context.set_details("Invalid credentials")
                 return user_pb2.LoginUserResponse(message="Invalid email or password", success=False)
 
             # Generate JWT token
-            token = jwt.encode(
-                {"user_id": user["id"], "exp": datetime.utcnow() + timedelta(hours=2)},
-                SECRET_KEY,
-                algorithm="HS256",
-            )
+            token = self.issue_token(user["id"])
             logging.info(f"JWT token generated for user {user['id']}")
 
             # Returning user logic
@@ -167,23 +123,8 @@ class UserService(user_pb2_grpc.UserServiceServicer):
 
             logging.info(f"User preferences: {preferences}")
 
-            # Check cache for recommendations
-            cache_key = f"user_{user['id']}_recommendations"
-            if self.redis_client:
-                cached_recommendations = self.redis_client.get(cache_key)
-                if cached_recommendations:
-                    logging.info(f"Cache hit for user {user['id']}")
-                    return user_pb2.LoginUserResponse(
-                        message="Login successful.",
-                        success=True,
-                        token=token,
-                        user_id=user["id"],
-                        preferences=json.dumps(preferences),
-                        recommendations=cached_recommendations,  # Cached recommendations
-                        name=user["name"],
-                    )
-
-            # Fetch recommendations if not cached
+            # Read the shared cache entry for the user's preferences: one Redis round trip on a
+            # hit (none from the L1); on a miss the recommendations are ranked and cached
             rec_request = rec_pb2.RecommendationRequest(
                 category=preferences["category"], city=preferences["city"]
             )
@@ -191,29 +132,8 @@ class UserService(user_pb2_grpc.UserServiceServicer):
             logging.info(f"Response from recommendation service: {response}")
 
             # Prepare recommendations response
-            recommendations = [
-                {
-                    "name": rec.name,
-                    "category": rec.category,
-                    "rating": rec.rating,
-                    "review_count": rec.review_count,
-                    "city": rec.city,
-                    "address": rec.address,
-                    "phone": rec.phone,
-                    "price": rec.price,
-                    "image_url": rec.image_url,
-                    "url": rec.url,
-                }
-                for rec in response.recommendations
-            ]
-
-            logging.info(f"Recommendations for user {user['id']}: {recommendations}")
-
-            serialized_recommendations = json.dumps(recommendations)
-
-            # Save recommendations to cache
-            if self.redis_client:
-                self.redis_client.set(cache_key, serialized_recommendations, ex=3600)  # Cache for 1 hour
+            serialized_recommendations = self.serialize_recommendations(response)
+            logging.info(f"Recommendations for user {user['id']}: {serialized_recommendations}")
 
             return user_pb2.LoginUserResponse(
                 message="Login successful.",
@@ -245,9 +165,8 @@ class UserService(user_pb2_grpc.UserServiceServicer):
 
     def GetUserProfile(self, request, context):
         try:
-            query = "SELECT id, email, name, preferences FROM Users WHERE id = %s"
             print("Value in user ser fun:", request.user_id)
-            user = self.db.fetch_one(query, (request.user_id,))
+            user = self.db.fetch_one_prepared("user_profile", (request.user_id,))
             print("User is :", user)
             if not user:
                 context.set_code(grpc.StatusCode.NOT_FOUND)
@@ -271,10 +190,7 @@ class UserService(user_pb2_grpc.UserServiceServicer):
 
     def UpdateUserProfile(self, request, context):
         try:
-            query = """
-            UPDATE Users SET name = %s, preferences = %s WHERE id = %s
-            """
-            self.db.execute(query, (request.name, request.preferences, request.user_id))
+            self.db.execute_prepared("user_update_profile", (request.name, request.preferences, request.user_id))
             return user_pb2.UpdateUserProfileResponse(message="User profile updated", success=True)
         except Exception as e:
             context.set_code(grpc.StatusCode.INTERNAL)
@@ -283,8 +199,7 @@ class UserService(user_pb2_grpc.UserServiceServicer):
 
     def DeleteUser(self, request, context):
         try:
-            query = "DELETE FROM Users WHERE id = %s"
-            self.db.execute(query, (request.user_id,))
+            self.db.execute_prepared("user_delete", (request.user_id,))
             return user_pb2.DeleteUserResponse(message="User deleted successfully", success=True)
         except Exception as e:
             context.set_code(grpc.StatusCode.INTERNAL)
@@ -300,8 +215,7 @@ class UserService(user_pb2_grpc.UserServiceServicer):
             logging.info(f"Request received: {request}")
 
             # Fetch the existing preferences for the user from the database
-            query = "SELECT preferences FROM Users WHERE id = %s"
-            existing_user = self.db.fetch_one(query, (request.user_id,))
+            existing_user = self.db.fetch_one_prepared("user_preferences", (request.user_id,))
             if not existing_user:
                 logging.warning(f"User not found for user_id: {request.user_id}")
                 context.set_code(grpc.StatusCode.NOT_FOUND)
@@ -325,10 +239,10 @@ class UserService(user_pb2_grpc.UserServiceServicer):
             }
             logging.info(f"New preferences: {new_preferences}")
 
-            # Check if preferences have changed
-            if existing_preferences == new_preferences:
+            # Check if preferences have changed (in any way that changes the recommendations)
+            if self.same_preferences(existing_preferences, new_preferences):
                 logging.info("Preferences unchanged. Checking cache for recommendations.")
-                cache_key = f"recommendations:{' '.join(request.category).lower()}:{request.city.lower()}"
+                cache_key = self.recommendation_service.cache_key(request.category, request.city)
                 redis_client = self.redis_client
 
                 if redis_client:
@@ -338,47 +252,28 @@ class UserService(user_pb2_grpc.UserServiceServicer):
                         return user_pb2.UpdatePreferencesResponse(
                             message="Preferences unchanged. Returning cached recommendations.",
                             success=True,
-                            recommendations=cached_recommendations.decode("utf-8")
+                            recommendations=self.serialize_recommendations(
+                                rec_pb2.RecommendationResponse.FromString(cached_recommendations)
+                            )
                         )
                 logging.info("No cached recommendations found.")
 
             # Update preferences in the database
             preferences_json = json.dumps(new_preferences)
-            update_query = "UPDATE Users SET preferences = %s WHERE id = %s"
-            self.db.execute(update_query, (preferences_json, request.user_id))
+            self.db.execute_prepared("user_update_preferences", (preferences_json, request.user_id))
             logging.info(f"Preferences updated in the database for user_id {request.user_id}.")
 
-            # Invalidate the cache for the old recommendations
-            cache_key = f"recommendations:{' '.join(request.category).lower()}:{request.city.lower()}"
-            if self.redis_client:
-                logging.info(f"Invalidating cache for key: {cache_key}")
-                self.redis_client.delete(cache_key)
-
-            # Fetch new recommendations from the recommendation service
+            # Recompute the recommendations; overwriting the cache entry and invalidating other
+            # replicas' copies of it take one pipelined round trip
             rec_request = rec_pb2.RecommendationRequest(
                 category=request.category,
                 city=request.city
             )
-            response = self.recommendation_service.GetRecommendations(rec_request, context)
+            response = self.recommendation_service.refresh_recommendations(rec_request, context)
             logging.info(f"Recommendations fetched: {response}")
 
             # Prepare recommendations for response
-            recommendations = [
-                {
-                    "name": rec.name,
-                    "category": rec.category,
-                    "rating": rec.rating,
-                    "review_count": rec.review_count,
-                    "city": rec.city,
-                    "address": rec.address,
-                    "phone": rec.phone,
-                    "price": rec.price,
-                    "image_url": rec.image_url,
-                    "url": rec.url,
-                }
-                for rec in response.recommendations
-            ]
-            serialized_recommendations = json.dumps(recommendations)
+            serialized_recommendations = self.serialize_recommendations(response)
             logging.info(f"Serialized recommendations: {serialized_recommendations}")
 
             return user_pb2.UpdatePreferencesResponse(
@@ -405,3 +300,73 @@ class UserService(user_pb2_grpc.UserServiceServicer):
                 success=False,
                 recommendations="[]"
             )
+
+    @staticmethod
+    def hash_password(password):
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+    @staticmethod
+    def check_password(password, password_hash):
+        return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+
+    @staticmethod
+    def issue_token(user_id):
+        """
+        Create a JWT for the user that expires after two hours.
+        """
+        return jwt.encode(
+            {"user_id": user_id, "exp": datetime.utcnow() + timedelta(hours=2)},
+            SECRET_KEY,
+            algorithm="HS256",
+        )
+
+    @staticmethod
+    def same_preferences(existing_preferences, new_preferences):
+        """
+        Whether two sets of preferences describe the same recommendation query, ignoring
+        category order, case, whitespace and duplicates.
+        """
+        if not existing_preferences or "category" not in existing_preferences or "city" not in existing_preferences:
+            return False
+        return (
+            canonical_query(existing_preferences["category"], existing_preferences["city"])
+            == canonical_query(new_preferences["category"], new_preferences["city"])
+        )
+
+    @staticmethod
+    def normalize_preferences(preferences_json):
+        """
+        Parse preferences from a JSON string and make them JSON-serializable
+        (lists of strings or strings).
+        """
+        preferences = json.loads(preferences_json)
+        return {
+            key: (
+                [str(item) for item in value] if isinstance(value, list) else str(value)
+            )
+            for key, value in preferences.items()
+        }
+
+    @staticmethod
+    def serialize_recommendations(response, split_category=False):
+        """
+        Serialize a RecommendationResponse into the JSON string returned to clients.
+
+        :param split_category: Return each category string as a list of categories.
+        """
+        recommendations = [
+            {
+                "name": rec.name,
+                "category": rec.category.split(", ") if split_category else rec.category,
+                "rating": float(rec.rating),  # Ensure rating is treated as float
+                "review_count": int(rec.review_count),  # Ensure review_count is an integer
+                "city": rec.city,
+                "address": rec.address,
+                "phone": rec.phone,
+                "price": rec.price,
+                "image_url": rec.image_url,
+                "url": rec.url,
+            }
+            for rec in response.recommendations
+        ]
+        return json.dumps(recommendations)
@@ -13,7 +13,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x16\x62usiness_service.proto\x12\x08\x62usiness\"\x1d\n\x0f\x42usinessRequest\x12\n\n\x02id\x18\x01 \x01(\x05\"%\n\x15\x42usinessByNameRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\"\xcc\x02\n\x12NewBusinessRequest\x12\x12\n\nbusinessid\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0e\n\x06rating\x18\x03 \x01(\x02\x12\x14\n\x0creview_count\x18\x04 \x01(\x05\x12\x0f\n\x07\x61\x64\x64ress\x18\x05 \x01(\t\x12\x10\n\x08\x63\x61tegory\x18\x06 \x01(\t\x12\x0c\n\x04\x63ity\x18\x07 \x01(\t\x12\r\n\x05state\x18\x08 \x01(\t\x12\x0f\n\x07\x63ountry\x18\t \x01(\t\x12\x10\n\x08zip_code\x18\n \x01(\t\x12\x10\n\x08latitude\x18\x0b \x01(\x02\x12\x11\n\tlongitude\x18\x0c \x01(\x02\x12\r\n\x05phone\x18\r \x01(\t\x12\r\n\x05price\x18\x0e \x01(\t\x12\x11\n\timage_url\x18\x0f \x01(\t\x12\x0b\n\x03url\x18\x10 \x01(\t\x12\x10\n\x08\x64istance\x18\x11 \x01(\x02\x12\x16\n\x0e\x62usiness_hours\x18\x12 \x01(\t\"\xd6\x02\n\x10\x42usinessResponse\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x12\n\nbusinessid\x18\x02 \x01(\t\x12\x0c\n\x04name\x18\x03 \x01(\t\x12\x0e\n\x06rating\x18\x04 \x01(\x02\x12\x14\n\x0creview_count\x18\x05 \x01(\x05\x12\x0f\n\x07\x61\x64\x64ress\x18\x06 \x01(\t\x12\x10\n\x08\x63\x61tegory\x18\x07 \x01(\t\x12\x0c\n\x04\x63ity\x18\x08 \x01(\t\x12\r\n\x05state\x18\t \x01(\t\x12\x0f\n\x07\x63ountry\x18\n \x01(\t\x12\x10\n\x08zip_code\x18\x0b \x01(\t\x12\x10\n\x08latitude\x18\x0c \x01(\x02\x12\x11\n\tlongitude\x18\r \x01(\x02\x12\r\n\x05phone\x18\x0e \x01(\t\x12\r\n\x05price\x18\x0f \x01(\t\x12\x11\n\timage_url\x18\x10 \x01(\t\x12\x0b\n\x03url\x18\x11 \x01(\t\x12\x10\n\x08\x64istance\x18\x12 \x01(\x02\x12\x16\n\x0e\x62usiness_hours\x18\x13 \x01(\t\"P\n\x19\x42usinessByLocationRequest\x12\x10\n\x08latitude\x18\x01 \x01(\x02\x12\x11\n\tlongitude\x18\x02 \x01(\x02\x12\x0e\n\x06radius\x18\x03 \x01(\x02\"#\n\x0f\x43\x61tegoryRequest\x12\x10\n\x08\x63\x61tegory\x18\x01 \x01(\t\"#\n\rRatingRequest\x12\x12\n\nmin_rating\x18\x01 \x01(\x02\"P\n\x1a\x42usinessByProximityRequest\x12\x10\n\x08latitude\x18\x01 \x01(\x02\x12\x11\n\tlongitude\x18\x02 \x01(\x02\x12\r\n\x05limit\x18\x03 \x01(\x05\"\x11\n\x0fTrendingRequest\"F\n\x14\x42usinessListResponse\x12.\n\nbusinesses\x18\x01 \x03(\x0b\x32\x1a.business.BusinessResponse2\xa8\x05\n\x0f\x42usinessService\x12\x44\n\x0bGetBusiness\x12\x19.business.BusinessRequest\x1a\x1a.business.BusinessResponse\x12G\n\x0b\x41\x64\x64\x42usiness\x12\x1c.business.NewBusinessRequest\x1a\x1a.business.BusinessResponse\x12P\n\x11GetBusinessByName\x12\x1f.business.BusinessByNameRequest\x1a\x1a.business.BusinessResponse\x12\\\n\x15GetBusinessByLocation\x12#.business.BusinessByLocationRequest\x1a\x1e.business.BusinessListResponse\x12R\n\x15GetBusinessByCategory\x12\x19.business.CategoryRequest\x1a\x1e.business.BusinessListResponse\x12N\n\x13GetBusinessByRating\x12\x17.business.RatingRequest\x1a\x1e.business.BusinessListResponse\x12^\n\x16GetBusinessByProximity\x12$.business.BusinessByProximityRequest\x1a\x1e.business.BusinessListResponse\x12R\n\x15GetTrendingBusinesses\x12\x19.business.TrendingRequest\x1a\x1e.business.BusinessListResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x16\x62usiness_service.proto\x12\x08\x62usiness\"\x1d\n\x0f\x42usinessRequest\x12\n\n\x02id\x18\x01 \x01(\x05\"%\n\x15\x42usinessByNameRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\"\xcc\x02\n\x12NewBusinessRequest\x12\x12\n\nbusinessid\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0e\n\x06rating\x18\x03 \x01(\x02\x12\x14\n\x0creview_count\x18\x04 \x01(\x05\x12\x0f\n\x07\x61\x64\x64ress\x18\x05 \x01(\t\x12\x10\n\x08\x63\x61tegory\x18\x06 \x01(\t\x12\x0c\n\x04\x63ity\x18\x07 \x01(\t\x12\r\n\x05state\x18\x08 \x01(\t\x12\x0f\n\x07\x63ountry\x18\t \x01(\t\x12\x10\n\x08zip_code\x18\n \x01(\t\x12\x10\n\x08latitude\x18\x0b \x01(\x02\x12\x11\n\tlongitude\x18\x0c \x01(\x02\x12\r\n\x05phone\x18\r \x01(\t\x12\r\n\x05price\x18\x0e \x01(\t\x12\x11\n\timage_url\x18\x0f \x01(\t\x12\x0b\n\x03url\x18\x10 \x01(\t\x12\x10\n\x08\x64istance\x18\x11 \x01(\x02\x12\x16\n\x0e\x62usiness_hours\x18\x12 \x01(\t\"\xd6\x02\n\x10\x42usinessResponse\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x12\n\nbusinessid\x18\x02 \x01(\t\x12\x0c\n\x04name\x18\x03 \x01(\t\x12\x0e\n\x06rating\x18\x04 \x01(\x02\x12\x14\n\x0creview_count\x18\x05 \x01(\x05\x12\x0f\n\x07\x61\x64\x64ress\x18\x06 \x01(\t\x12\x10\n\x08\x63\x61tegory\x18\x07 \x01(\t\x12\x0c\n\x04\x63ity\x18\x08 \x01(\t\x12\r\n\x05state\x18\t \x01(\t\x12\x0f\n\x07\x63ountry\x18\n \x01(\t\x12\x10\n\x08zip_code\x18\x0b \x01(\t\x12\x10\n\x08latitude\x18\x0c \x01(\x02\x12\x11\n\tlongitude\x18\r \x01(\x02\x12\r\n\x05phone\x18\x0e \x01(\t\x12\r\n\x05price\x18\x0f \x01(\t\x12\x11\n\timage_url\x18\x10 \x01(\t\x12\x0b\n\x03url\x18\x11 \x01(\t\x12\x10\n\x08\x64istance\x18\x12 \x01(\x02\x12\x16\n\x0e\x62usiness_hours\x18\x13 \x01(\t\"P\n\x19\x42usinessByLocationRequest\x12\x10\n\x08latitude\x18\x01 \x01(\x02\x12\x11\n\tlongitude\x18\x02 \x01(\x02\x12\x0e\n\x06radius\x18\x03 \x01(\x02\"F\n\x0f\x43\x61tegoryRequest\x12\x10\n\x08\x63\x61tegory\x18\x01 \x01(\t\x12\r\n\x05limit\x18\x02 \x01(\x05\x12\x12\n\npage_token\x18\x03 \x01(\t\"T\n\rRatingRequest\x12\x12\n\nmin_rating\x18\x01 \x01(\x02\x12\r\n\x05limit\x18\x02 \x01(\x05\x12\x0c\n\x04\x63ity\x18\x03 \x01(\t\x12\x12\n\npage_token\x18\x04 \x01(\t\"P\n\x1a\x42usinessByProximityRequest\x12\x10\n\x08latitude\x18\x01 \x01(\x02\x12\x11\n\tlongitude\x18\x02 \x01(\x02\x12\r\n\x05limit\x18\x03 \x01(\x05\".\n\x0fTrendingRequest\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\r\n\x05limit\x18\x02 \x01(\x05\"_\n\x14\x42usinessListResponse\x12.\n\nbusinesses\x18\x01 \x03(\x0b\x32\x1a.business.BusinessResponse\x12\x17\n\x0fnext_page_token\x18\x02 \x01(\t2\xa8\x05\n\x0f\x42usinessService\x12\x44\n\x0bGetBusiness\x12\x19.business.BusinessRequest\x1a\x1a.business.BusinessResponse\x12G\n\x0b\x41\x64\x64\x42usiness\x12\x1c.business.NewBusinessRequest\x1a\x1a.business.BusinessResponse\x12P\n\x11GetBusinessByName\x12\x1f.business.BusinessByNameRequest\x1a\x1a.business.BusinessResponse\x12\\\n\x15GetBusinessByLocation\x12#.business.BusinessByLocationRequest\x1a\x1e.business.BusinessListResponse\x12R\n\x15GetBusinessByCategory\x12\x19.business.CategoryRequest\x1a\x1e.business.BusinessListResponse\x12N\n\x13GetBusinessByRating\x12\x17.business.RatingRequest\x1a\x1e.business.BusinessListResponse\x12^\n\x16GetBusinessByProximity\x12$.business.BusinessByProximityRequest\x1a\x1e.business.BusinessListResponse\x12R\n\x15GetTrendingBusinesses\x12\x19.business.TrendingRequest\x1a\x1e.business.BusinessListResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -32,15 +32,15 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _globals['_BUSINESSBYLOCATIONREQUEST']._serialized_start=786
   _globals['_BUSINESSBYLOCATIONREQUEST']._serialized_end=866
   _globals['_CATEGORYREQUEST']._serialized_start=868
-  _globals['_CATEGORYREQUEST']._serialized_end=903
-  _globals['_RATINGREQUEST']._serialized_start=905
-  _globals['_RATINGREQUEST']._serialized_end=940
-  _globals['_BUSINESSBYPROXIMITYREQUEST']._serialized_start=942
-  _globals['_BUSINESSBYPROXIMITYREQUEST']._serialized_end=1022
-  _globals['_TRENDINGREQUEST']._serialized_start=1024
-  _globals['_TRENDINGREQUEST']._serialized_end=1041
-  _globals['_BUSINESSLISTRESPONSE']._serialized_start=1043
-  _globals['_BUSINESSLISTRESPONSE']._serialized_end=1113
-  _globals['_BUSINESSSERVICE']._serialized_start=1116
-  _globals['_BUSINESSSERVICE']._serialized_end=1796
+  _globals['_CATEGORYREQUEST']._serialized_end=938
+  _globals['_RATINGREQUEST']._serialized_start=940
+  _globals['_RATINGREQUEST']._serialized_end=1024
+  _globals['_BUSINESSBYPROXIMITYREQUEST']._serialized_start=1026
+  _globals['_BUSINESSBYPROXIMITYREQUEST']._serialized_end=1106
+  _globals['_TRENDINGREQUEST']._serialized_start=1108
+  _globals['_TRENDINGREQUEST']._serialized_end=1154
+  _globals['_BUSINESSLISTRESPONSE']._serialized_start=1156
+  _globals['_BUSINESSLISTRESPONSE']._serialized_end=1251
+  _globals['_BUSINESSSERVICE']._serialized_start=1254
+  _globals['_BUSINESSSERVICE']._serialized_end=1934
 # @@protoc_insertion_point(module_scope)
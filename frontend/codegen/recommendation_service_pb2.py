@@ -13,7 +13,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1crecommendation_service.proto\x12\x0erecommendation\"7\n\x15RecommendationRequest\x12\x10\n\x08\x63\x61tegory\x18\x01 \x03(\t\x12\x0c\n\x04\x63ity\x18\x02 \x01(\t\"Y\n\x16RecommendationResponse\x12?\n\x0frecommendations\x18\x01 \x03(\x0b\x32&.recommendation.BusinessRecommendation\"\xbb\x01\n\x16\x42usinessRecommendation\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x10\n\x08\x63\x61tegory\x18\x02 \x01(\t\x12\x0e\n\x06rating\x18\x03 \x01(\x02\x12\x14\n\x0creview_count\x18\x04 \x01(\x05\x12\x0c\n\x04\x63ity\x18\x05 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x06 \x01(\t\x12\r\n\x05phone\x18\x07 \x01(\t\x12\r\n\x05price\x18\x08 \x01(\t\x12\x11\n\timage_url\x18\t \x01(\t\x12\x0b\n\x03url\x18\n \x01(\t2|\n\x15RecommendationService\x12\x63\n\x12GetRecommendations\x12%.recommendation.RecommendationRequest\x1a&.recommendation.RecommendationResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1crecommendation_service.proto\x12\x0erecommendation\"7\n\x15RecommendationRequest\x12\x10\n\x08\x63\x61tegory\x18\x01 \x03(\t\x12\x0c\n\x04\x63ity\x18\x02 \x01(\t\"Y\n\x16RecommendationResponse\x12?\n\x0frecommendations\x18\x01 \x03(\x0b\x32&.recommendation.BusinessRecommendation\"c\n\x1a\x42\x61tchRecommendationRequest\x12\x36\n\x07queries\x18\x01 \x03(\x0b\x32%.recommendation.RecommendationRequest\x12\r\n\x05limit\x18\x02 \x01(\x05\"V\n\x1b\x42\x61tchRecommendationResponse\x12\x37\n\x07results\x18\x01 \x03(\x0b\x32&.recommendation.RecommendationResponse\"u\n\x19RecommendationPageRequest\x12\x10\n\x08\x63\x61tegory\x18\x01 \x03(\t\x12\x0c\n\x04\x63ity\x18\x02 \x01(\t\x12\x11\n\tpage_size\x18\x03 \x01(\x05\x12\x12\n\npage_token\x18\x04 \x01(\t\x12\x11\n\tmax_pages\x18\x05 \x01(\x05\"n\n\x12RecommendationPage\x12?\n\x0frecommendations\x18\x01 \x03(\x0b\x32&.recommendation.BusinessRecommendation\x12\x17\n\x0fnext_page_token\x18\x02 \x01(\t\"\xbb\x01\n\x16\x42usinessRecommendation\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x10\n\x08\x63\x61tegory\x18\x02 \x01(\t\x12\x0e\n\x06rating\x18\x03 \x01(\x02\x12\x14\n\x0creview_count\x18\x04 \x01(\x05\x12\x0c\n\x04\x63ity\x18\x05 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x06 \x01(\t\x12\r\n\x05phone\x18\x07 \x01(\t\x12\r\n\x05price\x18\x08 \x01(\t\x12\x11\n\timage_url\x18\t \x01(\t\x12\x0b\n\x03url\x18\n \x01(\t2\xda\x02\n\x15RecommendationService\x12\x63\n\x12GetRecommendations\x12%.recommendation.RecommendationRequest\x1a&.recommendation.RecommendationResponse\x12r\n\x17\x42\x61tchGetRecommendations\x12*.recommendation.BatchRecommendationRequest\x1a+.recommendation.BatchRecommendationResponse\x12h\n\x15StreamRecommendations\x12).recommendation.RecommendationPageRequest\x1a\".recommendation.RecommendationPage0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -25,8 +25,16 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _globals['_RECOMMENDATIONREQUEST']._serialized_end=103
   _globals['_RECOMMENDATIONRESPONSE']._serialized_start=105
   _globals['_RECOMMENDATIONRESPONSE']._serialized_end=194
-  _globals['_BUSINESSRECOMMENDATION']._serialized_start=197
-  _globals['_BUSINESSRECOMMENDATION']._serialized_end=384
-  _globals['_RECOMMENDATIONSERVICE']._serialized_start=386
-  _globals['_RECOMMENDATIONSERVICE']._serialized_end=510
+  _globals['_BATCHRECOMMENDATIONREQUEST']._serialized_start=196
+  _globals['_BATCHRECOMMENDATIONREQUEST']._serialized_end=295
+  _globals['_BATCHRECOMMENDATIONRESPONSE']._serialized_start=297
+  _globals['_BATCHRECOMMENDATIONRESPONSE']._serialized_end=383
+  _globals['_RECOMMENDATIONPAGEREQUEST']._serialized_start=385
+  _globals['_RECOMMENDATIONPAGEREQUEST']._serialized_end=502
+  _globals['_RECOMMENDATIONPAGE']._serialized_start=504
+  _globals['_RECOMMENDATIONPAGE']._serialized_end=614
+  _globals['_BUSINESSRECOMMENDATION']._serialized_start=617
+  _globals['_BUSINESSRECOMMENDATION']._serialized_end=804
+  _globals['_RECOMMENDATIONSERVICE']._serialized_start=807
+  _globals['_RECOMMENDATIONSERVICE']._serialized_end=1153
 # @@protoc_insertion_point(module_scope)
@@ -20,6 +20,16 @@ class RecommendationServiceStub(object):
                 request_serializer=recommendation__service__pb2.RecommendationRequest.SerializeToString,
                 response_deserializer=recommendation__service__pb2.RecommendationResponse.FromString,
                 )
+        self.BatchGetRecommendations = channel.unary_unary(
+                '/recommendation.RecommendationService/BatchGetRecommendations',
+                request_serializer=recommendation__service__pb2.BatchRecommendationRequest.SerializeToString,
+                response_deserializer=recommendation__service__pb2.BatchRecommendationResponse.FromString,
+                )
+        self.StreamRecommendations = channel.unary_stream(
+                '/recommendation.RecommendationService/StreamRecommendations',
+                request_serializer=recommendation__service__pb2.RecommendationPageRequest.SerializeToString,
+                response_deserializer=recommendation__service__pb2.RecommendationPage.FromString,
+                )
 
 
 class RecommendationServiceServicer(object):
@@ -33,6 +43,20 @@ class RecommendationServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def BatchGetRecommendations(self, request, context):
+        """RPC to get recommendations for many category/city queries in one call
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamRecommendations(self, request, context):
+        """RPC to stream ranked recommendations page by page, resuming from a page token
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_RecommendationServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -41,6 +65,16 @@ def add_RecommendationServiceServicer_to_server(servicer, server):
                     request_deserializer=recommendation__service__pb2.RecommendationRequest.FromString,
                     response_serializer=recommendation__service__pb2.RecommendationResponse.SerializeToString,
             ),
+            'BatchGetRecommendations': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchGetRecommendations,
+                    request_deserializer=recommendation__service__pb2.BatchRecommendationRequest.FromString,
+                    response_serializer=recommendation__service__pb2.BatchRecommendationResponse.SerializeToString,
+            ),
+            'StreamRecommendations': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamRecommendations,
+                    request_deserializer=recommendation__service__pb2.RecommendationPageRequest.FromString,
+                    response_serializer=recommendation__service__pb2.RecommendationPage.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'recommendation.RecommendationService', rpc_method_handlers)
@@ -68,3 +102,37 @@ class RecommendationService(object):
             recommendation__service__pb2.RecommendationResponse.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def BatchGetRecommendations(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/recommendation.RecommendationService/BatchGetRecommendations',
+            recommendation__service__pb2.BatchRecommendationRequest.SerializeToString,
+            recommendation__service__pb2.BatchRecommendationResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def StreamRecommendations(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/recommendation.RecommendationService/StreamRecommendations',
+            recommendation__service__pb2.RecommendationPageRequest.SerializeToString,
+            recommendation__service__pb2.RecommendationPage.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)